@@ -2,47 +2,61 @@
 
 import os
 import sys
-import subprocess
-import time
+import pytest
 
-def run_test(test_name):
-    """Run a specific test and return True if it passes, False otherwise."""
-    print(f"\n\n=== Running test: {test_name} ===\n")
+TEST_FILE = "src/tests/test_integration.py"
+
+class ResultRecorder:
+    """Pytest plugin that records a pass/fail result for each test by name."""
     
-    cmd = [
-        "python", "-m", "pytest", 
-        f"src/tests/test_integration.py::{test_name}", 
-        "-v"
-    ]
+    def __init__(self, tests):
+        self.results = {test: False for test in tests}
+        self._failed = set()
+    
+    def pytest_runtest_logreport(self, report):
+        test = report.nodeid.rsplit("::", 1)[-1]
+        if test not in self.results:
+            return
+        
+        # A failure in any phase (setup, call, teardown) marks the test as failed
+        if report.failed:
+            self._failed.add(test)
+            self.results[test] = False
+        elif test not in self._failed and (report.when == "call" or report.skipped):
+            self.results[test] = True
+
+def run_tests(tests):
+    """
+    Run the tests with pytest-xdist and return a pass/fail dict.
+    
+    pytest.main runs in this process and hands the tests out one at a time
+    to worker processes (--dist=load; --dist=loadfile would keep every test
+    of the single integration file on one worker). The tests only share the
+    service URLs, which workers inherit from the environment set here.
+    """
+    print(f"\n\n=== Running {len(tests)} tests in parallel ===\n")
     
-    env = os.environ.copy()
-    env["API_URL"] = "http://localhost:8000"
-    env["OLLAMA_URL"] = "http://localhost:11434"
+    os.environ["API_URL"] = "http://localhost:8000"
+    os.environ["OLLAMA_URL"] = "http://localhost:11434"
     
+    args = [
+        *[f"{TEST_FILE}::{test}" for test in tests],
+        "-v",
+        "-n", "auto",
+        "--dist=load",
+        "--timeout=30"  # Set a timeout of 30 seconds per test
+    ]
+    
+    recorder = ResultRecorder(tests)
     try:
-        result = subprocess.run(
-            cmd,
-            env=env,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=30  # Set a timeout of 30 seconds
-        )
-        
-        print(result.stdout)
-        if result.stderr:
-            print("STDERR:", result.stderr)
-        
-        return result.returncode == 0
-    except subprocess.TimeoutExpired:
-        print(f"Test {test_name} timed out after 30 seconds")
-        return False
+        pytest.main(args, plugins=[recorder])
     except Exception as e:
-        print(f"Error running test {test_name}: {e}")
-        return False
+        print(f"Error running tests: {e}")
+    
+    return recorder.results
 
 def main():
-    """Run all tests one by one."""
+    """Run all tests concurrently with pytest-xdist."""
     tests = [
         "test_api_health",
         "test_ollama_connection",
@@ -57,11 +71,7 @@ def main():
         "test_infrastructure_generation_invalid_values"
     ]
     
-    results = {}
-    
-    for test in tests:
-        results[test] = run_test(test)
-        time.sleep(1)  # Add a small delay between tests
+    results = run_tests(tests)
     
     # Print summary
     print("\n\n=== Test Summary ===\n")
@@ -82,4 +92,4 @@ def main():
     return 1 if failed > 0 else 0
 
 if __name__ == "__main__":
-    sys.exit(main()) 
\ No newline at end of file
+    sys.exit(main()) 
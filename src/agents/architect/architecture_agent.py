@@ -1,19 +1,95 @@
+import os
+import re
+import asyncio
+import hashlib
+import inspect
 import logging
-from typing import Dict, Any, List, Tuple
+from dataclasses import dataclass, fields
+from typing import Dict, Any, List, Optional, Tuple
+from jinja2 import Template, TemplateNotFound
 
 from src.agents.base.base_agent import BaseAgent
-from src.services.llm.llm_service import LLMService
-from src.utils.template_utils import load_template
+from src.services.llm.llm_service import LLMService, LLMSession
+from src.services.llm.cache import LLMCache, is_error_response
+from src.services.llm.batching import BatchingLLM
+from src.utils.template_utils import load_template, template_dir
+from src.utils import json_utils
 
 logger = logging.getLogger(__name__)
 
+# Fenced blocks in LLM responses: any code block, and a (possibly json-tagged) JSON block
+_CODE_RE = re.compile(r'```(?:\w+)?\s*([\s\S]*?)\s*```')
+_JSON_RE = re.compile(r'```(?:json)?\s*([\s\S]*?)\s*```')
+
+# Line markers recognized by the plain-text findings parser, and the
+# translation that turns a header like "Critical Issues:" into "critical_issues"
+_MARKER_CHARS = frozenset('#*-')
+_BULLET_CHARS = frozenset('*-')
+_SECTION_NAME_TABLE = str.maketrans({':': None, ' ': '_'})
+
+# Critical issues explicitly tagged with a low severity, e.g. "[Low] ..." or "Info: ..."
+_LOW_SEVERITY_RE = re.compile(r'^[\[(]?\s*(?:low|minor|info|informational)\b', re.IGNORECASE)
+
+# Comment and whitespace patterns used to normalize code before semantic cache lookups
+_BLOCK_COMMENT_RE = re.compile(r'/\*[\s\S]*?\*/')
+_LINE_COMMENT_RE = re.compile(r'^\s*(?:#|//).*$', re.MULTILINE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Vector DB collection holding completed reviews for the semantic cache
+REVIEW_CACHE_COLLECTION = "architecture_reviews"
+
+@dataclass
+class ReviewMsg:
+    """Fields of a review/generation message accepted by ArchitectureAgent.process."""
+    code: str = ""
+    cloud_provider: str = "aws"
+    iac_type: str = "terraform"
+    requirements: str = ""
+    task: str = ""
+    task_id: Optional[str] = None
+    
+    @classmethod
+    def from_message(cls, message: Dict[str, Any]) -> "ReviewMsg":
+        """Build a ReviewMsg from a message dict, ignoring unknown keys."""
+        return cls(**{key: message[key] for key in message.keys() & _REVIEW_MSG_FIELDS})
+
+_REVIEW_MSG_FIELDS = frozenset(field.name for field in fields(ReviewMsg))
+
+def _normalize_code(code: str) -> str:
+    """Strip comments and collapse whitespace so trivially different code compares equal."""
+    code = _BLOCK_COMMENT_RE.sub(' ', code)
+    code = _LINE_COMMENT_RE.sub(' ', code)
+    return _WHITESPACE_RE.sub(' ', code).strip()
+
+# Review/improve templates (architecture_<kind>_<iac_type>.j2) that exist, found
+# once at import and preloaded; other IaC types use the inline prompts without
+# another filesystem lookup per review
+_ARCHITECTURE_TEMPLATES = frozenset(
+    name for name in os.listdir(template_dir)
+    if name.startswith("architecture_") and name.endswith(".j2")
+)
+
+def _load_architecture_template(template_name: str) -> Template:
+    """Load an architecture template, failing fast for ones that don't exist."""
+    if template_name not in _ARCHITECTURE_TEMPLATES:
+        raise TemplateNotFound(template_name)
+    return load_template(template_name)
+
+def _preload_templates() -> None:
+    """Warm the load_template cache with the review/improve templates that exist."""
+    for template_name in _ARCHITECTURE_TEMPLATES:
+        load_template(template_name)
+
+_preload_templates()
+
 class ArchitectureAgent(BaseAgent):
     """
     Agent responsible for reviewing and improving infrastructure architecture.
     Applies best practices from cloud provider well-architected frameworks.
     """
     
-    def __init__(self, llm_service: LLMService, vector_db_service=None, config: Dict[str, Any] = None):
+    def __init__(self, llm_service: LLMService, vector_db_service=None, config: Dict[str, Any] = None,
+                 llm_cache: Optional[LLMCache] = None):
         # Define the agent's capabilities
         capabilities = [
             "architecture_review",
@@ -33,6 +109,20 @@ class ArchitectureAgent(BaseAgent):
             config=config
         )
         
+        # Cache for LLM completions so identical review prompts are not re-sent to the model
+        self.llm_cache = llm_cache or LLMCache(
+            maxsize=self.config.get("llm_cache_size", 1024),
+            ttl=self.config.get("llm_cache_ttl", 3600)
+        )
+        
+        # Optionally coalesce completion requests from concurrent reviews into batches
+        batch_window = self.config.get("llm_batch_window")
+        if batch_window:
+            self.llm_service = BatchingLLM(self.llm_service, window=batch_window)
+        
+        # Bound the number of in-flight LLM calls (e.g. from process_batch) to respect rate limits
+        self._llm_semaphore = asyncio.Semaphore(self.config.get("llm_concurrency", 8))
+        
         logger.info("Architecture agent initialized")
         
     async def process(self, message: Dict[str, Any]) -> Dict[str, Any]:
@@ -45,37 +135,35 @@ class ArchitectureAgent(BaseAgent):
         Returns:
             Dictionary with review results and improved code
         """
-        code = message.get("code", "")
-        cloud_provider = message.get("cloud_provider", "aws")
-        iac_type = message.get("iac_type", "terraform")
-        requirements = message.get("requirements", "")
-        task = message.get("task", "")
+        msg = ReviewMsg.from_message(message)
+        code = msg.code
+        cloud_provider = msg.cloud_provider
+        iac_type = msg.iac_type
         
         # If code is empty and requirements are provided, generate infrastructure code
-        if not code and requirements:
-            logger.info(f"Generating {iac_type} infrastructure for {cloud_provider} based on requirements")
+        if not code and msg.requirements:
+            logger.info("Generating %s infrastructure for %s based on requirements", iac_type, cloud_provider)
             
             # Generate infrastructure code using LLM
             prompt = f"""
             You are an expert cloud architect specializing in {cloud_provider} infrastructure.
             Generate {iac_type} code for the following requirements:
             
-            TASK: {task}
-            REQUIREMENTS: {requirements}
+            TASK: {msg.task}
+            REQUIREMENTS: {msg.requirements}
             
             The code should follow best practices for {cloud_provider} and be production-ready.
             Return ONLY the {iac_type} code without any explanations, wrapped in triple backticks.
             """
             
             try:
-                generated_code = await self.llm_service.generate_completion(prompt)
-                code = self._extract_code_from_text(generated_code)
+                code = await self._extract_code_from_text_stream(prompt)
                 
                 # Now review the generated code
                 improved_code, findings = await self.review_architecture(code, cloud_provider, iac_type)
                 
                 return {
-                    "task_id": message.get("task_id"),
+                    "task_id": msg.task_id,
                     "original_code": code,
                     "improved_code": improved_code,
                     "findings": findings,
@@ -83,9 +171,9 @@ class ArchitectureAgent(BaseAgent):
                     "iac_type": iac_type
                 }
             except Exception as e:
-                logger.error(f"Error generating infrastructure: {e}")
+                logger.error("Error generating infrastructure: %s", e)
                 return {
-                    "task_id": message.get("task_id"),
+                    "task_id": msg.task_id,
                     "original_code": "",
                     "improved_code": "",
                     "findings": {"error": str(e)},
@@ -97,7 +185,7 @@ class ArchitectureAgent(BaseAgent):
         improved_code, findings = await self.review_architecture(code, cloud_provider, iac_type)
         
         return {
-            "task_id": message.get("task_id"),
+            "task_id": msg.task_id,
             "original_code": code,
             "improved_code": improved_code,
             "findings": findings,
@@ -119,17 +207,17 @@ class ArchitectureAgent(BaseAgent):
                 - Improved infrastructure code
                 - Dictionary of architectural findings and recommendations
         """
-        logger.info(f"Reviewing {iac_type} architecture for {cloud_provider}")
+        logger.info("Reviewing %s architecture for %s", iac_type, cloud_provider)
         
         # Analyze architecture using LLM
         template_name = f"architecture_review_{iac_type}.j2"
         try:
-            analysis_prompt = load_template(template_name).render(
+            analysis_prompt = _load_architecture_template(template_name).render(
                 code=code,
                 cloud_provider=cloud_provider
             )
         except Exception as e:
-            logger.warning(f"Failed to load template {template_name}, falling back to default: {e}")
+            logger.warning("Failed to load template %s, falling back to default: %s", template_name, e)
             analysis_prompt = f"""
             You are an expert cloud architect specializing in {cloud_provider} infrastructure.
             Review the following {iac_type} code and identify architectural issues, areas for improvement,
@@ -154,78 +242,265 @@ class ArchitectureAgent(BaseAgent):
             Each key should contain an array of findings or recommendations.
             """
         
+        # Reuse a previous review of the same or near-identical code when available
+        normalized_code = _normalize_code(code)
+        similar_review = await self._find_similar_review(normalized_code, cloud_provider, iac_type)
+        if similar_review is not None and similar_review["normalized_code"] == normalized_code:
+            logger.info("Reusing cached architecture review for identical code")
+            return similar_review["improved_code"], similar_review["findings"]
+        
+        cacheable = True
         try:
-            analysis_result = await self.llm_service.generate_completion(analysis_prompt)
-            findings = self._parse_findings(analysis_result)
+            session = None
+            if similar_review is not None:
+                logger.info("Reusing findings from a similar architecture review")
+                findings = similar_review["findings"]
+            else:
+                session = self._new_llm_session()
+                analysis_result = await self._cached_completion(analysis_prompt, session=session)
+                findings = self._parse_findings(analysis_result)
+                # Don't let an LLM outage poison the semantic cache with empty findings
+                cacheable = not is_error_response(analysis_result)
+                # A cache hit never reached the model, so there is nothing to follow up on
+                if session is not None and not session.history:
+                    session = None
             
             # If no critical issues found, return original code with findings
             if not self._has_critical_issues(findings):
                 logger.info("No critical architecture issues found")
-                return code, findings
-                
-            # Generate improved code
-            template_name = f"architecture_improve_{iac_type}.j2"
-            try:
-                improvement_prompt = load_template(template_name).render(
-                    original_code=code,
-                    findings=findings,
-                    cloud_provider=cloud_provider
-                )
-            except Exception as e:
-                logger.warning(f"Failed to load template {template_name}, falling back to default: {e}")
-                improvement_prompt = f"""
-                You are an expert cloud architect specializing in {cloud_provider} infrastructure.
-                Improve the following {iac_type} code based on these architectural findings:
+                improved_code = code
+            else:
+                improved_code = await self._improve_code(code, findings, cloud_provider, iac_type, session=session)
+            
+        except Exception as e:
+            logger.error("Error during architecture review: %s", e)
+            return code, {"error": str(e)}
+        
+        if cacheable:
+            await self._store_review(normalized_code, cloud_provider, iac_type, improved_code, findings)
+        return improved_code, findings
+    
+    async def _improve_code(
+        self,
+        code: str,
+        findings: Dict[str, Any],
+        cloud_provider: str,
+        iac_type: str,
+        session: Optional[LLMSession] = None
+    ) -> str:
+        """
+        Rewrite infrastructure code to address architectural findings.
+        
+        Args:
+            code: The infrastructure code to improve
+            findings: Findings returned by the architecture analysis
+            cloud_provider: The cloud provider (aws, azure, gcp)
+            iac_type: The infrastructure as code type (terraform, ansible, etc.)
+            session: Optional LLM session that already holds the analysis of the code
+            
+        Returns:
+            Improved code, or the original code if no improvement could be generated
+        """
+        if session is not None:
+            # The model has already seen the code in this session; ask a follow-up
+            # instead of sending the whole code block a second time.
+            improvement_prompt = f"""
+            Rewrite the {iac_type} code you just reviewed to address these architectural findings,
+            particularly the critical ones:
+
+            {self._format_findings_text(findings)}
+
+            Focus on implementing the top recommendations while preserving the original functionality.
+
+            Return ONLY the improved code without any explanations, wrapped in triple backticks.
+            """
+            # The follow-up prompt doesn't contain the code, so key the cache on its hash too
+            code_hash = hashlib.sha256(code.encode("utf-8")).hexdigest()
+            logger.info("Generating improved infrastructure code in the review session")
+            improved_code_response = await self._cached_completion(
+                improvement_prompt,
+                session=session,
+                cache_prompt=f"code_sha256:{code_hash}\n{improvement_prompt}"
+            )
+            return self._finish_improvement(code, improved_code_response)
+        
+        template_name = f"architecture_improve_{iac_type}.j2"
+        try:
+            improvement_prompt = _load_architecture_template(template_name).render(
+                original_code=code,
+                findings=findings,
+                cloud_provider=cloud_provider
+            )
+        except Exception as e:
+            logger.warning("Failed to load template %s, falling back to default: %s", template_name, e)
+            improvement_prompt = f"""
+            You are an expert cloud architect specializing in {cloud_provider} infrastructure.
+            Improve the following {iac_type} code based on these architectural findings:
 
-                ORIGINAL CODE:
-                ```
-                {code}
-                ```
+            ORIGINAL CODE:
+            ```
+            {code}
+            ```
 
-                ARCHITECTURAL FINDINGS:
-                {self._format_findings_text(findings)}
+            ARCHITECTURAL FINDINGS:
+            {self._format_findings_text(findings)}
 
-                Rewrite the {iac_type} code to address these issues, particularly the critical ones.
-                Focus on implementing the top recommendations while preserving the original functionality.
+            Rewrite the {iac_type} code to address these issues, particularly the critical ones.
+            Focus on implementing the top recommendations while preserving the original functionality.
 
-                Return ONLY the improved code without any explanations, wrapped in triple backticks.
-                """
+            Return ONLY the improved code without any explanations, wrapped in triple backticks.
+            """
+        
+        logger.info("Generating improved infrastructure code")
+        improved_code_response = await self._cached_completion(improvement_prompt)
+        return self._finish_improvement(code, improved_code_response)
+    
+    def _finish_improvement(self, code: str, improved_code_response: str) -> str:
+        """Extract improved code from a completion, falling back to the original code."""
+        improved_code = self._extract_code_from_text(improved_code_response)
+        
+        if not improved_code or improved_code.strip() == "":
+            logger.warning("Failed to generate improved code, returning original")
+            return code
             
-            logger.info("Generating improved infrastructure code")
-            improved_code_response = await self.llm_service.generate_completion(improvement_prompt)
-            improved_code = self._extract_code_from_text(improved_code_response)
+        logger.info("Generated improved infrastructure code")
+        return improved_code
+    
+    async def _find_similar_review(
+        self,
+        normalized_code: str,
+        cloud_provider: str,
+        iac_type: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a previous review of similar code in the vector database.
+        
+        Args:
+            normalized_code: Code normalized with _normalize_code
+            cloud_provider: The cloud provider (aws, azure, gcp)
+            iac_type: The infrastructure as code type (terraform, ansible, etc.)
             
-            if not improved_code or improved_code.strip() == "":
-                logger.warning("Failed to generate improved code, returning original")
-                return code, findings
-                
-            logger.info("Generated improved infrastructure code")
-            return improved_code, findings
+        Returns:
+            Dictionary with "normalized_code", "improved_code" and "findings",
+            or None if no review scored above the similarity threshold
+        """
+        if not self.vector_db_service or not self.config.get("semantic_cache", True):
+            return None
+        
+        try:
+            results = await self.vector_db_service.query_similar(
+                collection_name=REVIEW_CACHE_COLLECTION,
+                query_text=normalized_code,
+                n_results=1,
+                where={"cloud_provider": cloud_provider, "iac_type": iac_type}
+            )
+            threshold = self.config.get("semantic_cache_threshold", 0.95)
+            if not results or results[0]["similarity"] < threshold:
+                return None
             
+            review = json_utils.loads(results[0]["metadata"]["review"])
+            return {
+                "normalized_code": results[0]["content"],
+                "improved_code": review["improved_code"],
+                "findings": review["findings"]
+            }
         except Exception as e:
-            logger.error(f"Error during architecture review: {e}")
-            return code, {"error": str(e)}
+            logger.warning("Semantic review cache lookup failed: %s", e)
+            return None
+    
+    async def _store_review(
+        self,
+        normalized_code: str,
+        cloud_provider: str,
+        iac_type: str,
+        improved_code: str,
+        findings: Dict[str, Any]
+    ) -> None:
+        """Store a completed review in the vector database for later semantic lookups."""
+        if not self.vector_db_service or not self.config.get("semantic_cache", True):
+            return
+        
+        try:
+            document_id = hashlib.sha256(
+                f"{cloud_provider}:{iac_type}:{normalized_code}".encode("utf-8")
+            ).hexdigest()
+            await self.vector_db_service.store_document(
+                collection_name=REVIEW_CACHE_COLLECTION,
+                document_id=document_id,
+                text=normalized_code,
+                metadata={
+                    "cloud_provider": cloud_provider,
+                    "iac_type": iac_type,
+                    "review": json_utils.dumps({"improved_code": improved_code, "findings": findings})
+                }
+            )
+        except Exception as e:
+            logger.warning("Failed to store architecture review in semantic cache: %s", e)
+    
+    def _new_llm_session(self) -> Optional[LLMSession]:
+        """
+        Start an LLM session for a review, if the LLM service supports them.
+        
+        Returns:
+            A new LLMSession, or None if sessions are disabled or unavailable
+        """
+        if not self.config.get("llm_sessions", True):
+            return None
+        new_session = getattr(self.llm_service, "new_session", None)
+        if new_session is None:
+            return None
+        session = new_session(system_prompt="You are an expert cloud architect.")
+        return session if isinstance(session, LLMSession) else None
+    
+    async def _cached_completion(
+        self,
+        prompt: str,
+        session: Optional[LLMSession] = None,
+        cache_prompt: Optional[str] = None
+    ) -> str:
+        """
+        Generate a completion, serving repeated prompts from the LLM cache.
+        
+        Args:
+            prompt: The prompt to send to the model
+            session: Optional LLM session to send the prompt in
+            cache_prompt: Text to key the cache on, if the prompt alone is not unique
+            
+        Returns:
+            The model's completion text
+        """
+        key = LLMCache.cache_key(getattr(self.llm_service, "model", ""), cache_prompt or prompt)
+        cached = await self.llm_cache.get(key)
+        if cached is not None:
+            logger.info("LLM cache hit")
+            return cached
+        
+        async with self._llm_semaphore:
+            if session is not None:
+                response = await session.ask(prompt)
+            else:
+                response = await self.llm_service.generate_completion(prompt)
+        if not is_error_response(response):
+            await self.llm_cache.set(key, response)
+        return response
     
     def _parse_findings(self, analysis_result: str) -> Dict[str, Any]:
         """Parse the LLM analysis result into structured findings"""
         # Try to parse as JSON first
-        import json
-        import re
-        
         try:
             # Try to extract JSON if wrapped in backticks
-            json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', analysis_result)
+            json_match = _JSON_RE.search(analysis_result)
             if json_match:
                 json_str = json_match.group(1)
-                return json.loads(json_str)
+                return json_utils.loads(json_str)
                 
             # Try direct JSON parsing
-            return json.loads(analysis_result)
-        except (json.JSONDecodeError, AttributeError):
+            return json_utils.loads(analysis_result)
+        except (json_utils.JSONDecodeError, AttributeError):
             # If JSON parsing fails, fall back to structured text parsing
             logger.warning("Failed to parse JSON findings, falling back to text parsing")
             
-            findings = {
+            findings: Dict[str, List[str]] = {
                 "reliability": [],
                 "security": [],
                 "cost_optimization": [],
@@ -235,44 +510,99 @@ class ArchitectureAgent(BaseAgent):
                 "recommendations": []
             }
             
-            # Simple parsing logic for section headers and bullet points
-            current_section = None
-            for line in analysis_result.split('\n'):
+            # Single pass over the lines: only lines starting with a marker character
+            # ('#', '*' or '-') can be a section header or a bullet point
+            current_section: Optional[str] = None
+            for line in analysis_result.splitlines():
                 line = line.strip()
+                if not line or line[0] not in _MARKER_CHARS:
+                    continue
                 
                 # Check for section headers
-                if line.startswith('##') or line.startswith('**'):
-                    section_name = line.lstrip('#').lstrip('*').strip().lower()
-                    section_name = section_name.replace(':', '').replace(' ', '_')
-                    
-                    if section_name in findings:
-                        current_section = section_name
-                    else:
-                        current_section = None
+                if line.startswith(('##', '**')):
+                    section_name = line.lstrip('#').lstrip('*').strip().lower().translate(_SECTION_NAME_TABLE)
+                    current_section = section_name if section_name in findings else None
                         
                 # Check for bullet points
-                elif current_section and (line.startswith('-') or line.startswith('*')):
+                elif current_section and line[0] in _BULLET_CHARS:
                     item = line.lstrip('-').lstrip('*').strip()
-                    if item and current_section in findings:
+                    if item:
                         findings[current_section].append(item)
             
             return findings
     
     def _has_critical_issues(self, findings: Dict[str, Any]) -> bool:
-        """Check if findings contain critical issues that require fixing"""
-        return len(findings.get("critical_issues", [])) > 0
+        """
+        Check if findings contain critical issues that require fixing.
+        
+        Issues tagged with a low severity (as text prefix or a "severity" key)
+        don't warrant a rewrite; untagged issues count as critical.
+        """
+        for issue in findings.get("critical_issues", []):
+            severity = issue.get("severity", "") if isinstance(issue, dict) else issue
+            if not _LOW_SEVERITY_RE.match(str(severity)):
+                return True
+        return False
     
     def _format_findings_text(self, findings: Dict[str, Any]) -> str:
         """Format findings dictionary as text for prompts"""
-        text = ""
+        parts: List[str] = []
         for category, issues in findings.items():
             if issues:
-                text += f"{category.upper()}:\n"
-                for issue in issues:
-                    text += f"- {issue}\n"
-                text += "\n"
-        return text
+                parts.append(f"{category.upper()}:\n")
+                parts.extend(f"- {issue}\n" for issue in issues)
+                parts.append("\n")
+        return "".join(parts)
+        
+    async def _extract_code_from_text_stream(self, prompt: str) -> str:
+        """
+        Generate a completion and return its first code block as soon as it is complete.
         
+        When the LLM service supports streaming, chunks are scanned as they
+        arrive and the stream is closed once the closing fence is received,
+        without waiting for any trailing prose. Otherwise this falls back to
+        a regular (cached) completion.
+        
+        Args:
+            prompt: The prompt to send to the model
+            
+        Returns:
+            Extracted code
+            
+        Raises:
+            RuntimeError: If the stream reports an error
+        """
+        if not inspect.isasyncgenfunction(getattr(self.llm_service, "generate_stream", None)):
+            return self._extract_code_from_text(await self._cached_completion(prompt))
+        
+        key = LLMCache.cache_key(getattr(self.llm_service, "model", ""), prompt)
+        cached = await self.llm_cache.get(key)
+        if cached is not None:
+            logger.info("LLM cache hit")
+            return self._extract_code_from_text(cached)
+        
+        buffer = ""
+        complete = False
+        async with self._llm_semaphore:
+            stream = self.llm_service.generate_stream(prompt)
+            try:
+                async for chunk in stream:
+                    if is_error_response(chunk):
+                        raise RuntimeError(f"Streaming generation failed: {chunk}")
+                    buffer += chunk
+                    # Only re-scan once a chunk could have completed a fence
+                    if "`" in chunk and _CODE_RE.search(buffer):
+                        complete = True
+                        break
+            finally:
+                await stream.aclose()
+        
+        # The buffer up to the closing fence is enough to re-extract the same code later;
+        # without the fence the stream may have been cut short, so don't cache it
+        if complete:
+            await self.llm_cache.set(key, buffer)
+        return self._extract_code_from_text(buffer)
+    
     def _extract_code_from_text(self, text: str) -> str:
         """
         Extract code blocks from text, typically from LLM responses.
@@ -286,14 +616,12 @@ class ArchitectureAgent(BaseAgent):
         if not text:
             return ""
             
-        # Try to extract code from markdown code blocks
-        import re
-        code_pattern = r'```(?:\w+)?\s*([\s\S]*?)\s*```'
-        code_matches = re.findall(code_pattern, text)
-        
-        if code_matches:
-            # Return the first code block found
-            return code_matches[0].strip()
+        # Try to extract code from markdown code blocks; only the first block
+        # is used, so stop scanning as soon as it is found
+        code_match = _CODE_RE.search(text)
+        
+        if code_match:
+            return code_match.group(1).strip()
         
         # If no code blocks found, return the entire text
         # This handles cases where the LLM forgets to wrap code in backticks
@@ -6,12 +6,27 @@ ArgoCD deployments and synchronization.
 """
 
 import logging
+from dataclasses import dataclass, field, fields
 from typing import Dict, List, Any, Optional
 
 from src.agents.base.base_agent import BaseAgent
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class ArgoCDRequest:
+    """Fields of a request accepted by ArgoCDAgent.process."""
+    action: str = ""
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    task_id: str = ""
+    
+    @classmethod
+    def from_input(cls, input_data: Dict[str, Any]) -> "ArgoCDRequest":
+        """Build an ArgoCDRequest from the input dict, ignoring unknown keys."""
+        return cls(**{key: input_data[key] for key in input_data.keys() & _ARGOCD_REQUEST_FIELDS})
+
+_ARGOCD_REQUEST_FIELDS = frozenset(f.name for f in fields(ArgoCDRequest))
+
 class ArgoCDAgent(BaseAgent):
     """
     Specialized agent for ArgoCD operations and deployments.
@@ -67,9 +82,10 @@ class ArgoCDAgent(BaseAgent):
         """
         self.update_state("processing")
         
-        action = input_data.get("action", "")
-        parameters = input_data.get("parameters", {})
-        task_id = input_data.get("task_id", "")
+        request = ArgoCDRequest.from_input(input_data)
+        action = request.action
+        parameters = request.parameters
+        task_id = request.task_id
         
         try:
             # First, think about how to approach the task
@@ -119,7 +135,7 @@ class ArgoCDAgent(BaseAgent):
             }
             
         except Exception as e:
-            logger.error(f"Error during ArgoCD operation: {str(e)}")
+            logger.error("Error during ArgoCD operation: %s", e)
             self.update_state("error")
             return {
                 "task_id": task_id,
@@ -143,7 +159,7 @@ class ArgoCDAgent(BaseAgent):
         """
         # This would integrate with the ArgoCD API in a real implementation
         # For now, we'll simulate the response
-        logger.info(f"Creating ArgoCD application: {name} in namespace {namespace}")
+        logger.info("Creating ArgoCD application: %s in namespace %s", name, namespace)
         
         # Placeholder for ArgoCD application creation
         return {
@@ -167,7 +183,7 @@ class ArgoCDAgent(BaseAgent):
         """
         # Placeholder for ArgoCD sync operation
         app_name = parameters.get("name", "unknown")
-        logger.info(f"Syncing ArgoCD application: {app_name}")
+        logger.info("Syncing ArgoCD application: %s", app_name)
         
         return {
             "status": "success", 
@@ -186,7 +202,7 @@ class ArgoCDAgent(BaseAgent):
         """
         # Placeholder for ArgoCD application deletion
         app_name = parameters.get("name", "unknown")
-        logger.info(f"Deleting ArgoCD application: {app_name}")
+        logger.info("Deleting ArgoCD application: %s", app_name)
         
         return {
             "status": "success", 
@@ -205,7 +221,7 @@ class ArgoCDAgent(BaseAgent):
         """
         # Placeholder for getting ArgoCD application status
         app_name = parameters.get("name", "unknown")
-        logger.info(f"Getting status for ArgoCD application: {app_name}")
+        logger.info("Getting status for ArgoCD application: %s", app_name)
         
         return {
             "status": "success", 
@@ -6,18 +6,29 @@ It provides common functionality and interfaces for all agents in the system.
 """
 
 import os
+import re
 import time
 import uuid
-import json
+import asyncio
+import itertools
+import hashlib
+import inspect
 import logging
-from typing import Dict, List, Any, Optional, Callable
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Any, Optional, Callable, Sequence, Tuple
 from abc import ABC, abstractmethod
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from src.services.llm.cache import is_error_response
+from src.utils import json_utils
+
+# Embeddings of recent memory queries, keyed on (vector DB service id, SHA-256 of
+# the query) and stored as (embedding, expiry) so repeated think() lookups don't re-embed
+_QUERY_EMB_CACHE: "OrderedDict[Tuple[int, bytes], Tuple[List[float], float]]" = OrderedDict()
+_QUERY_EMB_CACHE_SIZE = 1024
+_QUERY_EMB_CACHE_TTL = 3600
+
+# Collapses whitespace when normalizing memory queries
+_WHITESPACE_RE = re.compile(r'\s+')
 
 class BaseAgent(ABC):
     """
@@ -29,7 +40,7 @@ class BaseAgent(ABC):
         self,
         name: str,
         description: str,
-        capabilities: List[str],
+        capabilities: Sequence[str],
         llm_service: Any,
         vector_db_service: Optional[Any] = None,
         config: Optional[Dict[str, Any]] = None
@@ -40,7 +51,7 @@ class BaseAgent(ABC):
         Args:
             name: The name of the agent
             description: A description of the agent's purpose
-            capabilities: List of capabilities this agent provides
+            capabilities: Capabilities this agent provides
             llm_service: Service for language model interactions
             vector_db_service: Optional service for vector database operations
             config: Optional configuration parameters
@@ -52,12 +63,49 @@ class BaseAgent(ABC):
         self.llm_service = llm_service
         self.vector_db_service = vector_db_service
         self.config = config or {}
-        self.memory = []
+        # Recent memories only; the vector DB (when configured) keeps the full history
+        self.memory: Deque[Dict[str, Any]] = deque(maxlen=int(self.config.get("memory_max", 10000)))
         self.creation_time = time.time()
-        self.last_active_time = time.time()
+        # Activity is tracked on the monotonic clock, which is cheaper to read and
+        # never jumps on NTP adjustments; last_active_time is derived from it
+        self._mono_start = time.monotonic()
+        self.last_active_ns = time.monotonic_ns()
         self.state = "idle"  # Initialize state as idle
         self.logger = logging.getLogger(f"agent.{name}")
+        self._cache_hits = 0  # think() calls answered from a similar past thought
+        
+        # The think() prompt only varies in the task and context; build the rest once
+        self._think_header = f"""
+        As {name}, an AI agent responsible for {description}, 
+        think through the following task step by step:
+        
+        """
+        self._think_footer = f"""
         
+        Consider:
+        1. What information do I need to complete this task?
+        2. What are potential challenges or edge cases?
+        3. What best practices should I apply?
+        4. What is the optimal approach?
+        
+        Capabilities at my disposal: {', '.join(capabilities)}
+        """
+        
+        # Memories waiting to be written to the vector DB by the background flusher
+        self._mem_queue: asyncio.Queue = asyncio.Queue()
+        self._flusher: Optional[asyncio.Task] = None
+        # Memory ids are this agent's UUID plus a sequence number, which is unique
+        # across processes without generating a new UUID per memory
+        self._mem_seq = itertools.count()
+        
+        # Recent retrieve_similar_memories() results keyed on (memory type, n_results, normalized query hash)
+        self._query_result_cache: "OrderedDict[Tuple[Optional[str], int, bytes], List[Dict[str, Any]]]" = OrderedDict()
+        
+    @property
+    def last_active_time(self) -> float:
+        """Wall-clock time of the agent's last activity, in seconds since the epoch."""
+        return self.creation_time + (self.last_active_ns / 1e9 - self._mono_start)
+    
     def __str__(self) -> str:
         """String representation of the agent."""
         return f"{self.name} Agent (ID: {self.id[:8]}, State: {self.state})"
@@ -75,6 +123,21 @@ class BaseAgent(ABC):
         """
         pass
     
+    async def process_batch(self, inputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Process several independent inputs concurrently.
+        
+        The LLM calls of all inputs are in flight at the same time, so a batch
+        takes roughly as long as its slowest input rather than the sum of all.
+        
+        Args:
+            inputs: List of inputs accepted by process()
+            
+        Returns:
+            List of results in the same order as the inputs
+        """
+        return list(await asyncio.gather(*(self.process(input_data) for input_data in inputs)))
+    
     async def think(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generate thoughts about the input data before taking action.
@@ -85,7 +148,7 @@ class BaseAgent(ABC):
         Returns:
             Thoughts and analysis about the input
         """
-        self.logger.info(f"Agent {self.name} thinking about task: {input_data.get('task_id', 'unknown')}")
+        self.logger.info("Agent %s thinking about task: %s", self.name, input_data.get('task_id', 'unknown'))
         
         # Check for similar past thoughts if vector DB is available
         similar_thoughts = []
@@ -100,9 +163,16 @@ class BaseAgent(ABC):
                 )
                 
                 if similar_thoughts:
-                    self.logger.info(f"Found {len(similar_thoughts)} similar past thoughts")
+                    self.logger.info("Found %d similar past thoughts", len(similar_thoughts))
             except Exception as e:
-                self.logger.error(f"Error retrieving similar thoughts: {str(e)}")
+                self.logger.error("Error retrieving similar thoughts: %s", e)
+        
+        # Reuse a near-identical recent thought instead of asking the LLM again
+        cached_thoughts = self._cached_thoughts(similar_thoughts)
+        if cached_thoughts is not None:
+            self._cache_hits += 1
+            self.logger.info("Agent %s reusing similar past thoughts", self.name)
+            return {"thoughts": cached_thoughts, "agent": self.name, "cache_hit": True}
         
         # Prepare context from similar thoughts
         context = ""
@@ -118,22 +188,10 @@ class BaseAgent(ABC):
                     context += f"Task {i+1}: {sim_task}\n"
                     context += f"Thoughts: {sim_thoughts[:300]}...\n\n"
         
-        prompt = f"""
-        As {self.name}, an AI agent responsible for {self.description}, 
-        think through the following task step by step:
-        
-        {input_data.get('task', 'No task specified')}
-        
-        {context}
-        
-        Consider:
-        1. What information do I need to complete this task?
-        2. What are potential challenges or edge cases?
-        3. What best practices should I apply?
-        4. What is the optimal approach?
-        
-        Capabilities at my disposal: {', '.join(self.capabilities)}
-        """
+        prompt = (
+            f"{self._think_header}{input_data.get('task', 'No task specified')}"
+            f"\n        \n        {context}{self._think_footer}"
+        )
         
         response = await self.llm_service.generate(prompt)
         await self.update_memory({
@@ -145,6 +203,36 @@ class BaseAgent(ABC):
         
         return {"thoughts": response, "agent": self.name}
     
+    def _cached_thoughts(self, similar_thoughts: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Pick past thoughts that are close enough to reuse for the current task.
+        
+        Args:
+            similar_thoughts: Results of retrieve_similar_memories, most similar first
+            
+        Returns:
+            The cached thoughts, or None if no memory is similar and recent enough
+        """
+        if not similar_thoughts:
+            return None
+        
+        best = similar_thoughts[0]
+        if best.get("similarity", 0) < self.config.get("think_cache_threshold", 0.95):
+            return None
+        
+        memory = best.get("memory", {})
+        thoughts = memory.get("thoughts")
+        if not thoughts or is_error_response(thoughts):
+            return None
+        
+        # Expire old thoughts (default: 7 days)
+        ttl = self.config.get("think_cache_ttl", 7 * 24 * 3600)
+        timestamp = memory.get("timestamp")
+        if not isinstance(timestamp, (int, float)) or time.time() - timestamp > ttl:
+            return None
+        
+        return thoughts
+    
     def update_state(self, new_state: str) -> None:
         """
         Update the agent's state.
@@ -154,38 +242,111 @@ class BaseAgent(ABC):
         """
         valid_states = ["idle", "processing", "error"]
         if new_state not in valid_states:
-            self.logger.warning(f"Invalid state: {new_state}. Using 'idle' instead.")
+            self.logger.warning("Invalid state: %s. Using 'idle' instead.", new_state)
             new_state = "idle"
         
         old_state = self.state
         self.state = new_state
-        self.last_active_time = time.time()
-        self.logger.info(f"Agent {self.name} state change: {old_state} -> {new_state}")
+        self.last_active_ns = time.monotonic_ns()
+        self.logger.info("Agent %s state change: %s -> %s", self.name, old_state, new_state)
     
     async def update_memory(self, entry: Dict[str, Any]) -> None:
-        """Add an entry to the agent's memory."""
+        """
+        Add an entry to the agent's memory.
+        
+        The entry is queued for the vector DB and written in a batch by a
+        background task, so this returns without waiting on the database.
+        """
         self.memory.append(entry)
+        self.last_active_ns = time.monotonic_ns()
         if self.vector_db_service:
             try:
                 # Convert complex objects to strings for storage
-                memory_text = json.dumps(entry, default=str)
-                memory_id = str(uuid.uuid4())
-                
-                # Store in vector database
-                await self.vector_db_service.store_document(
+                memory_text = json_utils.dumps(entry, default=str)
+                memory_id = f"{self.id}-{next(self._mem_seq)}"
+                metadata = {
+                    "agent_id": self.id,
+                    "agent_name": self.name,
+                    "entry_type": entry.get("type", "unknown"),
+                    "timestamp": entry.get("timestamp", time.time())
+                }
+            except Exception as e:
+                self.logger.error("Failed to serialize memory for vector DB: %s", e)
+                return
+            
+            self._mem_queue.put_nowait((memory_id, memory_text, metadata))
+            
+            # Cached query results for this memory type (or unfiltered) may now be stale
+            entry_type = metadata["entry_type"]
+            for key in [key for key in self._query_result_cache if key[0] in (None, entry_type)]:
+                del self._query_result_cache[key]
+            if self._flusher is None or self._flusher.done():
+                self._flusher = asyncio.create_task(self._flush_memories())
+    
+    async def _flush_memories(self) -> None:
+        """Background task that writes queued memories every flush interval until the queue is empty."""
+        interval = self.config.get("memory_flush_interval", 0.5)
+        while not self._mem_queue.empty():
+            await asyncio.sleep(interval)
+            await self._drain_memory_queue()
+    
+    async def _drain_memory_queue(self) -> None:
+        """Write all queued memories to the vector DB in batches."""
+        batch_size = self.config.get("memory_batch_size", 32)
+        while not self._mem_queue.empty():
+            batch = []
+            while len(batch) < batch_size and not self._mem_queue.empty():
+                batch.append(self._mem_queue.get_nowait())
+            try:
+                await self._store_memories(batch)
+            finally:
+                for _ in batch:
+                    self._mem_queue.task_done()
+    
+    async def _store_memories(self, batch: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        """
+        Store a batch of memories in the vector database.
+        
+        Args:
+            batch: (memory_id, memory_text, metadata) tuples
+        """
+        try:
+            store_bulk = getattr(self.vector_db_service, "store_documents_bulk", None)
+            if inspect.iscoroutinefunction(store_bulk):
+                await store_bulk(
                     collection_name="agent_memories",
-                    document_id=memory_id,
-                    text=memory_text,
-                    metadata={
-                        "agent_id": self.id,
-                        "agent_name": self.name,
-                        "entry_type": entry.get("type", "unknown"),
-                        "timestamp": entry.get("timestamp", time.time())
-                    }
+                    ids=[memory_id for memory_id, _, _ in batch],
+                    texts=[memory_text for _, memory_text, _ in batch],
+                    metadatas=[metadata for _, _, metadata in batch]
                 )
-                self.logger.info(f"Stored memory in vector DB with ID: {memory_id[:8]}")
-            except Exception as e:
-                self.logger.error(f"Failed to store memory in vector DB: {str(e)}")
+            else:
+                # Vector DB services without bulk support get one write per memory
+                for memory_id, memory_text, metadata in batch:
+                    await self.vector_db_service.store_document(
+                        collection_name="agent_memories",
+                        document_id=memory_id,
+                        text=memory_text,
+                        metadata=metadata
+                    )
+            self.logger.info("Stored %d memories in vector DB", len(batch))
+        except Exception as e:
+            self.logger.error("Failed to store memories in vector DB: %s", e)
+    
+    async def flush_memories(self) -> None:
+        """Write all queued memories to the vector DB and wait for in-flight writes."""
+        await self._drain_memory_queue()
+        await self._mem_queue.join()
+    
+    async def aclose(self) -> None:
+        """Flush queued memories and stop the background writer."""
+        await self.flush_memories()
+        if self._flusher is not None and not self._flusher.done():
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        self._flusher = None
     
     async def collaborate(
         self, 
@@ -202,12 +363,12 @@ class BaseAgent(ABC):
         Returns:
             The result of the collaboration
         """
-        self.logger.info(f"Agent {self.name} collaborating with {target_agent.name}")
+        self.logger.info("Agent %s collaborating with %s", self.name, target_agent.name)
         self.update_state("collaborating")
         
         # Prepare the collaboration context
         collab_context = {
-            "task_id": task.get("task_id", str(uuid.uuid4())),
+            "task_id": task["task_id"] if "task_id" in task else str(uuid.uuid4()),
             "initiator_agent": self.name,
             "target_agent": target_agent.name,
             "task": task.get("task", ""),
@@ -218,11 +379,18 @@ class BaseAgent(ABC):
             }
         }
         
-        # First, think about how to approach the collaboration
-        thoughts = await self.think(collab_context)
-        
-        # Then, let the target agent process the task
-        target_response = await target_agent.process(collab_context)
+        if self.config.get("parallel_collab", True):
+            # Thinking and the target's processing are independent, so overlap them
+            thoughts, target_response = await asyncio.gather(
+                self.think(collab_context),
+                target_agent.process(collab_context)
+            )
+        else:
+            # First, think about how to approach the collaboration
+            thoughts = await self.think(collab_context)
+            
+            # Then, let the target agent process the task
+            target_response = await target_agent.process(collab_context)
         
         # Process the combined results
         result = {
@@ -263,38 +431,91 @@ class BaseAgent(ABC):
         if not self.vector_db_service:
             return []
         
+        # Repeated queries (after normalization) are answered from recent results;
+        # update_memory() drops entries that a new memory could change
+        cache_key = (
+            memory_type,
+            n_results,
+            hashlib.sha256(_WHITESPACE_RE.sub(" ", query).strip().lower().encode("utf-8")).digest()
+        )
+        cached_results = self._query_result_cache.get(cache_key)
+        if cached_results is not None:
+            self._query_result_cache.move_to_end(cache_key)
+            return list(cached_results)
+        
         try:
+            # Make sure recently added memories are searchable
+            await self.flush_memories()
+            
             # Build the where clause
             where = {"agent_id": self.id}
             if memory_type:
                 where["entry_type"] = memory_type
             
-            # Query for similar memories
+            # Query for similar memories, reusing a cached query embedding when possible
+            query_kwargs = {}
+            query_embedding = await self._query_embedding(query)
+            if query_embedding is not None:
+                query_kwargs["query_embedding"] = query_embedding
             results = await self.vector_db_service.query_similar(
                 collection_name="agent_memories",
                 query_text=query,
                 n_results=n_results,
-                where=where
+                where=where,
+                **query_kwargs
             )
             
             # Parse the memories
             formatted_results = []
             for result in results:
                 try:
-                    memory_data = json.loads(result["content"])
+                    memory_data = json_utils.loads(result["content"])
                     formatted_results.append({
                         "memory": memory_data,
                         "similarity": result["similarity"],
                         "metadata": result["metadata"]
                     })
-                except json.JSONDecodeError:
-                    self.logger.warning(f"Failed to parse memory: {result['content']}")
+                except json_utils.JSONDecodeError:
+                    self.logger.warning("Failed to parse memory: %s", result['content'])
             
-            return formatted_results
+            self._query_result_cache[cache_key] = formatted_results
+            while len(self._query_result_cache) > self.config.get("query_cache_size", 256):
+                self._query_result_cache.popitem(last=False)
+            return list(formatted_results)
         except Exception as e:
-            self.logger.error(f"Error retrieving memories: {str(e)}")
+            self.logger.error("Error retrieving memories: %s", e)
             return []
     
+    async def _query_embedding(self, query: str) -> Optional[List[float]]:
+        """
+        Get the embedding of a memory query, using the shared LRU cache.
+        
+        Args:
+            query: Text to search for similar memories
+            
+        Returns:
+            The query embedding, or None if the vector DB service can't embed text
+        """
+        embed = getattr(self.vector_db_service, "embed", None)
+        if not inspect.iscoroutinefunction(embed):
+            return None
+        
+        key = (id(self.vector_db_service), hashlib.sha256(query.encode("utf-8")).digest())
+        entry = _QUERY_EMB_CACHE.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            embedding, expires_at = entry
+            if expires_at > now:
+                _QUERY_EMB_CACHE.move_to_end(key)
+                return embedding
+            del _QUERY_EMB_CACHE[key]
+        
+        embedding = await embed(query)
+        _QUERY_EMB_CACHE[key] = (embedding, now + _QUERY_EMB_CACHE_TTL)
+        while len(_QUERY_EMB_CACHE) > _QUERY_EMB_CACHE_SIZE:
+            _QUERY_EMB_CACHE.popitem(last=False)
+        return embedding
+    
     def serialize(self) -> Dict[str, Any]:
         """
         Serialize the agent state to a dictionary.
@@ -310,7 +531,9 @@ class BaseAgent(ABC):
             "state": self.state,
             "creation_time": self.creation_time,
             "last_active_time": self.last_active_time,
+            "idle_seconds": time.monotonic() - self.last_active_ns / 1e9,
             "memory_size": len(self.memory),
             "has_vector_memory": self.vector_db_service is not None,
+            "think_cache_hits": self._cache_hits,
             "status": "online" if self.state == "idle" else self.state  # Add explicit status field
         }
\ No newline at end of file
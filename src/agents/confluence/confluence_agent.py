@@ -5,14 +5,61 @@ This module defines the ConfluenceAgent class that specializes in managing
 Confluence documentation, spaces, and pages for infrastructure documentation.
 """
 
+import asyncio
+import hashlib
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+import aiohttp
+from string import Template
+from typing import Dict, List, Any, Awaitable, Callable, Optional, Tuple
 
 from src.agents.base.base_agent import BaseAgent
-from src.utils.template_utils import load_template
+from src.utils.http_utils import retry_request
 
 logger = logging.getLogger(__name__)
 
+# LLM prompts, parsed once at import and filled in per call
+MARKDOWN_TO_CONFLUENCE_PROMPT = Template("""
+        Convert the following markdown content to Confluence storage format:
+        
+        ```markdown
+        $markdown_content
+        ```
+        
+        Return only the Confluence storage format XML without any additional text.
+        """)
+
+# Separates documents packed into a single batch conversion prompt and its response
+DOCUMENT_DELIMITER = "@@@DOCUMENT_BREAK@@@"
+
+MARKDOWN_BATCH_TO_CONFLUENCE_PROMPT = Template("""
+        Convert each of the following markdown documents to Confluence storage format.
+        The documents are separated by lines containing only $delimiter
+        
+        $documents
+        
+        Return only the Confluence storage format XML for each document, in the same order,
+        separated by lines containing only $delimiter and without any additional text.
+        """)
+
+DOCUMENTATION_PROMPT = Template("""
+        Generate comprehensive Confluence documentation for the following $code_type code:
+        
+        ```$code_type
+        $infrastructure_code
+        ```
+        
+        The documentation should include:
+        1. Overview of what this infrastructure provides
+        2. Architecture diagram description
+        3. Components and their relationships
+        4. Configuration parameters
+        5. Dependencies
+        6. Deployment instructions
+        7. Maintenance procedures
+        
+        Format the response in Confluence storage format.
+        """)
+
 class ConfluenceAgent(BaseAgent):
     """
     Specialized agent for Confluence documentation management.
@@ -59,6 +106,21 @@ class ConfluenceAgent(BaseAgent):
         self.confluence_username = config.get("confluence_username") if config else None
         self.confluence_api_token = config.get("confluence_api_token") if config else None
         
+        # HTTP session for the Confluence REST API, created on first use
+        self._http: Optional[aiohttp.ClientSession] = None
+        
+        # Action handlers used by process(); each takes the request parameters
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+            "create_page": self._handle_create_page,
+            "update_page": self._handle_update_page,
+            "convert_markdown": self._handle_convert_markdown,
+            "generate_documentation": self._handle_generate_documentation,
+            "create_space": self._handle_create_space
+        }
+        
+        # Only these actions benefit from think(); the rest are mechanical
+        self._think_actions = {"generate_documentation", "create_space", "create_page"}
+        
         logger.info("Confluence agent initialized")
     
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -80,53 +142,17 @@ class ConfluenceAgent(BaseAgent):
         task_id = input_data.get("task_id", "")
         
         try:
-            # First, think about how to approach the task
-            thoughts = await self.think(input_data)
+            # First, think about how to approach the task (skipped for mechanical actions)
+            thoughts = await self.think(input_data) if action in self._think_actions else {"thoughts": ""}
             
-            # Process the action based on the type
-            if action == "create_page":
-                result = await self.create_page(
-                    space_key=parameters.get("space_key", ""),
-                    title=parameters.get("title", ""),
-                    content=parameters.get("content", ""),
-                    parent_id=parameters.get("parent_id")
-                )
-            elif action == "update_page":
-                result = await self.update_page(
-                    page_id=parameters.get("page_id", ""),
-                    title=parameters.get("title", ""),
-                    content=parameters.get("content", ""),
-                    version=parameters.get("version", 1)
-                )
-            elif action == "convert_markdown":
-                result = {
-                    "converted_content": await self.convert_markdown_to_confluence(
-                        parameters.get("markdown_content", "")
-                    )
-                }
-            elif action == "generate_documentation":
-                result = {
-                    "documentation": await self.generate_documentation(
-                        parameters.get("infrastructure_code", ""),
-                        parameters.get("code_type", "terraform")
-                    )
-                }
-            elif action == "create_space":
-                result = await self.create_space(
-                    key=parameters.get("key", ""),
-                    name=parameters.get("name", ""),
-                    description=parameters.get("description", "")
-                )
+            # Dispatch the action to its handler
+            handler = self._handlers.get(action)
+            if handler is not None:
+                result = await handler(parameters)
             else:
                 result = {
                     "error": f"Unsupported action: {action}",
-                    "supported_actions": [
-                        "create_page",
-                        "update_page",
-                        "convert_markdown",
-                        "generate_documentation",
-                        "create_space"
-                    ]
+                    "supported_actions": list(self._handlers)
                 }
             
             # Store in memory
@@ -148,7 +174,7 @@ class ConfluenceAgent(BaseAgent):
             }
             
         except Exception as e:
-            logger.error(f"Error during Confluence operation: {str(e)}")
+            logger.error("Error during Confluence operation: %s", e)
             self.update_state("error")
             return {
                 "task_id": task_id,
@@ -157,6 +183,97 @@ class ConfluenceAgent(BaseAgent):
                 "status": "error"
             }
     
+    @property
+    def api_enabled(self) -> bool:
+        """Whether Confluence credentials are configured; otherwise actions are simulated."""
+        return bool(self.confluence_url and self.confluence_username and self.confluence_api_token)
+    
+    async def _session(self) -> aiohttp.ClientSession:
+        """Get the shared Confluence HTTP session, creating it on first use."""
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300),
+                auth=aiohttp.BasicAuth(self.confluence_username, self.confluence_api_token)
+            )
+        return self._http
+    
+    async def _api_request(self, method: str, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Send a request to the Confluence REST API.
+        
+        Rate-limited (429) and unavailable (503) responses are retried with
+        exponential backoff.
+        
+        Args:
+            method: HTTP method
+            path: Path below /rest/api/
+            payload: JSON request body
+            
+        Returns:
+            The decoded JSON response
+        """
+        url = f"{self.confluence_url.rstrip('/')}/rest/api/{path}"
+        session = await self._session()
+        async with retry_request(
+            lambda: session.request(method, url, json=payload),
+            max_retries=self.config.get("api_max_retries", 3),
+            backoff=self.config.get("api_retry_backoff", 0.5)
+        ) as response:
+            if response.status >= 400:
+                error_text = await response.text()
+                raise ValueError(f"Confluence API returned status {response.status}: {error_text}")
+            return await response.json()
+    
+    async def aclose(self) -> None:
+        """Flush memories and close the Confluence HTTP session."""
+        await super().aclose()
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        self._http = None
+    
+    async def _handle_create_page(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the create_page action."""
+        return await self.create_page(
+            space_key=parameters.get("space_key", ""),
+            title=parameters.get("title", ""),
+            content=parameters.get("content", ""),
+            parent_id=parameters.get("parent_id")
+        )
+    
+    async def _handle_update_page(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the update_page action."""
+        return await self.update_page(
+            page_id=parameters.get("page_id", ""),
+            title=parameters.get("title", ""),
+            content=parameters.get("content", ""),
+            version=parameters.get("version", 1)
+        )
+    
+    async def _handle_convert_markdown(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the convert_markdown action."""
+        return {
+            "converted_content": await self.convert_markdown_to_confluence(
+                parameters.get("markdown_content", "")
+            )
+        }
+    
+    async def _handle_generate_documentation(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the generate_documentation action."""
+        return {
+            "documentation": await self.generate_documentation(
+                parameters.get("infrastructure_code", ""),
+                parameters.get("code_type", "terraform")
+            )
+        }
+    
+    async def _handle_create_space(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the create_space action."""
+        return await self.create_space(
+            key=parameters.get("key", ""),
+            name=parameters.get("name", ""),
+            description=parameters.get("description", "")
+        )
+    
     async def create_page(self, space_key: str, title: str, content: str, 
                          parent_id: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -171,10 +288,31 @@ class ConfluenceAgent(BaseAgent):
         Returns:
             Dictionary containing the created page details
         """
-        # This would integrate with the Confluence API in a real implementation
-        logger.info(f"Creating Confluence page: {title} in space {space_key}")
+        logger.info("Creating Confluence page: %s in space %s", title, space_key)
+        
+        if self.api_enabled:
+            payload = {
+                "type": "page",
+                "title": title,
+                "space": {"key": space_key},
+                "body": {"storage": {"value": content, "representation": "storage"}}
+            }
+            if parent_id:
+                payload["ancestors"] = [{"id": parent_id}]
+            
+            page = await self._api_request("POST", "content", payload)
+            return {
+                "id": page["id"],
+                "title": page.get("title", title),
+                "space": {"key": space_key},
+                "status": "Created",
+                "url": f"{self.confluence_url.rstrip('/')}{page.get('_links', {}).get('webui', '')}"
+            }
         
-        page_id = f"{100000 + hash(title) % 900000}"
+        # Simulated page when Confluence is not configured
+        # Deterministic across restarts, unlike the per-process randomized hash()
+        title_hash = int.from_bytes(hashlib.blake2b(title.encode("utf-8"), digest_size=8).digest(), "big")
+        page_id = f"{100000 + title_hash % 900000}"
         
         return {
             "id": page_id,
@@ -197,9 +335,24 @@ class ConfluenceAgent(BaseAgent):
         Returns:
             Dictionary containing the updated page details
         """
-        # This would integrate with the Confluence API in a real implementation
-        logger.info(f"Updating Confluence page: {page_id}")
+        logger.info("Updating Confluence page: %s", page_id)
         
+        if self.api_enabled:
+            page = await self._api_request("PUT", f"content/{page_id}", {
+                "id": page_id,
+                "type": "page",
+                "title": title,
+                "body": {"storage": {"value": content, "representation": "storage"}},
+                "version": {"number": version + 1}
+            })
+            return {
+                "id": page_id,
+                "title": page.get("title", title),
+                "version": {"number": page.get("version", {}).get("number", version + 1)},
+                "status": "Updated"
+            }
+        
+        # Simulated update when Confluence is not configured
         return {
             "id": page_id,
             "title": title,
@@ -220,18 +373,43 @@ class ConfluenceAgent(BaseAgent):
         # Use LLM to convert markdown to Confluence format
         logger.info("Converting markdown to Confluence format")
         
-        prompt = f"""
-        Convert the following markdown content to Confluence storage format:
+        prompt = MARKDOWN_TO_CONFLUENCE_PROMPT.substitute(markdown_content=markdown_content)
         
-        ```markdown
-        {markdown_content}
-        ```
+        response = await self.llm_service.generate_completion(prompt)
+        return response.strip()
+    
+    async def convert_markdown_to_confluence_batch(self, markdown_contents: List[str]) -> List[str]:
+        """
+        Convert several markdown documents to Confluence storage format with one LLM call.
         
-        Return only the Confluence storage format XML without any additional text.
+        Args:
+            markdown_contents: Documents in markdown format
+            
+        Returns:
+            Documents in Confluence storage format, in the same order
         """
+        if len(markdown_contents) <= 1:
+            return [await self.convert_markdown_to_confluence(content) for content in markdown_contents]
         
+        logger.info("Converting %d markdown documents to Confluence format", len(markdown_contents))
+        
+        prompt = MARKDOWN_BATCH_TO_CONFLUENCE_PROMPT.substitute(
+            delimiter=DOCUMENT_DELIMITER,
+            documents=f"\n{DOCUMENT_DELIMITER}\n".join(markdown_contents)
+        )
         response = await self.llm_service.generate_completion(prompt)
-        return response.strip()
+        
+        converted = [part.strip() for part in response.split(DOCUMENT_DELIMITER)]
+        converted = [part for part in converted if part]
+        if len(converted) == len(markdown_contents):
+            return converted
+        
+        # The model didn't keep the documents apart; convert them one by one instead
+        logger.warning("Batch conversion returned %d documents for %d inputs, converting individually",
+                       len(converted), len(markdown_contents))
+        return list(await asyncio.gather(
+            *(self.convert_markdown_to_confluence(content) for content in markdown_contents)
+        ))
     
     async def generate_documentation(self, infrastructure_code: str, code_type: str) -> str:
         """
@@ -245,26 +423,9 @@ class ConfluenceAgent(BaseAgent):
             Generated documentation in Confluence storage format
         """
         # Use LLM to generate documentation
-        logger.info(f"Generating documentation for {code_type} code")
-        
-        prompt = f"""
-        Generate comprehensive Confluence documentation for the following {code_type} code:
-        
-        ```{code_type}
-        {infrastructure_code}
-        ```
-        
-        The documentation should include:
-        1. Overview of what this infrastructure provides
-        2. Architecture diagram description
-        3. Components and their relationships
-        4. Configuration parameters
-        5. Dependencies
-        6. Deployment instructions
-        7. Maintenance procedures
+        logger.info("Generating documentation for %s code", code_type)
         
-        Format the response in Confluence storage format.
-        """
+        prompt = DOCUMENTATION_PROMPT.substitute(code_type=code_type, infrastructure_code=infrastructure_code)
         
         response = await self.llm_service.generate_completion(prompt)
         return response.strip()
@@ -281,8 +442,14 @@ class ConfluenceAgent(BaseAgent):
         Returns:
             Dictionary with created space information
         """
-        # This would create a space in Confluence
-        logger.info(f"Creating Confluence space: {name} with key {key}")
+        logger.info("Creating Confluence space: %s with key %s", name, key)
+        
+        if self.api_enabled:
+            await self._api_request("POST", "space", {
+                "key": key,
+                "name": name,
+                "description": {"plain": {"value": description, "representation": "plain"}}
+            })
         
         return {
             "key": key,
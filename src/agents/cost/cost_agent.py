@@ -6,15 +6,226 @@ infrastructure costs across different cloud providers.
 """
 
 import os
-import json
+import re
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, List, Any, AsyncIterator, Mapping, Optional, Tuple
 
 from src.agents.base.base_agent import BaseAgent
+from src.agents.cost.gen_cache import StructuralCostCache
+from src.services.llm.cache import CompletionCache, LLMCache
+from src.services.llm.batching import BatchingLLM
+from src.utils import json_utils
 from src.utils.template_utils import load_template
 
 logger = logging.getLogger(__name__)
 
+# Vector DB collection holding past completions for the semantic cache
+COST_CACHE_COLLECTION = "cost_completions"
+
+# Completions that may be reused for a near-identical prompt once the semantic
+# cache is enabled. Optimizations rewrite the code itself, so they are only
+# ever reused for an exact repeat.
+_SEMANTIC_CACHE_KINDS = frozenset({"analysis", "forecast"})
+
+# Cost optimization patterns for different cloud providers, shared by every
+# CostAgent. The nested patterns stay plain dicts because templates serialize
+# them with tojson; treat them as read-only.
+_COST_PATTERNS: Mapping[str, Dict[str, Any]] = MappingProxyType({
+    "aws": {
+        "compute": {
+            "right_sizing": ["t3.micro", "t3.small", "t3.medium"],
+            "spot_instances": True,
+            "reserved_instances": True,
+            "savings_plans": True
+        },
+        "storage": {
+            "s3_lifecycle": True,
+            "ebs_optimization": True,
+            "storage_classes": ["Standard", "Standard-IA", "One Zone-IA", "Glacier"]
+        },
+        "database": {
+            "instance_types": ["db.t3.micro", "db.t3.small", "db.t3.medium"],
+            "multi_az": False,
+            "read_replicas": False
+        }
+    },
+    "azure": {
+        "compute": {
+            "right_sizing": ["Standard_B1s", "Standard_B1ms", "Standard_B2s"],
+            "spot_instances": True,
+            "reserved_instances": True
+        },
+        "storage": {
+            "lifecycle_management": True,
+            "storage_tiers": ["Hot", "Cool", "Archive"]
+        },
+        "database": {
+            "instance_types": ["GP_Gen5_2", "GP_Gen5_4"],
+            "geo_replication": False
+        }
+    },
+    "gcp": {
+        "compute": {
+            "right_sizing": ["e2-micro", "e2-small", "e2-medium"],
+            "preemptible_instances": True,
+            "committed_use": True
+        },
+        "storage": {
+            "lifecycle_rules": True,
+            "storage_classes": ["Standard", "Nearline", "Coldline", "Archive"]
+        },
+        "database": {
+            "instance_types": ["db-f1-micro", "db-g1-small"],
+            "high_availability": False
+        }
+    }
+})
+
+# Instance sizes named in the patterns, mapped to the providers offering them.
+# Built once so right-sizing recommendations are validated with a dict lookup.
+_KNOWN_SIZES: Mapping[str, frozenset] = MappingProxyType({
+    size: frozenset(
+        provider for provider, patterns in _COST_PATTERNS.items()
+        if size in patterns["compute"]["right_sizing"] or size in patterns["database"]["instance_types"]
+    )
+    for patterns in _COST_PATTERNS.values()
+    for size in (*patterns["compute"]["right_sizing"], *patterns["database"]["instance_types"])
+})
+
+# Static instructions sent as the system prompt. They are identical for every
+# request, so servers with prefix caching (e.g. vLLM --enable-prefix-caching)
+# only prefill them once; the per-request details go in the user prompt.
+ANALYSIS_SYSTEM_PROMPT = """You are a cloud cost optimization expert.
+Analyze the infrastructure code you are given for cost optimization opportunities.
+
+Consider these aspects:
+1. Resource sizing and utilization
+2. Reserved/spot instance opportunities
+3. Storage optimization possibilities
+4. Networking cost optimizations
+5. Database configuration costs
+6. Auto-scaling efficiencies
+
+Return your analysis as a JSON object with these fields:
+- "current_estimated_cost": estimated monthly cost in USD
+- "potential_savings": estimated monthly savings in USD
+- "optimization_opportunities": array of objects with "category", "description", "potential_savings", "implementation_effort" (high/medium/low)
+- "resource_recommendations": array of objects with "resource_type", "current_config", "recommended_config", "savings"
+- "priority_optimizations": array of strings describing the most impactful optimizations to implement"""
+
+FORECAST_SYSTEM_PROMPT = """You are a cloud cost forecasting expert.
+Generate a cost forecast for the infrastructure code you are given.
+
+Consider:
+1. Resource usage patterns and growth
+2. Seasonal variations
+3. Reserved instance/savings plans benefits
+4. Potential cost increases
+5. Industry trends
+
+Return your forecast as a JSON object with these fields:
+- "monthly_forecasts": array of objects with "month", "estimated_cost", "confidence_level"
+- "total_forecasted_cost": total cost over the forecast period
+- "cost_drivers": array of major factors influencing the forecast
+- "assumptions": array of assumptions made in the forecast
+- "recommendations": array of actions to manage forecasted costs"""
+
+# LLM responses longer than this are truncated before code extraction
+MAX_RESPONSE_CHARS = 200_000
+
+# Resource recommendations included in the default optimization prompt
+MAX_PROMPT_RECOMMENDATIONS = 10
+
+# Indentation and blank lines carry no meaning in an excerpt
+_EXCESS_WHITESPACE_RE = re.compile(r'[ \t]*\n\s*|[ \t]{2,}')
+
+def _code_excerpt(code: str, limit: int = 500) -> str:
+    """
+    Shorten code for think() while keeping both ends of the file.
+    
+    Terraform files typically declare providers and variables at the top and
+    outputs at the bottom, so the excerpt keeps the head and the tail.
+    
+    Args:
+        code: The infrastructure code
+        limit: Maximum number of characters of code to keep
+        
+    Returns:
+        The code, or a head...tail excerpt if it is longer than limit
+    """
+    code = _EXCESS_WHITESPACE_RE.sub(lambda match: "\n" if "\n" in match.group(0) else " ", code.strip())
+    if len(code) <= limit:
+        return code
+    tail = limit // 4
+    return f"{code[:limit - tail]}\n...\n{code[-tail:]}"
+
+# A monthly cost as models tend to write it: "$1,200", "120 USD", "$120/month"
+_COST_RE = re.compile(
+    r'^\s*(?:USD\s*)?\$?\s*(-?\d[\d,]*(?:\.\d+)?)\s*(?:USD)?\s*(?:(?:/|per)\s*mo(?:nth)?)?\s*$',
+    re.IGNORECASE
+)
+
+def _parse_cost(value: Any) -> Optional[float]:
+    """
+    Read a cost from an LLM-produced analysis.
+    
+    Args:
+        value: A number, or a string such as "$1,200" or "120 USD/month"
+        
+    Returns:
+        The cost in USD, or None if the value isn't a single amount
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = _COST_RE.match(value)
+        if match:
+            return float(match.group(1).replace(",", ""))
+    return None
+
+def _invalid_recommendations(cost_analysis: Dict[str, Any], cloud_provider: str) -> List[Dict[str, Any]]:
+    """Return recommendations that size a resource with another provider's instance type."""
+    invalid = []
+    for recommendation in cost_analysis.get("resource_recommendations", []):
+        if not isinstance(recommendation, dict):
+            continue
+        providers = _KNOWN_SIZES.get(str(recommendation.get("recommended_config", "")).strip())
+        if providers is not None and cloud_provider not in providers:
+            invalid.append(recommendation)
+    return invalid
+
+def _extract_first_fence(text: str) -> str:
+    """
+    Return the contents of the first fenced code block, or the whole text if there is none.
+    
+    Scans with str.find, so an unclosed fence in a broken response costs one
+    linear pass instead of regex backtracking.
+    
+    Args:
+        text: LLM response that may contain a ```lang ... ``` block
+        
+    Returns:
+        The stripped code
+    """
+    start = text.find("```")
+    if start < 0:
+        return text.strip()
+    
+    # Skip the optional language tag after the opening fence
+    pos = start + 3
+    while pos < len(text) and (text[pos].isalnum() or text[pos] == "_"):
+        pos += 1
+    
+    end = text.find("```", pos)
+    if end < 0:
+        return text.strip()
+    return text[pos:end].strip()
+
 class CostAgent(BaseAgent):
     """
     Agent responsible for analyzing and optimizing infrastructure costs.
@@ -25,7 +236,8 @@ class CostAgent(BaseAgent):
         self,
         llm_service: Any,
         vector_db_service: Optional[Any] = None,
-        config: Optional[Dict[str, Any]] = None
+        config: Optional[Dict[str, Any]] = None,
+        llm_cache: Optional[LLMCache] = None
     ):
         """
         Initialize a new CostAgent.
@@ -34,6 +246,7 @@ class CostAgent(BaseAgent):
             llm_service: Service for language model interactions
             vector_db_service: Optional service for vector database operations
             config: Optional configuration parameters
+            llm_cache: Optional cache for LLM completions
         """
         # Define the agent's capabilities
         capabilities = [
@@ -54,57 +267,37 @@ class CostAgent(BaseAgent):
             config=config
         )
         
-        # Initialize cost optimization patterns for different cloud providers
-        self.cost_patterns = {
-            "aws": {
-                "compute": {
-                    "right_sizing": ["t3.micro", "t3.small", "t3.medium"],
-                    "spot_instances": True,
-                    "reserved_instances": True,
-                    "savings_plans": True
-                },
-                "storage": {
-                    "s3_lifecycle": True,
-                    "ebs_optimization": True,
-                    "storage_classes": ["Standard", "Standard-IA", "One Zone-IA", "Glacier"]
-                },
-                "database": {
-                    "instance_types": ["db.t3.micro", "db.t3.small", "db.t3.medium"],
-                    "multi_az": False,
-                    "read_replicas": False
-                }
-            },
-            "azure": {
-                "compute": {
-                    "right_sizing": ["Standard_B1s", "Standard_B1ms", "Standard_B2s"],
-                    "spot_instances": True,
-                    "reserved_instances": True
-                },
-                "storage": {
-                    "lifecycle_management": True,
-                    "storage_tiers": ["Hot", "Cool", "Archive"]
-                },
-                "database": {
-                    "instance_types": ["GP_Gen5_2", "GP_Gen5_4"],
-                    "geo_replication": False
-                }
-            },
-            "gcp": {
-                "compute": {
-                    "right_sizing": ["e2-micro", "e2-small", "e2-medium"],
-                    "preemptible_instances": True,
-                    "committed_use": True
-                },
-                "storage": {
-                    "lifecycle_rules": True,
-                    "storage_classes": ["Standard", "Nearline", "Coldline", "Archive"]
-                },
-                "database": {
-                    "instance_types": ["db-f1-micro", "db-g1-small"],
-                    "high_availability": False
-                }
-            }
-        }
+        # Cache for LLM completions so re-analyzing the same code skips the model
+        self.llm_cache = llm_cache or LLMCache(
+            maxsize=self.config.get("llm_cache_size", 1024),
+            ttl=self.config.get("llm_cache_ttl", 3600)
+        )
+        
+        # Optionally coalesce completion requests from concurrent analyses into batches
+        batch_window = self.config.get("llm_batch_window")
+        if batch_window:
+            self.llm_service = BatchingLLM(
+                self.llm_service,
+                window=batch_window,
+                max_batch_size=self.config.get("llm_batch_size", 32)
+            )
+        
+        # Exact cache plus, when config semantic_cache is on (off by default since
+        # small code changes can change the costs), reuse of near-identical prompts
+        self.completion_cache = CompletionCache(
+            self.llm_cache,
+            self.vector_db_service,
+            collection_name=COST_CACHE_COLLECTION,
+            semantic_kinds=_SEMANTIC_CACHE_KINDS if self.config.get("semantic_cache", False) else frozenset(),
+            threshold=self.config.get("semantic_cache_threshold", 0.95)
+        )
+        
+        # Optionally reuse analyses of Terraform code that only differs in unpriced values
+        self.structural_cache: Optional[StructuralCostCache] = None
+        if self.config.get("structural_cache", False):
+            self.structural_cache = StructuralCostCache(
+                maxsize=self.config.get("structural_cache_size", 256)
+            )
         
         logger.info("Cost optimization agent initialized")
     
@@ -125,28 +318,31 @@ class CostAgent(BaseAgent):
         iac_type = message.get("iac_type", "terraform").lower()
         task_id = message.get("task_id", "")
         
-        # First, think about cost implications
-        thoughts = await self.think({
+        # Think about cost implications while the analysis is running; the
+        # analysis doesn't depend on the thoughts
+        think_task = self.think({
             "task": f"Analyze cost optimization opportunities in {iac_type} code for {cloud_provider}",
-            "code": code[:500] + "..." if len(code) > 500 else code,  # Truncate for thinking
+            "code": _code_excerpt(code, self.config.get("think_code_chars", 500)),
             "cloud_provider": cloud_provider,
             "iac_type": iac_type
         })
         
-        # Perform cost analysis
-        cost_analysis = await self.analyze_costs(
-            code=code,
-            cloud_provider=cloud_provider,
-            iac_type=iac_type
-        )
-        
-        # Generate optimized code
-        optimized_code, optimization_summary = await self.optimize_costs(
-            code=code,
-            cost_analysis=cost_analysis,
-            cloud_provider=cloud_provider,
-            iac_type=iac_type
-        )
+        if self.config.get("fused_prompt", True):
+            # Analyze and optimize in a single LLM round trip
+            thoughts, (cost_analysis, optimized_code, optimization_summary) = await asyncio.gather(
+                think_task,
+                self.analyze_and_optimize(code=code, cloud_provider=cloud_provider, iac_type=iac_type)
+            )
+        else:
+            thoughts, cost_analysis = await asyncio.gather(
+                think_task,
+                self.analyze_costs(code=code, cloud_provider=cloud_provider, iac_type=iac_type)
+            )
+            
+            # Generate optimized code
+            optimized_code, optimization_summary = await self._optimize_if_needed(
+                code, cost_analysis, cloud_provider, iac_type
+            )
         
         # Store in memory
         await self.update_memory({
@@ -191,46 +387,24 @@ class CostAgent(BaseAgent):
         """
         logger.info(f"Analyzing {iac_type} code for {cloud_provider} cost optimization opportunities")
         
-        # Prepare the prompt for the LLM
-        try:
-            template_name = f"cost_analysis_{iac_type}.j2"
-            analysis_prompt = load_template(template_name).render(
-                code=code,
-                cloud_provider=cloud_provider,
-                cost_patterns=self.cost_patterns[cloud_provider]
-            )
-        except Exception as e:
-            logger.warning(f"Failed to load template {template_name}, using default: {str(e)}")
-            # Default prompt if template loading fails
-            analysis_prompt = f"""
-            You are a cost optimization expert specializing in {cloud_provider} infrastructure.
-            Analyze the following {iac_type} code for cost optimization opportunities.
-
-            CODE TO ANALYZE:
-            ```
-            {code}
-            ```
-
-            Consider these aspects:
-            1. Resource sizing and utilization
-            2. Reserved/spot instance opportunities
-            3. Storage optimization possibilities
-            4. Networking cost optimizations
-            5. Database configuration costs
-            6. Auto-scaling efficiencies
-
-            Return your analysis as a JSON object with these fields:
-            - "current_estimated_cost": estimated monthly cost in USD
-            - "potential_savings": estimated monthly savings in USD
-            - "optimization_opportunities": array of objects with "category", "description", "potential_savings", "implementation_effort" (high/medium/low)
-            - "resource_recommendations": array of objects with "resource_type", "current_config", "recommended_config", "savings"
-            - "priority_optimizations": array of strings describing the most impactful optimizations to implement
-            """
+        use_structural_cache = self.structural_cache is not None and iac_type == "terraform"
+        if use_structural_cache:
+            cached_analysis = self.structural_cache.lookup(code, cloud_provider)
+            if cached_analysis is not None:
+                logger.info("Reusing cost analysis of structurally identical code")
+                return cached_analysis
+        
+        analysis_prompt, system_prompt = self._analysis_prompt(code, cloud_provider, iac_type)
         
         try:
-            analysis_result = await self.llm_service.generate_completion(analysis_prompt)
-            return json.loads(analysis_result)
-        except json.JSONDecodeError:
+            analysis_result = await self._cached_completion(
+                analysis_prompt, "analysis", cloud_provider, iac_type, system_prompt=system_prompt
+            )
+            cost_analysis = json_utils.loads(analysis_result)
+            if use_structural_cache and isinstance(cost_analysis, dict):
+                self.structural_cache.store(code, cloud_provider, cost_analysis)
+            return cost_analysis
+        except json_utils.JSONDecodeError:
             logger.error("Failed to parse cost analysis result as JSON")
             return {
                 "error": "Failed to parse analysis result",
@@ -240,12 +414,74 @@ class CostAgent(BaseAgent):
             logger.error(f"Error during cost analysis: {str(e)}")
             return {"error": str(e)}
     
+    async def analyze_costs_multi(
+        self,
+        code: str,
+        iac_type: str,
+        providers: Tuple[str, ...] = ("aws", "azure", "gcp")
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Analyze the same infrastructure code for several cloud providers concurrently.
+        
+        Args:
+            code: The infrastructure code to analyze
+            iac_type: The infrastructure as code type
+            providers: Cloud providers to compare
+            
+        Returns:
+            Dictionary mapping each provider to its cost analysis
+        """
+        results = await asyncio.gather(
+            *(self.analyze_costs(code, provider, iac_type) for provider in providers),
+            return_exceptions=True
+        )
+        return {
+            provider: {"error": str(result)} if isinstance(result, Exception) else result
+            for provider, result in zip(providers, results)
+        }
+    
+    async def analyze_repository(
+        self,
+        paths: List[str],
+        cloud_provider: str,
+        iac_type: str,
+        concurrency: int = 16
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Analyze the costs of many infrastructure files concurrently.
+        
+        At most `concurrency` files are read and analyzed at a time, so large
+        repositories stay within the LLM provider's rate limits.
+        
+        Args:
+            paths: Paths of the infrastructure files to analyze
+            cloud_provider: The cloud provider (aws, azure, gcp)
+            iac_type: The infrastructure as code type
+            concurrency: Maximum number of files analyzed at once
+            
+        Returns:
+            Dictionary mapping each path to its cost analysis
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def analyze_file(path: str) -> Tuple[str, Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    code = await asyncio.to_thread(Path(path).read_text, encoding="utf-8")
+                except (OSError, UnicodeDecodeError) as e:
+                    logger.error(f"Failed to read {path}: {str(e)}")
+                    return path, {"error": f"Failed to read file: {str(e)}"}
+                return path, await self.analyze_costs(code, cloud_provider, iac_type)
+        
+        return dict(await asyncio.gather(*(analyze_file(path) for path in paths)))
+    
     async def optimize_costs(
         self,
         code: str,
         cost_analysis: Dict[str, Any],
         cloud_provider: str,
-        iac_type: str
+        iac_type: str,
+        full_context: bool = False
     ) -> Tuple[str, Dict[str, Any]]:
         """
         Optimize infrastructure code for cost efficiency.
@@ -255,6 +491,8 @@ class CostAgent(BaseAgent):
             cost_analysis: Results from the cost analysis
             cloud_provider: The cloud provider (aws, azure, gcp)
             iac_type: The infrastructure as code type
+            full_context: Send the whole analysis in the default prompt instead of
+                only the priority optimizations and top recommendations
             
         Returns:
             Tuple containing:
@@ -270,11 +508,19 @@ class CostAgent(BaseAgent):
                 code=code,
                 cost_analysis=cost_analysis,
                 cloud_provider=cloud_provider,
-                cost_patterns=self.cost_patterns[cloud_provider]
+                cost_patterns=_COST_PATTERNS[cloud_provider]
             )
         except Exception as e:
             logger.warning(f"Failed to load template {template_name}, using default: {str(e)}")
-            # Default prompt if template loading fails
+            # Default prompt if template loading fails. The model only needs what
+            # to change, so the rest of the analysis is left out unless asked for.
+            if full_context:
+                analysis_context = json_utils.dumps(cost_analysis, indent=True)
+            else:
+                analysis_context = json_utils.dumps({
+                    "priority_optimizations": cost_analysis.get("priority_optimizations", []),
+                    "top_recommendations": cost_analysis.get("resource_recommendations", [])[:MAX_PROMPT_RECOMMENDATIONS]
+                })
             optimization_prompt = f"""
             You are a cost optimization expert specializing in {cloud_provider} infrastructure.
             Optimize the following {iac_type} code based on the cost analysis results.
@@ -285,7 +531,7 @@ class CostAgent(BaseAgent):
             ```
 
             COST ANALYSIS RESULTS:
-            {json.dumps(cost_analysis, indent=2)}
+            {analysis_context}
 
             Generate an optimized version of the code that implements the recommended cost optimizations.
             Focus on the highest impact changes while maintaining the infrastructure's functionality.
@@ -296,29 +542,176 @@ class CostAgent(BaseAgent):
         
         try:
             # Generate optimized code
-            optimized_code_result = await self.llm_service.generate_completion(optimization_prompt)
+            optimized_code_result = await self._cached_completion(
+                optimization_prompt, "optimization", cloud_provider, iac_type
+            )
             
-            # Extract code from the response
-            import re
-            code_pattern = r'```(?:\w+)?\s*([\s\S]*?)\s*```'
-            code_matches = re.findall(code_pattern, optimized_code_result)
-            optimized_code = code_matches[0].strip() if code_matches else optimized_code_result.strip()
+            if len(optimized_code_result) > MAX_RESPONSE_CHARS:
+                logger.warning(
+                    f"Optimization response is {len(optimized_code_result)} characters, "
+                    f"truncating to {MAX_RESPONSE_CHARS}"
+                )
+                optimized_code_result = optimized_code_result[:MAX_RESPONSE_CHARS]
             
-            # Prepare optimization summary
-            optimization_summary = {
-                "original_cost": cost_analysis.get("current_estimated_cost", 0),
-                "optimized_cost": cost_analysis.get("current_estimated_cost", 0) - cost_analysis.get("potential_savings", 0),
-                "total_savings": cost_analysis.get("potential_savings", 0),
-                "implemented_optimizations": cost_analysis.get("priority_optimizations", []),
-                "optimization_details": cost_analysis.get("optimization_opportunities", [])
-            }
+            # Extract code from the response
+            optimized_code = _extract_first_fence(optimized_code_result)
             
-            return optimized_code, optimization_summary
+            return optimized_code, self._summarize_optimization(cost_analysis, cloud_provider)
             
         except Exception as e:
             logger.error(f"Error during cost optimization: {str(e)}")
             return code, {"error": str(e)}
     
+    async def analyze_and_optimize(
+        self,
+        code: str,
+        cloud_provider: str,
+        iac_type: str
+    ) -> Tuple[Dict[str, Any], str, Dict[str, Any]]:
+        """
+        Analyze and optimize infrastructure code with a single LLM call.
+        
+        The code and cost patterns are sent once, and the model returns both
+        the analysis and the optimized code. If the response can't be parsed,
+        this falls back to analyze_costs followed by optimize_costs.
+        
+        Args:
+            code: The infrastructure code to analyze and optimize
+            cloud_provider: The cloud provider (aws, azure, gcp)
+            iac_type: The infrastructure as code type
+            
+        Returns:
+            Tuple containing:
+                - Cost analysis results
+                - Optimized infrastructure code
+                - Optimization summary
+        """
+        logger.info(f"Analyzing and optimizing {iac_type} code for {cloud_provider} in one request")
+        
+        # Structurally identical code already has an analysis; only the rewrite is needed
+        cost_analysis = None
+        if self.structural_cache is not None and iac_type == "terraform":
+            cost_analysis = self.structural_cache.lookup(code, cloud_provider)
+        
+        if cost_analysis is None:
+            prompt = f"""
+            You are a cost optimization expert specializing in {cloud_provider} infrastructure.
+            Analyze the following {iac_type} code for cost optimization opportunities, then
+            rewrite it to implement the most impactful optimizations.
+
+            CODE TO ANALYZE:
+            ```
+            {code}
+            ```
+
+            COST OPTIMIZATION PATTERNS FOR {cloud_provider.upper()}:
+            {json_utils.dumps(_COST_PATTERNS.get(cloud_provider, {}), indent=True)}
+
+            Return ONLY a JSON object with these fields:
+            - "cost_analysis": an object with
+              - "current_estimated_cost": estimated monthly cost in USD
+              - "potential_savings": estimated monthly savings in USD
+              - "optimization_opportunities": array of objects with "category", "description", "potential_savings", "implementation_effort" (high/medium/low)
+              - "resource_recommendations": array of objects with "resource_type", "current_config", "recommended_config", "savings"
+              - "priority_optimizations": array of strings describing the most impactful optimizations to implement
+            - "optimized_code": the complete optimized {iac_type} code as a string, with comments
+              explaining the cost optimization changes made
+            """
+            
+            # Only a response that isn't the expected JSON falls back to separate requests
+            fused_analysis = optimized_code = None
+            try:
+                result = json_utils.loads(await self._cached_completion(
+                    prompt, "analysis_optimization", cloud_provider, iac_type
+                ))
+                fused_analysis = result["cost_analysis"]
+                optimized_code = result["optimized_code"]
+            except Exception as e:
+                logger.warning(f"Fused cost analysis failed, falling back to separate requests: {str(e)}")
+            
+            if isinstance(fused_analysis, dict) and isinstance(optimized_code, str):
+                if self.structural_cache is not None and iac_type == "terraform":
+                    self.structural_cache.store(code, cloud_provider, fused_analysis)
+                return (
+                    fused_analysis,
+                    optimized_code.strip(),
+                    self._summarize_optimization(fused_analysis, cloud_provider)
+                )
+            
+            cost_analysis = await self.analyze_costs(code, cloud_provider, iac_type)
+        
+        optimized_code, optimization_summary = await self._optimize_if_needed(
+            code, cost_analysis, cloud_provider, iac_type
+        )
+        return cost_analysis, optimized_code, optimization_summary
+    
+    async def _optimize_if_needed(
+        self,
+        code: str,
+        cost_analysis: Dict[str, Any],
+        cloud_provider: str,
+        iac_type: str
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Optimize the code unless the analysis failed or found nothing to save.
+        
+        In those cases the original code is returned without an LLM call.
+        """
+        if cost_analysis.get("error"):
+            return code, {"error": cost_analysis["error"], "note": "Skipped optimization: cost analysis failed"}
+        
+        # Savings the model reported in an unreadable form may still be worth implementing
+        savings = _parse_cost(cost_analysis.get("potential_savings", 0))
+        if savings is not None and savings <= 0:
+            summary = self._summarize_optimization(cost_analysis, cloud_provider)
+            summary["note"] = "No optimizations found"
+            return code, summary
+        
+        return await self.optimize_costs(code, cost_analysis, cloud_provider, iac_type)
+    
+    @staticmethod
+    def summarize_optimizations(cost_analyses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Build optimization summaries for many cost analyses at once.
+        
+        Args:
+            cost_analyses: Results from analyze_costs
+            
+        Returns:
+            List of optimization summaries in the same order as the analyses
+        """
+        return [CostAgent._summarize_optimization(cost_analysis) for cost_analysis in cost_analyses]
+    
+    @staticmethod
+    def _summarize_optimization(
+        cost_analysis: Dict[str, Any],
+        cloud_provider: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Build the optimization summary reported alongside optimized code.
+        
+        When the cloud provider is given, recommendations naming another
+        provider's instance type are listed under "invalid_recommendations".
+        "optimized_cost" is None if either cost can't be read as an amount.
+        """
+        current_cost = cost_analysis.get("current_estimated_cost", 0)
+        savings = cost_analysis.get("potential_savings", 0)
+        current_amount = _parse_cost(current_cost)
+        savings_amount = _parse_cost(savings)
+        summary = {
+            "original_cost": current_cost,
+            "optimized_cost": (
+                current_amount - savings_amount
+                if current_amount is not None and savings_amount is not None else None
+            ),
+            "total_savings": savings,
+            "implemented_optimizations": cost_analysis.get("priority_optimizations", []),
+            "optimization_details": cost_analysis.get("optimization_opportunities", [])
+        }
+        if cloud_provider is not None:
+            summary["invalid_recommendations"] = _invalid_recommendations(cost_analysis, cloud_provider)
+        return summary
+    
     async def forecast_costs(
         self,
         code: str,
@@ -340,35 +733,15 @@ class CostAgent(BaseAgent):
         """
         logger.info(f"Generating {forecast_months}-month cost forecast for {cloud_provider} using {iac_type}")
         
-        # Prepare the prompt for the LLM
-        prompt = f"""
-        You are a cost forecasting expert specializing in {cloud_provider} infrastructure.
-        Generate a {forecast_months}-month cost forecast for the following {iac_type} code.
-
-        CODE TO ANALYZE:
-        ```
-        {code}
-        ```
-
-        Consider:
-        1. Resource usage patterns and growth
-        2. Seasonal variations
-        3. Reserved instance/savings plans benefits
-        4. Potential cost increases
-        5. Industry trends
-
-        Return your forecast as a JSON object with these fields:
-        - "monthly_forecasts": array of objects with "month", "estimated_cost", "confidence_level"
-        - "total_forecasted_cost": total cost over the forecast period
-        - "cost_drivers": array of major factors influencing the forecast
-        - "assumptions": array of assumptions made in the forecast
-        - "recommendations": array of actions to manage forecasted costs
-        """
+        prompt = self._forecast_prompt(code, cloud_provider, iac_type, forecast_months)
         
         try:
-            forecast_result = await self.llm_service.generate_completion(prompt)
-            return json.loads(forecast_result)
-        except json.JSONDecodeError:
+            forecast_result = await self._cached_completion(
+                prompt, "forecast", cloud_provider, iac_type,
+                system_prompt=FORECAST_SYSTEM_PROMPT, forecast_months=forecast_months
+            )
+            return json_utils.loads(forecast_result)
+        except json_utils.JSONDecodeError:
             logger.error("Failed to parse cost forecast result as JSON")
             return {
                 "error": "Failed to parse forecast result",
@@ -376,4 +749,151 @@ class CostAgent(BaseAgent):
             }
         except Exception as e:
             logger.error(f"Error during cost forecasting: {str(e)}")
-            return {"error": str(e)} 
\ No newline at end of file
+            return {"error": str(e)}
+    
+    def _analysis_prompt(self, code: str, cloud_provider: str, iac_type: str) -> Tuple[str, Optional[str]]:
+        """Build the cost analysis prompt and its system prompt (None when the template has the instructions)."""
+        try:
+            template_name = f"cost_analysis_{iac_type}.j2"
+            return load_template(template_name).render(
+                code=code,
+                cloud_provider=cloud_provider,
+                cost_patterns=_COST_PATTERNS[cloud_provider]
+            ), None
+        except Exception as e:
+            logger.warning(f"Failed to load template {template_name}, using default: {str(e)}")
+            # Default prompt if template loading fails; the instructions go in the system prompt
+            return f"""
+            Cloud provider: {cloud_provider}
+            Infrastructure as code type: {iac_type}
+
+            CODE TO ANALYZE:
+            ```
+            {code}
+            ```
+            """, ANALYSIS_SYSTEM_PROMPT
+    
+    @staticmethod
+    def _forecast_prompt(code: str, cloud_provider: str, iac_type: str, forecast_months: int) -> str:
+        """Build the cost forecast prompt; the instructions are in FORECAST_SYSTEM_PROMPT."""
+        return f"""
+        Cloud provider: {cloud_provider}
+        Infrastructure as code type: {iac_type}
+        Forecast period: {forecast_months} months
+
+        CODE TO ANALYZE:
+        ```
+        {code}
+        ```
+        """
+    
+    async def stream_analyze_costs(
+        self,
+        code: str,
+        cloud_provider: str,
+        iac_type: str
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Analyze infrastructure code for cost optimization, yielding results as they stream in.
+        
+        Args:
+            code: The infrastructure code to analyze
+            cloud_provider: The cloud provider (aws, azure, gcp)
+            iac_type: The infrastructure as code type
+            
+        Yields:
+            (field, value) pairs of the cost analysis as soon as each field is complete
+        """
+        logger.info(f"Streaming {iac_type} cost analysis for {cloud_provider}")
+        prompt, system_prompt = self._analysis_prompt(code, cloud_provider, iac_type)
+        async for item in self._stream_completion_items(
+            prompt, "analysis", cloud_provider, iac_type, system_prompt=system_prompt
+        ):
+            yield item
+    
+    async def stream_forecast_costs(
+        self,
+        code: str,
+        cloud_provider: str,
+        iac_type: str,
+        forecast_months: int = 12
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Generate a cost forecast, yielding results as they stream in.
+        
+        Fields such as "cost_drivers" can be used before the long
+        "monthly_forecasts" array has finished generating.
+        
+        Args:
+            code: The infrastructure code to analyze
+            cloud_provider: The cloud provider (aws, azure, gcp)
+            iac_type: The infrastructure as code type
+            forecast_months: Number of months to forecast
+            
+        Yields:
+            (field, value) pairs of the forecast as soon as each field is complete
+        """
+        logger.info(f"Streaming {forecast_months}-month cost forecast for {cloud_provider} using {iac_type}")
+        prompt = self._forecast_prompt(code, cloud_provider, iac_type, forecast_months)
+        async for item in self._stream_completion_items(
+            prompt, "forecast", cloud_provider, iac_type,
+            system_prompt=FORECAST_SYSTEM_PROMPT, forecast_months=forecast_months
+        ):
+            yield item
+    
+    async def _stream_completion_items(
+        self,
+        prompt: str,
+        kind: str,
+        cloud_provider: str,
+        iac_type: str,
+        system_prompt: Optional[str] = None,
+        **scope: Any
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a JSON object completion through the completion cache; see CompletionCache.stream_items.
+        
+        Args:
+            prompt: The prompt to send to the model
+            kind: Type of request (analysis, forecast)
+            cloud_provider: The cloud provider (aws, azure, gcp)
+            iac_type: The infrastructure as code type
+            system_prompt: Optional system prompt sent with the prompt
+            **scope: Extra values a reused completion must match, e.g. forecast_months
+            
+        Yields:
+            (field, value) pairs in the order the model produced them
+        """
+        async for item in self.completion_cache.stream_items(
+            self.llm_service, prompt, system_prompt, kind,
+            cloud_provider=cloud_provider, iac_type=iac_type, **scope
+        ):
+            yield item
+    
+    async def _cached_completion(
+        self,
+        prompt: str,
+        kind: str,
+        cloud_provider: str,
+        iac_type: str,
+        system_prompt: Optional[str] = None,
+        **scope: Any
+    ) -> str:
+        """
+        Generate a completion, reusing an identical or near-identical past prompt.
+        
+        Args:
+            prompt: The prompt to send to the model
+            kind: Type of request (analysis, optimization, forecast)
+            cloud_provider: The cloud provider (aws, azure, gcp)
+            iac_type: The infrastructure as code type
+            system_prompt: Optional system prompt sent with the prompt
+            **scope: Extra values a reused completion must match, e.g. forecast_months
+            
+        Returns:
+            The model's completion text
+        """
+        return await self.completion_cache.complete(
+            self.llm_service, prompt, system_prompt, kind,
+            cloud_provider=cloud_provider, iac_type=iac_type, **scope
+        )
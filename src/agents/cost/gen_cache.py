@@ -0,0 +1,190 @@
+"""
+Structural Cost Cache Module for Multi-Agent Infrastructure Automation System
+
+This module defines the StructuralCostCache class that reuses cost analyses
+across Terraform files sharing the same structure, so code that differs only
+in literal values (names, AMIs, tags) does not need another LLM call.
+"""
+
+import re
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_BLOCK_COMMENT_RE = re.compile(r'/\*[\s\S]*?\*/')
+_LINE_COMMENT_RE = re.compile(r'^\s*(?:#|//).*$', re.MULTILINE)
+# `name = value` attribute lines; only the value side is turned into slots
+_ATTRIBUTE_RE = re.compile(r'^(\s*([\w-]+)\s*=\s*)(.+?)\s*$', re.MULTILINE)
+_LITERAL_RE = re.compile(r'"(?:[^"\\]|\\.)*"|(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Slot values shorter than this are too ambiguous to substitute in free text
+_MIN_SUBSTITUTION_LENGTH = 3
+
+# Attributes whose values never affect the price of a resource. Any other
+# changed value (instance types, node group sizes, storage tiers, disk types,
+# counts) may change the cost, so a cached analysis is only reused when
+# nothing but these, and values inside tag maps, differ.
+UNPRICED_ATTRIBUTES = frozenset({
+    "name", "name_prefix", "description", "ami", "bucket", "bucket_prefix", "identifier",
+    "cluster_name", "function_name", "db_name", "key_name", "username", "comment", "display_name"
+})
+
+# Maps of free-form labels; every value inside them is unpriced
+_TAG_MAPS = frozenset({"tags", "tags_all", "labels"})
+_TAG_BLOCK_RE = re.compile(rf'^\s*(?:{"|".join(sorted(_TAG_MAPS))})\s*=?\s*\{{', re.MULTILINE)
+_TAG_ATTRIBUTE_PREFIX = "tags."
+
+def skeletonize(code: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    Replace literal attribute values in HCL code with typed placeholders.
+
+    Resource types, labels and attribute names are kept, so two files share
+    a skeleton only if they declare the same resources with the same shape.
+
+    Args:
+        code: Terraform code
+
+    Returns:
+        Tuple of the skeleton and the (attribute, literal) pairs in slot order
+    """
+    slots: List[Tuple[str, str]] = []
+
+    def replace_attribute(match: "re.Match") -> str:
+        attribute = match.group(2)
+        if any(start <= match.start() < end for start, end in tag_spans):
+            attribute = _TAG_ATTRIBUTE_PREFIX + attribute
+
+        def replace_literal(literal_match: "re.Match") -> str:
+            literal = literal_match.group(0)
+            kind = "STR" if literal.startswith('"') else "NUM"
+            slots.append((attribute, literal))
+            return f"<{kind}:{len(slots) - 1}>"
+
+        return match.group(1) + _LITERAL_RE.sub(replace_literal, match.group(3))
+
+    code = _BLOCK_COMMENT_RE.sub(' ', code)
+    code = _LINE_COMMENT_RE.sub(' ', code)
+    tag_spans = _tag_spans(code)
+    skeleton = _ATTRIBUTE_RE.sub(replace_attribute, code)
+    return _WHITESPACE_RE.sub(' ', skeleton).strip(), slots
+
+def _tag_spans(code: str) -> List[Tuple[int, int]]:
+    """Character ranges of the bodies of tag and label maps."""
+    spans = []
+    for match in _TAG_BLOCK_RE.finditer(code):
+        depth = 1
+        position = match.end()
+        while depth and position < len(code):
+            depth += {"{": 1, "}": -1}.get(code[position], 0)
+            position += 1
+        spans.append((match.end(), position))
+    return spans
+
+class StructuralCostCache:
+    """
+    In-process LRU cache of cost analyses keyed on the structure of the code.
+
+    On a lookup whose skeleton matches a cached entry, the cached analysis is
+    re-rendered by replacing the old string slot values with the new ones
+    wherever they appear in its text. Only strings of known unpriced
+    attributes (names, descriptions, AMIs, tags) may differ; any other value,
+    such as an instance type, count or storage tier, drives the cost
+    estimates directly and cannot be rescaled, so the model is asked again.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        """
+        Initialize a new StructuralCostCache.
+
+        Args:
+            maxsize: Maximum number of skeletons kept (LRU eviction)
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[List[Tuple[str, str]], Dict[str, Any]]]" = OrderedDict()
+
+    @staticmethod
+    def skeleton_hash(skeleton: str, cloud_provider: str) -> str:
+        """Hash a skeleton together with the cloud provider it was priced for."""
+        return hashlib.sha256(f"{cloud_provider}\n{skeleton}".encode("utf-8")).hexdigest()
+
+    def lookup(self, code: str, cloud_provider: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached analysis for structurally identical code.
+
+        Args:
+            code: Terraform code to analyze
+            cloud_provider: The cloud provider (aws, azure, gcp)
+
+        Returns:
+            The re-rendered analysis, or None on a miss
+        """
+        skeleton, slots = skeletonize(code)
+        key = self.skeleton_hash(skeleton, cloud_provider)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        cached_slots, analysis = entry
+        substitutions = {}
+        for (attribute, old), (_, new) in zip(cached_slots, slots):
+            if old == new:
+                continue
+            if (
+                not _is_unpriced(attribute)
+                or not old.startswith('"')
+                or len(old) - 2 < _MIN_SUBSTITUTION_LENGTH
+            ):
+                self.misses += 1
+                return None
+            substitutions[old[1:-1]] = new[1:-1]
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        logger.debug("Structural cost cache hit with %d substituted slots", len(substitutions))
+        return _substitute(analysis, substitutions)
+
+    def store(self, code: str, cloud_provider: str, analysis: Dict[str, Any]) -> None:
+        """
+        Cache the analysis of a piece of code under its skeleton.
+
+        Args:
+            code: The analyzed Terraform code
+            cloud_provider: The cloud provider (aws, azure, gcp)
+            analysis: The parsed cost analysis
+        """
+        skeleton, slots = skeletonize(code)
+        key = self.skeleton_hash(skeleton, cloud_provider)
+        self._entries[key] = (slots, analysis)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+def _is_unpriced(attribute: str) -> bool:
+    """Whether a changed value of this attribute leaves the cost unchanged."""
+    return (
+        attribute in UNPRICED_ATTRIBUTES
+        or attribute in _TAG_MAPS
+        or attribute.startswith(_TAG_ATTRIBUTE_PREFIX)
+    )
+
+def _substitute(value: Any, substitutions: Dict[str, str]) -> Any:
+    """Return a copy of a JSON-like value with slot values replaced in every string."""
+    if isinstance(value, str):
+        for old, new in substitutions.items():
+            value = value.replace(old, new)
+        return value
+    if isinstance(value, dict):
+        return {key: _substitute(item, substitutions) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_substitute(item, substitutions) for item in value]
+    return value
@@ -5,25 +5,139 @@ This module defines the GitHubAgent class that specializes in managing
 GitHub repositories, pull requests, issues, and workflows.
 """
 
+import os
+import re
+import ast
+import asyncio
+import hashlib
+import inspect
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Any, AsyncIterator, Awaitable, Callable, ClassVar, Dict, List, Optional, Tuple
+
+import aiohttp
 
 from src.agents.base.base_agent import BaseAgent
-from src.utils.template_utils import load_template
+from src.services.llm.cache import LLMCache, is_error_response
+from src.utils.http_utils import retry_request
+from src.utils.template_utils import load_template, template_dir
 
 logger = logging.getLogger(__name__)
 
+_WHITESPACE_RE = re.compile(r'\s+')
+
+GITHUB_API_URL = "https://api.github.com"
+
+# Start of each file's section in a multi-file review response
+_REVIEW_SECTION_RE = re.compile(r'^#+\s*REVIEW\s+(\d+)\b.*$', re.MULTILINE)
+
+# Page number of the rel="last" link in a paginated GitHub response
+_LAST_PAGE_RE = re.compile(r'[?&]page=(\d+)[^>]*>;\s*rel="last"')
+
+# Languages with a ready-made workflow template (github_workflow_<language>.j2),
+# found once at import
+_WORKFLOW_TEMPLATE_PREFIX = "github_workflow_"
+_WORKFLOW_TEMPLATES = frozenset(
+    name[len(_WORKFLOW_TEMPLATE_PREFIX):-len(".j2")]
+    for name in os.listdir(template_dir)
+    if name.startswith(_WORKFLOW_TEMPLATE_PREFIX) and name.endswith(".j2")
+)
+_LANGUAGE_ALIASES = {
+    "javascript": "node",
+    "typescript": "node",
+    "nodejs": "node",
+    "node.js": "node",
+    "golang": "go"
+}
+
+# CI requirements the workflow templates can fulfil, mapped to their step names
+_WORKFLOW_STEPS = {
+    "lint": "lint",
+    "linting": "lint",
+    "test": "test",
+    "tests": "test",
+    "testing": "test",
+    "unit tests": "test",
+    "build": "build"
+}
+_DEFAULT_WORKFLOW_STEPS = frozenset({"lint", "test", "build"})
+
+# Marks the code left out of a review prompt by _select_review_regions()
+_ELIDED = "... elided ..."
+
+def _select_review_regions(code: str, language: str, max_chars: int) -> Tuple[str, bool]:
+    """
+    Shorten code for a review prompt to at most about max_chars characters.
+    
+    Python code keeps its largest top-level definitions, in source order;
+    other code (or Python that doesn't parse) keeps its start and end.
+    Omitted code is replaced by an elision marker.
+    
+    Args:
+        code: Code to review
+        language: Programming language
+        max_chars: Character budget for the code
+        
+    Returns:
+        Tuple of the selected code and whether anything was left out
+    """
+    if len(code) <= max_chars:
+        return code, False
+    
+    if language.strip().lower() in ("python", "py"):
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            tree = None
+        if tree is not None:
+            lines = code.splitlines()
+            chunks = []
+            for node in tree.body:
+                start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+                chunks.append("\n".join(lines[start - 1:node.end_lineno]))
+            
+            keep = set()
+            used = 0
+            for index in sorted(range(len(chunks)), key=lambda i: len(chunks[i]), reverse=True):
+                if used + len(chunks[index]) < max_chars:
+                    keep.add(index)
+                    used += len(chunks[index]) + 1
+            
+            if keep:
+                parts = []
+                for index, chunk in enumerate(chunks):
+                    if index in keep:
+                        parts.append(chunk)
+                    elif not parts or parts[-1] != _ELIDED:
+                        parts.append(_ELIDED)
+                return "\n".join(parts), True
+    
+    head = code[:max_chars * 3 // 4].rsplit("\n", 1)[0]
+    tail = code[-(max_chars // 4):].split("\n", 1)[-1]
+    return f"{head}\n{_ELIDED}\n{tail}", True
+
 class GitHubAgent(BaseAgent):
     """
     Specialized agent for GitHub integration and automation.
     Capable of managing repositories, branches, pull requests, and GitHub Actions workflows.
     """
     
+    # The agent's capabilities; the same for every instance, so shared rather than rebuilt
+    CAPABILITIES: ClassVar[Tuple[str, ...]] = (
+        "repository_management",
+        "pull_request_automation",
+        "code_review",
+        "issue_tracking",
+        "github_actions_workflow",
+        "branch_management",
+        "release_management"
+    )
+    
     def __init__(
         self,
         llm_service: Any,
         vector_db_service: Optional[Any] = None,
-        config: Optional[Dict[str, Any]] = None
+        config: Optional[Dict[str, Any]] = None,
+        llm_cache: Optional[LLMCache] = None
     ):
         """
         Initialize a new GitHubAgent.
@@ -32,23 +146,13 @@ class GitHubAgent(BaseAgent):
             llm_service: Service for language model interactions
             vector_db_service: Optional service for vector database operations
             config: Optional configuration parameters
+            llm_cache: Optional cache for LLM completions
         """
-        # Define the agent's capabilities
-        capabilities = [
-            "repository_management",
-            "pull_request_automation",
-            "code_review",
-            "issue_tracking",
-            "github_actions_workflow",
-            "branch_management",
-            "release_management"
-        ]
-        
         # Call the parent class constructor with all required parameters
         super().__init__(
             name="github_agent",
             description="Agent responsible for managing GitHub repositories, code, and workflows",
-            capabilities=capabilities,
+            capabilities=self.CAPABILITIES,
             llm_service=llm_service,
             vector_db_service=vector_db_service,
             config=config
@@ -58,6 +162,33 @@ class GitHubAgent(BaseAgent):
         self.github_token = config.get("github_token") if config else None
         self.github_username = config.get("github_username") if config else None
         self.github_org = config.get("github_org") if config else None
+        self.github_api_url = self.config.get("github_api_url", GITHUB_API_URL).rstrip("/")
+        
+        # Shared GitHub API session, created on first use when a token is configured
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Cache for LLM completions so repeated workflow and review prompts are not re-sent
+        self.llm_cache = llm_cache or LLMCache(
+            maxsize=self.config.get("llm_cache_size", 1024),
+            ttl=self.config.get("llm_cache_ttl", 3600)
+        )
+        
+        # (action, prompt) pairs of the batches submitted by this agent, by batch ID
+        self._batches: Dict[str, List[Tuple[str, str]]] = {}
+        
+        # Action handlers used by process(); each takes the request parameters
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+            "create_repository": self._handle_create_repository,
+            "create_pull_request": self._handle_create_pull_request,
+            "generate_workflow": self._handle_generate_workflow,
+            "review_code": self._handle_review_code,
+            "review_codes": self._handle_review_codes,
+            "manage_release": self._handle_manage_release
+        }
+        
+        # Only these actions benefit from think(); the rest are mechanical
+        self._think_actions = {"review_code", "review_codes", "generate_workflow"}
         
         logger.info("GitHub agent initialized")
     
@@ -69,6 +200,9 @@ class GitHubAgent(BaseAgent):
             input_data: Dictionary containing the request details
                 - action: The GitHub action to perform (create_repo, create_pr, etc.)
                 - parameters: Parameters specific to the action
+                - force_think: Think before mechanical actions too
+                - actions: Optional list of {"action", "parameters"} dictionaries to
+                  submit as one batch when "batch" (or the batch_mode config) is set
         
         Returns:
             Dictionary containing the results of the operation
@@ -80,56 +214,31 @@ class GitHubAgent(BaseAgent):
         task_id = input_data.get("task_id", "")
         
         try:
-            # First, think about how to approach the task
-            thoughts = await self.think(input_data)
-            
-            # Process the action based on the type
-            if action == "create_repository":
-                result = await self.create_repository(
-                    name=parameters.get("name", ""),
-                    description=parameters.get("description", ""),
-                    private=parameters.get("private", False),
-                    template_repo=parameters.get("template_repo")
-                )
-            elif action == "create_pull_request":
-                result = await self.create_pull_request(
-                    repo=parameters.get("repo", ""),
-                    title=parameters.get("title", ""),
-                    body=parameters.get("body", ""),
-                    head=parameters.get("head", ""),
-                    base=parameters.get("base", "main")
-                )
-            elif action == "generate_workflow":
-                result = {
-                    "workflow": await self.generate_github_actions_workflow(
-                        repo_type=parameters.get("repo_type", ""),
-                        language=parameters.get("language", ""),
-                        ci_requirements=parameters.get("ci_requirements", [])
-                    )
+            # Bulk jobs are queued with the provider's Batch API; see poll_batch()
+            if input_data.get("batch", self.config.get("batch_mode", False)) and "actions" in input_data:
+                result = await self.submit_batch(input_data["actions"])
+                self.update_state("idle")
+                return {
+                    "task_id": task_id,
+                    "action": "batch",
+                    "result": result,
+                    "status": "success"
                 }
-            elif action == "review_code":
-                result = await self.review_code(
-                    code=parameters.get("code", ""),
-                    language=parameters.get("language", ""),
-                    review_focus=parameters.get("review_focus", [])
-                )
-            elif action == "manage_release":
-                result = await self.manage_releases(
-                    repo=parameters.get("repo", ""),
-                    version=parameters.get("version", ""),
-                    release_notes=parameters.get("release_notes", ""),
-                    target_branch=parameters.get("target_branch", "main")
-                )
+            
+            # First, think about how to approach the task (skipped for mechanical actions)
+            if action in self._think_actions or input_data.get("force_think"):
+                thoughts = await self.think(input_data)
+            else:
+                thoughts = {"thoughts": ""}
+            
+            # Dispatch the action to its handler
+            handler = self._handlers.get(action)
+            if handler is not None:
+                result = await handler(parameters)
             else:
                 result = {
                     "error": f"Unsupported action: {action}",
-                    "supported_actions": [
-                        "create_repository",
-                        "create_pull_request",
-                        "generate_workflow",
-                        "review_code",
-                        "manage_release"
-                    ]
+                    "supported_actions": list(self._handlers)
                 }
             
             # Store in memory
@@ -160,6 +269,63 @@ class GitHubAgent(BaseAgent):
                 "status": "error"
             }
     
+    async def _handle_create_repository(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the create_repository action."""
+        return await self.create_repository(
+            name=parameters.get("name", ""),
+            description=parameters.get("description", ""),
+            private=parameters.get("private", False),
+            template_repo=parameters.get("template_repo")
+        )
+    
+    async def _handle_create_pull_request(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the create_pull_request action."""
+        return await self.create_pull_request(
+            repo=parameters.get("repo", ""),
+            title=parameters.get("title", ""),
+            body=parameters.get("body", ""),
+            head=parameters.get("head", ""),
+            base=parameters.get("base", "main")
+        )
+    
+    async def _handle_generate_workflow(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the generate_workflow action."""
+        return {
+            "workflow": await self.generate_github_actions_workflow(
+                repo_type=parameters.get("repo_type", ""),
+                language=parameters.get("language", ""),
+                ci_requirements=parameters.get("ci_requirements", [])
+            )
+        }
+    
+    async def _handle_review_code(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the review_code action."""
+        return await self.review_code(
+            code=parameters.get("code", ""),
+            language=parameters.get("language", ""),
+            review_focus=parameters.get("review_focus", []),
+            n_samples=parameters.get("n_samples", 1),
+            namespace=parameters.get("namespace", "default")
+        )
+    
+    async def _handle_review_codes(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the review_codes action."""
+        return {
+            "reviews": await self.review_codes(
+                files=parameters.get("files", []),
+                review_focus=parameters.get("review_focus", [])
+            )
+        }
+    
+    async def _handle_manage_release(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the manage_release action."""
+        return await self.manage_releases(
+            repo=parameters.get("repo", ""),
+            version=parameters.get("version", ""),
+            release_notes=parameters.get("release_notes", ""),
+            target_branch=parameters.get("target_branch", "main")
+        )
+    
     async def create_repository(self, name: str, description: str, private: bool = False, 
                               template_repo: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -174,9 +340,23 @@ class GitHubAgent(BaseAgent):
         Returns:
             Dictionary containing the created repository details
         """
-        # This would integrate with the GitHub API in a real implementation
         logger.info(f"Creating GitHub repository: {name}")
         
+        if self.github_token:
+            payload = {"name": name, "description": description, "private": private}
+            if template_repo:
+                path = f"/repos/{template_repo}/generate"
+                if self.github_org:
+                    payload["owner"] = self.github_org
+            else:
+                path = f"/orgs/{self.github_org}/repos" if self.github_org else "/user/repos"
+            repository = await self._github_request("POST", path, json=payload)
+            return {
+                key: repository.get(key)
+                for key in ("name", "full_name", "description", "private", "html_url", "clone_url", "created_at")
+            }
+        
+        # Without a token the repository is simulated
         org_or_user = self.github_org if self.github_org else self.github_username
         repo_url = f"https://github.com/{org_or_user}/{name}"
         
@@ -205,10 +385,26 @@ class GitHubAgent(BaseAgent):
         Returns:
             Dictionary containing the created PR details
         """
-        # This would integrate with the GitHub API in a real implementation
         logger.info(f"Creating GitHub PR in {repo}: {title}")
         
-        pr_number = hash(f"{repo}:{title}") % 1000
+        if self.github_token:
+            pull_request = await self._github_request(
+                "POST", f"/repos/{repo}/pulls", json={"title": title, "body": body, "head": head, "base": base}
+            )
+            return {
+                "number": pull_request["number"],
+                "title": pull_request["title"],
+                "body": pull_request.get("body"),
+                "state": pull_request["state"],
+                "html_url": pull_request["html_url"],
+                "head": {"ref": pull_request["head"]["ref"]},
+                "base": {"ref": pull_request["base"]["ref"]}
+            }
+        
+        # Without a token the pull request is simulated
+        # Deterministic across restarts, unlike the per-process randomized hash()
+        pr_hash = int.from_bytes(hashlib.blake2b(f"{repo}:{title}".encode("utf-8"), digest_size=8).digest(), "big")
+        pr_number = pr_hash % 1000
         
         return {
             "number": pr_number,
@@ -233,22 +429,62 @@ class GitHubAgent(BaseAgent):
         Returns:
             GitHub Actions workflow YAML as a string
         """
+        # Common languages and CI steps are rendered from a template without the LLM
+        workflow = self._render_workflow_template(language, ci_requirements)
+        if workflow is not None:
+            logger.info(f"Rendered GitHub Actions workflow for {language} {repo_type} from template")
+            return workflow
+        
         # Use LLM to generate GitHub Actions workflow
         logger.info(f"Generating GitHub Actions workflow for {language} {repo_type}")
         
-        prompt = f"""
+        response = await self._cached_completion(
+            self._workflow_prompt(repo_type, language, ci_requirements)
+        )
+        return response.strip()
+    
+    @staticmethod
+    def _render_workflow_template(language: str, ci_requirements: List[str]) -> Optional[str]:
+        """
+        Render a workflow from the language's template.
+        
+        Args:
+            language: Programming language
+            ci_requirements: List of CI requirements
+            
+        Returns:
+            The workflow YAML, or None if there is no template for the language
+            or a requirement is not one of the template's steps
+        """
+        language = language.strip().lower()
+        language = _LANGUAGE_ALIASES.get(language, language)
+        if language not in _WORKFLOW_TEMPLATES:
+            return None
+        
+        steps = set()
+        for requirement in ci_requirements:
+            step = _WORKFLOW_STEPS.get(requirement.strip().lower())
+            if step is None:
+                return None
+            steps.add(step)
+        
+        template = load_template(f"{_WORKFLOW_TEMPLATE_PREFIX}{language}.j2")
+        return template.render(steps=steps or _DEFAULT_WORKFLOW_STEPS).strip()
+    
+    @staticmethod
+    def _workflow_prompt(repo_type: str, language: str, ci_requirements: List[str]) -> str:
+        """Build the prompt for generate_github_actions_workflow()."""
+        return f"""
         Generate a GitHub Actions workflow YAML file for a {repo_type} project written in {language}.
         
         The workflow should include the following CI steps:
-        {', '.join(ci_requirements)}
+        {', '.join(sorted(set(ci_requirements)))}
         
         Return only the YAML content without any additional text.
         """
-        
-        response = await self.llm_service.generate_completion(prompt)
-        return response.strip()
     
-    async def review_code(self, code: str, language: str, review_focus: List[str]) -> Dict[str, Any]:
+    async def review_code(self, code: str, language: str, review_focus: List[str],
+                          n_samples: int = 1, namespace: str = "default") -> Dict[str, Any]:
         """
         Review code and provide feedback.
         
@@ -256,16 +492,160 @@ class GitHubAgent(BaseAgent):
             code: Code to review
             language: Programming language
             review_focus: Aspects to focus on (security, performance, etc.)
+            n_samples: Number of independent reviews to request
+            namespace: Cache namespace of the samples (e.g. a task ID); rerunning
+                with the same namespace replays the same samples
             
         Returns:
-            Dictionary with review comments and suggestions
+            Dictionary with review comments and suggestions; with several
+            samples, "samples" holds every full review
         """
         # Use LLM to review code
         logger.info(f"Reviewing {language} code focusing on {', '.join(review_focus)}")
         
-        prompt = f"""
-        Review the following {language} code focusing on {', '.join(review_focus)}:
+        prompt = self._review_prompt(code, language, review_focus)
+        responses = await asyncio.gather(*(
+            self._cached_completion(prompt, namespace, index) for index in range(max(n_samples, 1))
+        ))
+        result = self._review_result(responses[0])
+        if n_samples > 1:
+            result["samples"] = list(responses)
+        return result
+    
+    async def review_codes(self, files: List[Dict[str, str]], review_focus: List[str]) -> List[Dict[str, Any]]:
+        """
+        Review several files with one LLM request per batch of files.
+        
+        The files share one set of review instructions, and the response is
+        split back into per-file reviews. Files are batched so a prompt holds
+        at most review_batch_max_chars characters of code; batches run
+        concurrently. A file whose review is missing from the response is
+        reviewed on its own.
+        
+        Args:
+            files: Dictionaries with "code" and optional "name" and "language"
+            review_focus: Aspects to focus on (security, performance, etc.)
+            
+        Returns:
+            One review per file, in the order of files
+        """
+        logger.info(f"Reviewing {len(files)} files focusing on {', '.join(review_focus)}")
+        max_chars = self.config.get("review_batch_max_chars", 240_000)
+        
+        batches: List[List[int]] = [[]]
+        batch_chars = 0
+        for index, file in enumerate(files):
+            size = min(len(file.get("code", "")), self.config.get("review_max_chars", 8000))
+            if batches[-1] and batch_chars + size > max_chars:
+                batches.append([])
+                batch_chars = 0
+            batches[-1].append(index)
+            batch_chars += size
+        
+        reviews: List[Optional[Dict[str, Any]]] = [None] * len(files)
+        
+        async def review_batch(indices: List[int]) -> None:
+            if len(indices) == 1:
+                file = files[indices[0]]
+                reviews[indices[0]] = await self.review_code(file.get("code", ""), file.get("language", ""), review_focus)
+                return
+            
+            response = await self._cached_completion(self._multi_review_prompt([files[i] for i in indices], review_focus))
+            sections = self._split_reviews(response, len(indices))
+            for position, index in enumerate(indices):
+                if position in sections:
+                    reviews[index] = self._review_result(sections[position])
+                else:
+                    file = files[index]
+                    reviews[index] = await self.review_code(file.get("code", ""), file.get("language", ""), review_focus)
+        
+        if files:
+            await asyncio.gather(*(review_batch(indices) for indices in batches))
+        return reviews
+    
+    def _multi_review_prompt(self, files: List[Dict[str, str]], review_focus: List[str]) -> str:
+        """Build the prompt for review_codes(), one section per file."""
+        sections = []
+        for index, file in enumerate(files):
+            language = file.get("language", "")
+            code, trimmed = _select_review_regions(file.get("code", ""), language, self.config.get("review_max_chars", 8000))
+            note = f"(shortened; \"{_ELIDED}\" marks omitted code)\n" if trimmed else ""
+            sections.append(f"### FILE {index}: {file.get('name', f'file {index}')}\n{note}```{language}\n{code}\n```")
+        files_text = "\n\n".join(sections)
+        return f"""
+        Review each of the following {len(files)} files focusing on {', '.join(sorted(set(review_focus)))}.
+        
+        {files_text}
         
+        For each file, write a section starting with the line "### REVIEW <n>", where <n>
+        is the number of its "### FILE <n>" header, containing a detailed review with:
+        1. Overall assessment
+        2. Specific issues found
+        3. Suggested improvements
+        4. Code examples for fixes
+        """
+    
+    @staticmethod
+    def _split_reviews(response: str, count: int) -> Dict[int, str]:
+        """Split a multi-file review response into its sections, by file number."""
+        if is_error_response(response):
+            return {}
+        matches = list(_REVIEW_SECTION_RE.finditer(response))
+        sections = {}
+        for position, match in enumerate(matches):
+            number = int(match.group(1))
+            end = matches[position + 1].start() if position + 1 < len(matches) else len(response)
+            if number < count and number not in sections:
+                sections[number] = response[match.end():end].strip()
+        return sections
+    
+    async def review_code_stream(self, code: str, language: str, review_focus: List[str]) -> AsyncIterator[str]:
+        """
+        Review code, yielding the review text as the model generates it.
+        
+        Callers can show the review from the first token instead of waiting
+        for the whole generation. A cached review is yielded in one chunk.
+        
+        Args:
+            code: Code to review
+            language: Programming language
+            review_focus: Aspects to focus on (security, performance, etc.)
+            
+        Yields:
+            Chunks of the review text
+        """
+        logger.info(f"Streaming review of {language} code focusing on {', '.join(review_focus)}")
+        prompt = self._review_prompt(code, language, review_focus)
+        
+        if not inspect.isasyncgenfunction(getattr(self.llm_service, "generate_stream", None)):
+            yield await self._cached_completion(prompt)
+            return
+        
+        key = self._completion_key(prompt)
+        cached = await self.llm_cache.get(key)
+        if cached is not None:
+            logger.info("LLM cache hit")
+            yield cached
+            return
+        
+        chunks = []
+        failed = False
+        async for chunk in self.llm_service.generate_stream(prompt):
+            failed = failed or is_error_response(chunk)
+            chunks.append(chunk)
+            yield chunk
+        
+        # Only a review streamed to the end without errors is complete enough to cache
+        if chunks and not failed:
+            await self.llm_cache.set(key, "".join(chunks))
+    
+    def _review_prompt(self, code: str, language: str, review_focus: List[str]) -> str:
+        """Build the prompt for review_code(), shortening long code to review_max_chars."""
+        code, trimmed = _select_review_regions(code, language, self.config.get("review_max_chars", 8000))
+        note = f"The code has been shortened to its most relevant sections; \"{_ELIDED}\" marks omitted code.\n" if trimmed else ""
+        return f"""
+        Review the following {language} code focusing on {', '.join(sorted(set(review_focus)))}:
+        {note}
         ```{language}
         {code}
         ```
@@ -276,9 +656,10 @@ class GitHubAgent(BaseAgent):
         3. Suggested improvements
         4. Code examples for fixes
         """
-        
-        response = await self.llm_service.generate_completion(prompt)
-        
+    
+    @staticmethod
+    def _review_result(response: str) -> Dict[str, Any]:
+        """Turn a code review completion into structured feedback."""
         # Parse the response into structured feedback
         # This is a simplified version
         return {
@@ -292,6 +673,108 @@ class GitHubAgent(BaseAgent):
             "full_review": response
         }
     
+    async def submit_batch(self, actions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Submit several workflow generation and code review actions as one LLM batch.
+        
+        Batch processing is cheaper than interactive completions but can take
+        up to 24 hours, so it is meant for bulk jobs such as generating
+        workflows for many repositories. Collect the results with poll_batch().
+        
+        Args:
+            actions: List of {"action", "parameters"} dictionaries; only
+                "generate_workflow" and "review_code" are supported
+            
+        Returns:
+            Dictionary with the batch ID and the number of submitted actions
+        """
+        requests = []
+        for item in actions:
+            action = item.get("action", "")
+            parameters = item.get("parameters", {})
+            if action == "generate_workflow":
+                prompt = self._workflow_prompt(
+                    parameters.get("repo_type", ""),
+                    parameters.get("language", ""),
+                    parameters.get("ci_requirements", [])
+                )
+            elif action == "review_code":
+                prompt = self._review_prompt(
+                    parameters.get("code", ""),
+                    parameters.get("language", ""),
+                    parameters.get("review_focus", [])
+                )
+            else:
+                raise ValueError(f"Unsupported batch action: {action}")
+            requests.append((action, prompt))
+        
+        batch_id = await self.llm_service.submit_batch([prompt for _, prompt in requests])
+        self._batches[batch_id] = requests
+        logger.info(f"Submitted {len(requests)} GitHub actions as batch {batch_id}")
+        return {"batch_id": batch_id, "status": "submitted", "count": len(requests)}
+    
+    async def poll_batch(self, batch_id: str) -> Dict[str, Any]:
+        """
+        Check a batch submitted with submit_batch() and collect its results.
+        
+        Args:
+            batch_id: The batch ID returned by submit_batch()
+            
+        Returns:
+            Dictionary with the batch status and, once completed, the results
+            in the order the actions were submitted
+        """
+        completions = await self.llm_service.get_batch_results(batch_id)
+        if completions is None:
+            return {"batch_id": batch_id, "status": "in_progress"}
+        
+        requests = self._batches.pop(batch_id, None)
+        if requests is None:
+            # Submitted by another agent instance; the actions are unknown
+            return {"batch_id": batch_id, "status": "completed", "results": completions}
+        
+        results = []
+        for (action, prompt), response in zip(requests, completions):
+            # Completed batch items also serve later interactive requests
+            if not is_error_response(response):
+                await self.llm_cache.set(self._completion_key(prompt), response)
+            if action == "generate_workflow":
+                results.append({"workflow": response.strip()})
+            else:
+                results.append(self._review_result(response))
+        return {"batch_id": batch_id, "status": "completed", "results": results}
+    
+    def _completion_key(self, prompt: str) -> str:
+        """Build the LLM cache key of a prompt, ignoring differences in whitespace."""
+        normalized = _WHITESPACE_RE.sub(" ", prompt).strip()
+        return LLMCache.cache_key(getattr(self.llm_service, "model", ""), normalized)
+    
+    async def _cached_completion(self, prompt: str, namespace: str = "default", index: int = 0) -> str:
+        """
+        Generate a completion, serving repeated prompts from the LLM cache.
+        
+        Prompts are keyed with their whitespace collapsed, so differently
+        indented but otherwise identical requests share an entry.
+        
+        Args:
+            prompt: The prompt to send to the model
+            namespace: Sample namespace, for independent samples of one prompt
+            index: Position of the sample within the namespace
+            
+        Returns:
+            The model's completion text
+        """
+        key = LLMCache.sample_key(self._completion_key(prompt), namespace, index)
+        cached = await self.llm_cache.get(key)
+        if cached is not None:
+            logger.info("LLM cache hit")
+            return cached
+        
+        response = await self.llm_service.generate_completion(prompt)
+        if not is_error_response(response):
+            await self.llm_cache.set(key, response)
+        return response
+    
     async def manage_releases(self, repo: str, version: str, release_notes: str, 
                             target_branch: str = "main") -> Dict[str, Any]:
         """
@@ -306,9 +789,21 @@ class GitHubAgent(BaseAgent):
         Returns:
             Dictionary with release information
         """
-        # This would create a release in GitHub
         logger.info(f"Creating release v{version} for {repo}")
         
+        if self.github_token:
+            release = await self._github_request("POST", f"/repos/{repo}/releases", json={
+                "tag_name": f"v{version}",
+                "target_commitish": target_branch,
+                "name": f"Release v{version}",
+                "body": release_notes
+            })
+            return {
+                key: release.get(key)
+                for key in ("tag_name", "name", "body", "draft", "prerelease", "created_at", "published_at", "html_url")
+            }
+        
+        # Without a token the release is simulated
         return {
             "tag_name": f"v{version}",
             "name": f"Release v{version}",
@@ -318,4 +813,113 @@ class GitHubAgent(BaseAgent):
             "created_at": "2023-01-01T00:00:00Z",
             "published_at": "2023-01-01T00:00:00Z",
             "html_url": f"https://github.com/{repo}/releases/tag/v{version}"
-        }
\ No newline at end of file
+        }
+    
+    async def list_pull_requests(self, repo: str, state: str = "open") -> List[Dict[str, Any]]:
+        """
+        List the pull requests of a repository.
+        
+        The first page tells how many pages there are (Link header); the
+        remaining pages are then fetched concurrently.
+        
+        Args:
+            repo: Repository name (owner/repo)
+            state: Pull request state (open, closed, all)
+            
+        Returns:
+            List of pull requests as returned by the GitHub API
+        """
+        return await self._github_paginate(f"/repos/{repo}/pulls", {"state": state})
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Get the shared GitHub API session, creating it on first use.
+        
+        Connections are kept alive across calls, so repeated requests skip
+        the TCP/TLS handshake. The session is bound to the event loop that
+        created it and is recreated if used from another.
+        
+        Returns:
+            The shared aiohttp ClientSession
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.config.get("github_pool_size", 50),
+                keepalive_timeout=self.config.get("http_keepalive_timeout", 60)
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={
+                    "Authorization": f"Bearer {self.github_token}",
+                    "Accept": "application/vnd.github+json",
+                    "X-GitHub-Api-Version": "2022-11-28"
+                }
+            )
+            self._session_loop = loop
+        return self._session
+    
+    async def _github_request(
+        self,
+        method: str,
+        path: str,
+        **kwargs: Any
+    ) -> Any:
+        """
+        Call the GitHub API, retrying when it is rate limited or unavailable.
+        
+        Args:
+            method: HTTP method
+            path: API path, e.g. /user/repos
+            **kwargs: Arguments passed to aiohttp's request(), e.g. json and params
+            
+        Returns:
+            The decoded JSON response
+            
+        Raises:
+            aiohttp.ClientResponseError: If GitHub returns an error status
+        """
+        response_json, _ = await self._github_request_with_headers(method, path, **kwargs)
+        return response_json
+    
+    async def _github_request_with_headers(self, method: str, path: str, **kwargs: Any) -> Tuple[Any, Any]:
+        """Call the GitHub API like _github_request(), also returning the response headers."""
+        session = self._get_session()
+        async with retry_request(
+            lambda: session.request(method, f"{self.github_api_url}{path}", **kwargs),
+            max_retries=self.config.get("http_max_retries", 3),
+            backoff=self.config.get("http_retry_backoff", 0.5)
+        ) as response:
+            if response.status >= 400:
+                logger.error(f"GitHub API error for {method} {path}: {await response.text()}")
+                response.raise_for_status()
+            return await response.json(), response.headers
+    
+    async def _github_paginate(self, path: str, params: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """
+        Fetch every page of a paginated GitHub API endpoint.
+        
+        Args:
+            path: API path
+            params: Optional query parameters
+            
+        Returns:
+            The items of all pages, in page order
+        """
+        params = {**(params or {}), "per_page": 100}
+        items, headers = await self._github_request_with_headers("GET", path, params={**params, "page": 1})
+        match = _LAST_PAGE_RE.search(headers.get("Link", ""))
+        if match:
+            pages = await asyncio.gather(*(
+                self._github_request("GET", path, params={**params, "page": page})
+                for page in range(2, int(match.group(1)) + 1)
+            ))
+            for page_items in pages:
+                items.extend(page_items)
+        return items
+    
+    async def aclose(self) -> None:
+        """Close the GitHub API session, then flush memories as BaseAgent does."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        await super().aclose()
@@ -0,0 +1,166 @@
+"""
+Structural Generation Cache Module for Multi-Agent Infrastructure Automation System
+
+This module defines the StructuralGenerationCache class that reuses generated
+infrastructure code across requests that differ only in names and tag values,
+so such requests do not need another LLM call.
+"""
+
+import re
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Slot values shorter than this are too ambiguous to substitute in code
+_MIN_SUBSTITUTION_LENGTH = 3
+
+# Requirements that only name things; any other value (environment, sizes,
+# regions, retention) may shape the generated code and must match exactly
+NAMING_KEYS = frozenset({"name", "bucket", "prefix"})
+_NAMING_SUFFIXES = ("_name", "_prefix")
+
+# Requirement holding a map of free-form tags; each of its values is a slot
+_TAGS_KEY = "tags"
+_TAG_SLOT_PREFIX = "tags."
+
+# Characters that may not surround a substituted value, so "web" never
+# matches inside "webserver" or "my-web"
+_IDENTIFIER_CHARS = r'A-Za-z0-9_.\-'
+
+def _value_re(value: str) -> "re.Pattern":
+    """Match a literal value that is not part of a longer identifier."""
+    return re.compile(rf'(?<![{_IDENTIFIER_CHARS}]){re.escape(value)}(?![{_IDENTIFIER_CHARS}])')
+
+class StructuralGenerationCache:
+    """
+    In-process LRU cache of generated code keyed on the structure of the request.
+
+    Naming requirements (name, bucket, prefix, *_name, *_prefix) and tag
+    values are candidate slots; every other requirement, such as an
+    environment that drove instance sizes, must match exactly. When code is
+    stored, each candidate whose value appears in the code as a whole token
+    is turned into a placeholder; the other candidates must also match
+    exactly on reuse. A later request with the same IaC type, cloud
+    provider, task and remaining requirements is answered by substituting
+    its slot values into the stored template.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        """
+        Initialize a new StructuralGenerationCache.
+
+        Args:
+            maxsize: Maximum number of templates kept (LRU eviction)
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[Dict[str, str], List[Tuple[str, str]], str]]" = OrderedDict()
+
+    @staticmethod
+    def _is_naming_key(key: str) -> bool:
+        return key in NAMING_KEYS or key.endswith(_NAMING_SUFFIXES)
+
+    @classmethod
+    def _candidate_slots(cls, requirements: Dict[str, Any]) -> Dict[str, str]:
+        """Naming requirements and tag values that could be substituted in code, by slot name."""
+        candidates = {
+            key: value for key, value in requirements.items()
+            if cls._is_naming_key(key) and isinstance(value, str) and len(value) >= _MIN_SUBSTITUTION_LENGTH
+        }
+        tags = requirements.get(_TAGS_KEY)
+        if isinstance(tags, dict):
+            candidates.update(
+                (_TAG_SLOT_PREFIX + key, value) for key, value in tags.items()
+                if isinstance(value, str) and len(value) >= _MIN_SUBSTITUTION_LENGTH
+            )
+        return candidates
+
+    @classmethod
+    def structure_key(cls, iac_type: str, task: str, requirements: Dict[str, Any], cloud_provider: str) -> str:
+        """Hash a request with the values of its candidate slots left out."""
+        candidates = cls._candidate_slots(requirements)
+        fixed = {key: value for key, value in requirements.items() if key not in candidates}
+        if isinstance(fixed.get(_TAGS_KEY), dict):
+            fixed[_TAGS_KEY] = {
+                key: value for key, value in fixed[_TAGS_KEY].items()
+                if _TAG_SLOT_PREFIX + key not in candidates
+            }
+        payload = json.dumps([iac_type, cloud_provider, task, sorted(candidates), fixed], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(
+        self,
+        iac_type: str,
+        task: str,
+        requirements: Dict[str, Any],
+        cloud_provider: str
+    ) -> Optional[str]:
+        """
+        Find cached code for a structurally identical request.
+
+        Args:
+            iac_type: Type of IaC (terraform, ansible, jenkins)
+            task: The description of what to generate
+            requirements: Specific infrastructure requirements
+            cloud_provider: Target cloud provider
+
+        Returns:
+            The code with this request's slot values filled in, or None on a miss
+        """
+        key = self.structure_key(iac_type, task, requirements, cloud_provider)
+        entry = self._entries.get(key)
+        candidates = self._candidate_slots(requirements)
+        if entry is None or any(candidates[name] != value for name, value in entry[0].items()):
+            self.misses += 1
+            return None
+
+        _, slots, code = entry
+        for name, placeholder in slots:
+            code = code.replace(placeholder, candidates[name])
+        self._entries.move_to_end(key)
+        self.hits += 1
+        logger.debug("Structural generation cache hit with %d slots", len(slots))
+        return code
+
+    def store(
+        self,
+        iac_type: str,
+        task: str,
+        requirements: Dict[str, Any],
+        cloud_provider: str,
+        code: str
+    ) -> None:
+        """
+        Cache generated code as a template of its request's slot values.
+
+        Args:
+            iac_type: Type of IaC (terraform, ansible, jenkins)
+            task: The description of what was generated
+            requirements: Specific infrastructure requirements
+            cloud_provider: Target cloud provider
+            code: The generated code
+        """
+        unused: Dict[str, str] = {}
+        slots: List[Tuple[str, str]] = []
+        for index, (name, value) in enumerate(sorted(self._candidate_slots(requirements).items())):
+            value_re = _value_re(value)
+            if not value_re.search(code):
+                unused[name] = value
+                continue
+            placeholder = f"\x00slot{index}\x00"
+            code = value_re.sub(placeholder, code)
+            slots.append((name, placeholder))
+
+        key = self.structure_key(iac_type, task, requirements, cloud_provider)
+        self._entries[key] = (unused, slots, code)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
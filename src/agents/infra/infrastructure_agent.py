@@ -5,16 +5,171 @@ This module defines the InfrastructureAgent class that specializes in generating
 infrastructure as code (Terraform, Ansible, Jenkins) based on user requirements.
 """
 
-import os
-import json
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+from types import MappingProxyType
+from typing import Dict, List, Any, AsyncIterator, Mapping, Optional, Tuple
 
 from src.agents.base.base_agent import BaseAgent
-from src.utils.template_utils import load_template
+from src.agents.infra.gen_cache import StructuralGenerationCache
+from src.services.llm.cache import CompletionCache, LLMCache, is_error_response
+from src.utils import json_utils
+from src.utils.iac_utils import slim_iac_code
+from src.utils.template_utils import load_template, template_dir
 
 logger = logging.getLogger(__name__)
 
+# Vector DB collection holding past analyses for the semantic cache
+INFRA_CACHE_COLLECTION = "infrastructure_completions"
+
+# Completions that may be reused for a near-identical prompt once the semantic
+# cache is enabled. A one-token change (e.g. instance_type) changes a cost
+# estimate, so estimates are only ever reused for an exact repeat.
+_SEMANTIC_CACHE_KINDS = frozenset({"analysis"})
+
+# Map of cloud providers and their specific configurations, shared by every
+# InfrastructureAgent
+_CLOUD_PROVIDERS: Mapping[str, Dict[str, Any]] = MappingProxyType({
+    "aws": {
+        "service_mapping": {
+            "compute": "aws_instance",
+            "storage": "aws_s3_bucket",
+            "database": "aws_db_instance",
+            "network": "aws_vpc"
+        }
+    },
+    "azure": {
+        "service_mapping": {
+            "compute": "azurerm_virtual_machine",
+            "storage": "azurerm_storage_account",
+            "database": "azurerm_mysql_server",
+            "network": "azurerm_virtual_network"
+        }
+    },
+    "gcp": {
+        "service_mapping": {
+            "compute": "google_compute_instance",
+            "storage": "google_storage_bucket",
+            "database": "google_sql_database_instance",
+            "network": "google_compute_network"
+        }
+    }
+})
+
+# Static instructions sent as the system prompt. They are identical for every
+# request, so providers with prompt caching only process them once; the task,
+# requirements and code go in the user prompt.
+
+# Shared opening of every system prompt. Servers with prefix caching (e.g. vLLM
+# --enable-prefix-caching, llama.cpp) reuse its prefill when one task asks for
+# several kinds of code in a row.
+IAC_PREAMBLE = """You are an expert in Infrastructure as Code, configuration management and CI/CD pipelines.
+"""
+
+TERRAFORM_SYSTEM_PROMPT = IAC_PREAMBLE + """Generate a complete Terraform configuration for the task you are given.
+
+Generate a complete, production-ready Terraform configuration including:
+1. Provider configuration
+2. Variables and outputs
+3. Resource definitions with appropriate naming conventions
+4. Security best practices
+5. Any necessary modules or data sources
+
+Return ONLY the Terraform code without explanations or markdown formatting."""
+
+ANSIBLE_SYSTEM_PROMPT = IAC_PREAMBLE + """Generate a complete Ansible playbook for the task you are given.
+
+Generate a complete, production-ready Ansible playbook including:
+1. Host definitions
+2. Variables
+3. Tasks with appropriate naming and organization
+4. Handlers if needed
+5. Security best practices
+6. Error handling
+
+Return ONLY the Ansible YAML code without explanations or markdown formatting."""
+
+JENKINS_SYSTEM_PROMPT = IAC_PREAMBLE + """Generate a complete Jenkins pipeline configuration for the task you are given.
+
+Generate a complete, production-ready Jenkinsfile including:
+1. Pipeline stages
+2. Environment variables
+3. Appropriate agents/nodes
+4. Error handling and notifications
+5. Security best practices
+6. Parallel execution where appropriate
+
+Return ONLY the Jenkins pipeline code (Jenkinsfile) without explanations or markdown formatting."""
+
+ANALYSIS_SYSTEM_PROMPT = IAC_PREAMBLE + """Analyze the infrastructure code you are given and provide insights.
+
+Provide a comprehensive analysis including:
+1. Potential security issues
+2. Cost optimization opportunities
+3. Performance considerations
+4. Best practice violations
+5. Maintainability concerns
+
+Format your response as structured JSON with the following keys:
+- security_issues: Array of objects with 'severity', 'description', and 'recommendation'
+- cost_optimizations: Array of objects with 'potential_savings', 'description', and 'recommendation'
+- performance_considerations: Array of objects with 'impact', 'description', and 'recommendation'
+- best_practice_violations: Array of objects with 'importance', 'description', and 'recommendation'
+- maintainability_concerns: Array of objects with 'importance', 'description', and 'recommendation'
+- overall_score: Number from 1 to 10
+- summary: String with overall assessment"""
+
+COST_ESTIMATE_SYSTEM_PROMPT = """You are a cloud cost optimization expert.
+Estimate the monthly costs of the infrastructure code you are given.
+
+Provide a detailed cost breakdown including:
+1. Compute costs (EC2, VMs, etc.)
+2. Storage costs (S3, disks, etc.)
+3. Database costs
+4. Networking costs
+5. Other service costs
+
+Format your response as a JSON object with the following structure:
+{
+    "estimated_monthly_cost": 0,
+    "estimated_yearly_cost": 0,
+    "breakdown": {
+        "compute": {
+            "details": [
+                {"service": "", "instance_type": "", "count": 0, "monthly_cost": 0}
+            ],
+            "subtotal": 0
+        },
+        "storage": {
+            "details": [
+                {"service": "", "size_gb": 0, "monthly_cost": 0}
+            ],
+            "subtotal": 0
+        },
+        "database": {
+            "details": [
+                {"service": "", "instance_type": "", "monthly_cost": 0}
+            ],
+            "subtotal": 0
+        },
+        "networking": {
+            "details": [
+                {"service": "", "description": "", "monthly_cost": 0}
+            ],
+            "subtotal": 0
+        },
+        "other": {
+            "details": [
+                {"service": "", "description": "", "monthly_cost": 0}
+            ],
+            "subtotal": 0
+        }
+    },
+    "savings_opportunities": [
+        {"description": "", "potential_monthly_savings": 0, "implementation_difficulty": ""}
+    ]
+}"""
+
 class InfrastructureAgent(BaseAgent):
     """
     Specialized agent for infrastructure provisioning and code generation.
@@ -25,7 +180,8 @@ class InfrastructureAgent(BaseAgent):
         self,
         llm_service: Any,
         vector_db_service: Optional[Any] = None,
-        config: Optional[Dict[str, Any]] = None
+        config: Optional[Dict[str, Any]] = None,
+        llm_cache: Optional[LLMCache] = None
     ):
         """
         Initialize a new InfrastructureAgent.
@@ -34,6 +190,7 @@ class InfrastructureAgent(BaseAgent):
             llm_service: Service for language model interactions
             vector_db_service: Optional service for vector database operations
             config: Optional configuration parameters
+            llm_cache: Optional cache for LLM completions
         """
         # Define the agent's capabilities
         capabilities = [
@@ -55,39 +212,35 @@ class InfrastructureAgent(BaseAgent):
             config=config
         )
         
-        # Initialize tool-specific templates directory
-        self.templates_dir = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-            "templates"
+        # Cache for LLM completions so re-analyzing unchanged code (e.g. CI reruns) skips the model
+        self.llm_cache = llm_cache or LLMCache(
+            maxsize=self.config.get("llm_cache_size", 1024),
+            ttl=self.config.get("llm_cache_ttl", 3600)
         )
         
-        # Map of cloud providers and their specific configurations
-        self.cloud_providers = {
-            "aws": {
-                "service_mapping": {
-                    "compute": "aws_instance",
-                    "storage": "aws_s3_bucket",
-                    "database": "aws_db_instance",
-                    "network": "aws_vpc"
-                }
-            },
-            "azure": {
-                "service_mapping": {
-                    "compute": "azurerm_virtual_machine",
-                    "storage": "azurerm_storage_account",
-                    "database": "azurerm_mysql_server",
-                    "network": "azurerm_virtual_network"
-                }
-            },
-            "gcp": {
-                "service_mapping": {
-                    "compute": "google_compute_instance",
-                    "storage": "google_storage_bucket",
-                    "database": "google_sql_database_instance",
-                    "network": "google_compute_network"
-                }
-            }
-        }
+        # Exact cache plus, when config semantic_cache is on (off by default),
+        # reuse of analyses of near-identical prompts
+        self.completion_cache = CompletionCache(
+            self.llm_cache,
+            self.vector_db_service,
+            collection_name=INFRA_CACHE_COLLECTION,
+            semantic_kinds=_SEMANTIC_CACHE_KINDS if self.config.get("semantic_cache", False) else frozenset(),
+            threshold=self.config.get("semantic_cache_threshold", 0.97)
+        )
+        
+        # Optionally reuse generated code for requests that differ only in
+        # literal requirement values (names, regions); see gen_cache.py
+        self.structural_cache: Optional[StructuralGenerationCache] = None
+        if self.config.get("structural_cache", False):
+            self.structural_cache = StructuralGenerationCache(
+                maxsize=self.config.get("structural_cache_size", 256)
+            )
+        
+        # Tool-specific templates directory, resolved once when template_utils is imported
+        self.templates_dir = template_dir
+        
+        # Map of cloud providers and their specific configurations (shared, read-only)
+        self.cloud_providers = _CLOUD_PROVIDERS
         
         logger.info("Infrastructure Agent initialized")
     
@@ -100,54 +253,70 @@ class InfrastructureAgent(BaseAgent):
                 - task: The description of what to generate
                 - requirements: Specific infrastructure requirements
                 - cloud_provider: Target cloud provider (aws, azure, gcp)
-                - iac_type: Type of IaC to generate (terraform, ansible, jenkins)
+                - iac_type: Type of IaC to generate (terraform, ansible, jenkins),
+                  or a list of types to generate concurrently
                 
         Returns:
-            Dictionary containing the generated code and metadata
+            Dictionary containing the generated code and metadata. For a list
+            of IaC types, "outputs" maps each type to its code and metadata.
         """
         self.update_state("processing")
         
         task = input_data.get("task", "")
         requirements = input_data.get("requirements", {})
         cloud_provider = input_data.get("cloud_provider", "aws").lower()
-        iac_type = input_data.get("iac_type", "terraform").lower()
+        iac_type = input_data.get("iac_type", "terraform")
+        iac_types = [t.lower() for t in iac_type] if isinstance(iac_type, list) else [iac_type.lower()]
+        iac_type = iac_types if isinstance(iac_type, list) else iac_types[0]
         task_id = input_data.get("task_id", "")
         
         try:
-            # First, think about the task
-            thoughts = await self.think(input_data)
+            generators = {
+                "terraform": lambda: self._generate_terraform(task, requirements, cloud_provider),
+                "ansible": lambda: self._generate_ansible(task, requirements, cloud_provider),
+                "jenkins": lambda: self._generate_jenkins(task, requirements)
+            }
+            unsupported = [t for t in iac_types if t not in generators]
+            if unsupported or not iac_types:
+                raise ValueError(
+                    f"Unsupported IaC type: {', '.join(unsupported)}. Supported types: terraform, ansible, jenkins"
+                )
             
-            # Generate the appropriate infrastructure code
-            if iac_type == "terraform":
-                code, metadata = await self._generate_terraform(task, requirements, cloud_provider)
-            elif iac_type == "ansible":
-                code, metadata = await self._generate_ansible(task, requirements, cloud_provider)
-            elif iac_type == "jenkins":
-                code, metadata = await self._generate_jenkins(task, requirements)
-            else:
-                raise ValueError(f"Unsupported IaC type: {iac_type}. Supported types: terraform, ansible, jenkins")
+            # Think about the task while the code is generated; the generations
+            # are independent LLM calls, so they run concurrently too
+            thoughts, *results = await asyncio.gather(
+                self.think(input_data),
+                *(generators[t]() for t in iac_types)
+            )
             
-            # Store in memory
-            await self.update_memory({
-                "type": "infrastructure_generation",
-                "input": input_data,
-                "output": {
-                    "code": code,
-                    "metadata": metadata
-                },
-                "timestamp": self.last_active_time
-            })
+            # Store in memory, one entry per generated IaC type
+            for generated_type, (code, metadata) in zip(iac_types, results):
+                await self.update_memory({
+                    "type": "infrastructure_generation",
+                    "input": {**input_data, "iac_type": generated_type},
+                    "output": {
+                        "code": code,
+                        "metadata": metadata
+                    },
+                    "timestamp": self.last_active_time
+                })
             
             self.update_state("idle")
-            return {
+            response = {
                 "task_id": task_id,
-                "code": code,
-                "metadata": metadata,
                 "thoughts": thoughts.get("thoughts", ""),
                 "iac_type": iac_type,
                 "cloud_provider": cloud_provider,
                 "status": "success"
             }
+            if isinstance(iac_type, list):
+                response["outputs"] = {
+                    generated_type: {"code": code, "metadata": metadata}
+                    for generated_type, (code, metadata) in zip(iac_types, results)
+                }
+            else:
+                response["code"], response["metadata"] = results[0]
+            return response
             
         except Exception as e:
             logger.error(f"Error during infrastructure generation: {str(e)}")
@@ -168,13 +337,14 @@ class InfrastructureAgent(BaseAgent):
     ) -> Tuple[str, Dict[str, Any]]:
         """Generate Terraform code based on requirements."""
         logger.info(f"Generating Terraform code for {cloud_provider}")
+        cached_code = self._lookup_generation("terraform", task, requirements, cloud_provider)
         
         # Search for similar patterns if we have a vector DB service
         similar_patterns = []
-        if self.vector_db_service:
+        if self.vector_db_service and cached_code is None:
             try:
                 # Combine task and requirements for a more comprehensive search
-                search_query = f"{task} {json.dumps(requirements)}"
+                search_query = f"{task} {json_utils.dumps(requirements)}"
                 
                 # Search for similar patterns
                 similar_patterns = await self.vector_db_service.search_patterns(
@@ -190,7 +360,7 @@ class InfrastructureAgent(BaseAgent):
         
         # Also search for similar previous generations from memory
         similar_generations = []
-        if self.vector_db_service:
+        if self.vector_db_service and cached_code is None:
             try:
                 similar_memories = await self.retrieve_similar_memories(
                     query=task,
@@ -228,31 +398,14 @@ class InfrastructureAgent(BaseAgent):
                 examples_text += f"Example {i+1}: {gen['task']}\n"
                 examples_text += f"Code:\n```terraform\n{gen['code'][:1000]}...\n```\n\n"
         
-        # Prepare the prompt for the LLM
-        prompt = f"""
-        As an expert in Infrastructure as Code, generate a complete Terraform configuration for the following task:
-        
-        {task}
-        
-        Requirements:
-        {json.dumps(requirements, indent=2)}
-        
-        Target Cloud Provider: {cloud_provider}
-        
-        {examples_text}
-        
-        Generate a complete, production-ready Terraform configuration including:
-        1. Provider configuration
-        2. Variables and outputs
-        3. Resource definitions with appropriate naming conventions
-        4. Security best practices
-        5. Any necessary modules or data sources
-        
-        Return ONLY the Terraform code without explanations or markdown formatting.
-        """
+        # Prepare the prompt for the LLM; the instructions are in TERRAFORM_SYSTEM_PROMPT
+        prompt = self._task_prompt(task, requirements, examples_text, f"Target Cloud Provider: {cloud_provider}")
         
         # Generate the code using LLM
-        terraform_code = await self.llm_service.generate_completion(prompt)
+        if cached_code is None:
+            terraform_code = await self._generate_code("terraform", task, requirements, cloud_provider, prompt, TERRAFORM_SYSTEM_PROMPT)
+        else:
+            terraform_code = cached_code
         
         # Parse and analyze the generated code for metadata
         resources_count = terraform_code.count("resource ")
@@ -273,7 +426,7 @@ class InfrastructureAgent(BaseAgent):
         }
         
         # Automatically store as pattern if it seems meaningful
-        if len(terraform_code) > 200 and resources_count > 1 and self.vector_db_service:
+        if len(terraform_code) > 200 and resources_count > 1 and self.vector_db_service and cached_code is None:
             try:
                 await self.save_pattern(
                     name=f"Auto-generated: {task[:50]}{'...' if len(task) > 50 else ''}",
@@ -302,12 +455,13 @@ class InfrastructureAgent(BaseAgent):
     ) -> Tuple[str, Dict[str, Any]]:
         """Generate Ansible playbook based on requirements."""
         logger.info(f"Generating Ansible playbook for {cloud_provider}")
+        cached_code = self._lookup_generation("ansible", task, requirements, cloud_provider)
         
         # Search for similar patterns if we have a vector DB service
         similar_patterns = []
-        if self.vector_db_service:
+        if self.vector_db_service and cached_code is None:
             try:
-                search_query = f"{task} {json.dumps(requirements)}"
+                search_query = f"{task} {json_utils.dumps(requirements)}"
                 similar_patterns = await self.vector_db_service.search_patterns(
                     query=search_query,
                     cloud_provider=cloud_provider,
@@ -327,32 +481,14 @@ class InfrastructureAgent(BaseAgent):
                 examples_text += f"Description: {pattern['description']}\n"
                 examples_text += f"Code:\n```yaml\n{pattern['code'][:1000]}...\n```\n\n"
         
-        # Prepare the prompt for the LLM
-        prompt = f"""
-        As an expert in configuration management, generate a complete Ansible playbook for the following task:
-        
-        {task}
-        
-        Requirements:
-        {json.dumps(requirements, indent=2)}
-        
-        Target Environment: {cloud_provider}
-        
-        {examples_text}
-        
-        Generate a complete, production-ready Ansible playbook including:
-        1. Host definitions
-        2. Variables
-        3. Tasks with appropriate naming and organization
-        4. Handlers if needed
-        5. Security best practices
-        6. Error handling
-        
-        Return ONLY the Ansible YAML code without explanations or markdown formatting.
-        """
+        # Prepare the prompt for the LLM; the instructions are in ANSIBLE_SYSTEM_PROMPT
+        prompt = self._task_prompt(task, requirements, examples_text, f"Target Environment: {cloud_provider}")
         
         # Generate the code using LLM
-        ansible_code = await self.llm_service.generate_completion(prompt)
+        if cached_code is None:
+            ansible_code = await self._generate_code("ansible", task, requirements, cloud_provider, prompt, ANSIBLE_SYSTEM_PROMPT)
+        else:
+            ansible_code = cached_code
         
         # Parse and analyze the generated code for metadata
         task_count = ansible_code.count("- name:")
@@ -369,7 +505,7 @@ class InfrastructureAgent(BaseAgent):
         }
         
         # Automatically store as pattern if it seems meaningful
-        if len(ansible_code) > 200 and task_count > 3 and self.vector_db_service:
+        if len(ansible_code) > 200 and task_count > 3 and self.vector_db_service and cached_code is None:
             try:
                 await self.save_pattern(
                     name=f"Auto-generated: {task[:50]}{'...' if len(task) > 50 else ''}",
@@ -397,12 +533,13 @@ class InfrastructureAgent(BaseAgent):
     ) -> Tuple[str, Dict[str, Any]]:
         """Generate Jenkins pipeline configuration based on requirements."""
         logger.info("Generating Jenkins pipeline")
+        cached_code = self._lookup_generation("jenkins", task, requirements, "any")
         
         # Search for similar patterns if we have a vector DB service
         similar_patterns = []
-        if self.vector_db_service:
+        if self.vector_db_service and cached_code is None:
             try:
-                search_query = f"{task} {json.dumps(requirements)}"
+                search_query = f"{task} {json_utils.dumps(requirements)}"
                 similar_patterns = await self.vector_db_service.search_patterns(
                     query=search_query,
                     iac_type="jenkins",
@@ -421,30 +558,14 @@ class InfrastructureAgent(BaseAgent):
                 examples_text += f"Description: {pattern['description']}\n"
                 examples_text += f"Code:\n```groovy\n{pattern['code'][:1000]}...\n```\n\n"
         
-        # Prepare the prompt for the LLM
-        prompt = f"""
-        As an expert in CI/CD pipelines, generate a complete Jenkins pipeline configuration for the following task:
-        
-        {task}
-        
-        Requirements:
-        {json.dumps(requirements, indent=2)}
-        
-        {examples_text}
-        
-        Generate a complete, production-ready Jenkinsfile including:
-        1. Pipeline stages
-        2. Environment variables
-        3. Appropriate agents/nodes
-        4. Error handling and notifications
-        5. Security best practices
-        6. Parallel execution where appropriate
-        
-        Return ONLY the Jenkins pipeline code (Jenkinsfile) without explanations or markdown formatting.
-        """
+        # Prepare the prompt for the LLM; the instructions are in JENKINS_SYSTEM_PROMPT
+        prompt = self._task_prompt(task, requirements, examples_text)
         
         # Generate the code using LLM
-        jenkins_code = await self.llm_service.generate_completion(prompt)
+        if cached_code is None:
+            jenkins_code = await self._generate_code("jenkins", task, requirements, "any", prompt, JENKINS_SYSTEM_PROMPT)
+        else:
+            jenkins_code = cached_code
         
         # Parse and analyze the generated code for metadata
         stage_count = jenkins_code.count("stage(")
@@ -460,7 +581,7 @@ class InfrastructureAgent(BaseAgent):
         }
         
         # Automatically store as pattern if it seems meaningful
-        if len(jenkins_code) > 200 and stage_count > 2 and self.vector_db_service:
+        if len(jenkins_code) > 200 and stage_count > 2 and self.vector_db_service and cached_code is None:
             try:
                 await self.save_pattern(
                     name=f"Auto-generated: {task[:50]}{'...' if len(task) > 50 else ''}",
@@ -481,6 +602,51 @@ class InfrastructureAgent(BaseAgent):
         
         return jenkins_code, metadata
     
+    def _lookup_generation(
+        self,
+        iac_type: str,
+        task: str,
+        requirements: Dict[str, Any],
+        cloud_provider: str
+    ) -> Optional[str]:
+        """Return previously generated code for a structurally identical request, if enabled."""
+        if self.structural_cache is None:
+            return None
+        code = self.structural_cache.lookup(iac_type, task, requirements, cloud_provider)
+        if code is not None:
+            logger.info(f"Structural cache hit for {iac_type} generation")
+        return code
+    
+    async def _generate_code(
+        self,
+        iac_type: str,
+        task: str,
+        requirements: Dict[str, Any],
+        cloud_provider: str,
+        prompt: str,
+        system_prompt: str
+    ) -> str:
+        """Generate code with the LLM and, if enabled, keep it in the structural cache."""
+        code = await self.llm_service.generate_completion(prompt, system_prompt)
+        if self.structural_cache is not None and not is_error_response(code):
+            self.structural_cache.store(iac_type, task, requirements, cloud_provider, code)
+        return code
+    
+    @staticmethod
+    def _task_prompt(task: str, requirements: Dict[str, Any], examples_text: str, target: str = "") -> str:
+        """Build the user prompt shared by the code generators: task, requirements, target and examples."""
+        return f"""
+        Task:
+        {task}
+        
+        Requirements:
+        {json_utils.dumps(requirements, indent=True)}
+        
+        {target}
+        
+        {examples_text}
+        """
+    
     async def analyze_infrastructure(self, infrastructure_code: str, iac_type: str) -> Dict[str, Any]:
         """
         Analyze existing infrastructure code and provide insights.
@@ -495,38 +661,16 @@ class InfrastructureAgent(BaseAgent):
         logger.info(f"Analyzing {iac_type} infrastructure code")
         self.update_state("analyzing")
         
-        # Prepare the prompt for the LLM
-        prompt = f"""
-        As an expert in {iac_type}, analyze the following infrastructure code and provide insights:
-        
-        ```
-        {infrastructure_code}
-        ```
-        
-        Provide a comprehensive analysis including:
-        1. Potential security issues
-        2. Cost optimization opportunities
-        3. Performance considerations
-        4. Best practice violations
-        5. Maintainability concerns
-        
-        Format your response as structured JSON with the following keys:
-        - security_issues: Array of objects with 'severity', 'description', and 'recommendation'
-        - cost_optimizations: Array of objects with 'potential_savings', 'description', and 'recommendation'
-        - performance_considerations: Array of objects with 'impact', 'description', and 'recommendation'
-        - best_practice_violations: Array of objects with 'importance', 'description', and 'recommendation'
-        - maintainability_concerns: Array of objects with 'importance', 'description', and 'recommendation'
-        - overall_score: Number from 1 to 10
-        - summary: String with overall assessment
-        """
-        
         # Generate the analysis using LLM
-        analysis_json = await self.llm_service.generate_completion(prompt)
+        analysis_json = await self._cached_completion(
+            self._analysis_prompt(infrastructure_code, iac_type), ANALYSIS_SYSTEM_PROMPT,
+            kind="analysis", iac_type=iac_type
+        )
         
         # Parse the JSON response
         try:
-            analysis = json.loads(analysis_json)
-        except json.JSONDecodeError:
+            analysis = json_utils.loads(analysis_json)
+        except json_utils.JSONDecodeError:
             logger.error("Failed to parse analysis JSON")
             analysis = {
                 "error": "Failed to parse analysis",
@@ -537,6 +681,39 @@ class InfrastructureAgent(BaseAgent):
         self.update_state("idle")
         return analysis
     
+    async def stream_analyze_infrastructure(
+        self,
+        infrastructure_code: str,
+        iac_type: str
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Analyze infrastructure code, yielding results as they stream in.
+        
+        Args:
+            infrastructure_code: The IaC code to analyze
+            iac_type: The type of IaC (terraform, ansible, jenkins)
+            
+        Yields:
+            (field, value) pairs of the analysis as soon as each field is complete
+        """
+        logger.info(f"Streaming analysis of {iac_type} infrastructure code")
+        async for item in self._stream_completion_items(
+            self._analysis_prompt(infrastructure_code, iac_type), ANALYSIS_SYSTEM_PROMPT,
+            kind="analysis", iac_type=iac_type
+        ):
+            yield item
+    
+    def _analysis_prompt(self, infrastructure_code: str, iac_type: str) -> str:
+        """Build the analysis prompt; the instructions are in ANALYSIS_SYSTEM_PROMPT."""
+        infrastructure_code = self._slim_code(infrastructure_code, iac_type)
+        return f"""
+        Infrastructure as code type: {iac_type}
+        
+        ```
+        {infrastructure_code}
+        ```
+        """
+    
     async def estimate_costs(
         self, 
         infrastructure_code: str,
@@ -557,70 +734,16 @@ class InfrastructureAgent(BaseAgent):
         logger.info(f"Estimating costs for {cloud_provider} using {iac_type}")
         self.update_state("estimating")
         
-        # Prepare the prompt for the LLM
-        prompt = f"""
-        As a {cloud_provider} cost optimization expert, estimate the monthly costs for the following {iac_type} code:
-        
-        ```
-        {infrastructure_code}
-        ```
-        
-        Provide a detailed cost breakdown including:
-        1. Compute costs (EC2, VMs, etc.)
-        2. Storage costs (S3, disks, etc.)
-        3. Database costs
-        4. Networking costs
-        5. Other service costs
-        
-        Format your response as a JSON object with the following structure:
-        {{
-            "estimated_monthly_cost": 0,
-            "estimated_yearly_cost": 0,
-            "breakdown": {{
-                "compute": {{
-                    "details": [
-                        {{"service": "", "instance_type": "", "count": 0, "monthly_cost": 0}}
-                    ],
-                    "subtotal": 0
-                }},
-                "storage": {{
-                    "details": [
-                        {{"service": "", "size_gb": 0, "monthly_cost": 0}}
-                    ],
-                    "subtotal": 0
-                }},
-                "database": {{
-                    "details": [
-                        {{"service": "", "instance_type": "", "monthly_cost": 0}}
-                    ],
-                    "subtotal": 0
-                }},
-                "networking": {{
-                    "details": [
-                        {{"service": "", "description": "", "monthly_cost": 0}}
-                    ],
-                    "subtotal": 0
-                }},
-                "other": {{
-                    "details": [
-                        {{"service": "", "description": "", "monthly_cost": 0}}
-                    ],
-                    "subtotal": 0
-                }}
-            }},
-            "savings_opportunities": [
-                {{"description": "", "potential_monthly_savings": 0, "implementation_difficulty": ""}}
-            ]
-        }}
-        """
-        
         # Generate the cost estimation using LLM
-        cost_json = await self.llm_service.generate_completion(prompt)
+        cost_json = await self._cached_completion(
+            self._cost_estimate_prompt(infrastructure_code, iac_type, cloud_provider), COST_ESTIMATE_SYSTEM_PROMPT,
+            kind="cost_estimate", iac_type=iac_type, cloud_provider=cloud_provider
+        )
         
         # Parse the JSON response
         try:
-            cost_estimate = json.loads(cost_json)
-        except json.JSONDecodeError:
+            cost_estimate = json_utils.loads(cost_json)
+        except json_utils.JSONDecodeError:
             logger.error("Failed to parse cost estimation JSON")
             cost_estimate = {
                 "error": "Failed to parse cost estimation",
@@ -630,6 +753,90 @@ class InfrastructureAgent(BaseAgent):
         
         self.update_state("idle")
         return cost_estimate
+    
+    async def stream_estimate_costs(
+        self,
+        infrastructure_code: str,
+        iac_type: str,
+        cloud_provider: str
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Estimate infrastructure costs, yielding results as they stream in.
+        
+        "estimated_monthly_cost" is available before the long "breakdown"
+        object has finished generating.
+        
+        Args:
+            infrastructure_code: The IaC code to analyze
+            iac_type: The type of IaC (terraform, ansible, jenkins)
+            cloud_provider: The target cloud provider
+            
+        Yields:
+            (field, value) pairs of the estimate as soon as each field is complete
+        """
+        logger.info(f"Streaming cost estimate for {cloud_provider} using {iac_type}")
+        async for item in self._stream_completion_items(
+            self._cost_estimate_prompt(infrastructure_code, iac_type, cloud_provider), COST_ESTIMATE_SYSTEM_PROMPT,
+            kind="cost_estimate", iac_type=iac_type, cloud_provider=cloud_provider
+        ):
+            yield item
+    
+    def _cost_estimate_prompt(self, infrastructure_code: str, iac_type: str, cloud_provider: str) -> str:
+        """Build the cost estimation prompt; the instructions are in COST_ESTIMATE_SYSTEM_PROMPT."""
+        infrastructure_code = self._slim_code(infrastructure_code, iac_type)
+        return f"""
+        Cloud provider: {cloud_provider}
+        Infrastructure as code type: {iac_type}
+        
+        ```
+        {infrastructure_code}
+        ```
+        """
+    
+    def _slim_code(self, infrastructure_code: str, iac_type: str) -> str:
+        """Fit code into the analyze_max_chars budget (about 4 characters per token)."""
+        max_chars = self.config.get("analyze_max_chars", 32000)
+        slimmed = slim_iac_code(infrastructure_code, iac_type, max_chars)
+        if len(slimmed) < len(infrastructure_code):
+            logger.info(f"Slimmed {iac_type} code from {len(infrastructure_code)} to {len(slimmed)} characters")
+        return slimmed
+    
+    async def _cached_completion(self, prompt: str, system_prompt: str, kind: str, **scope: str) -> str:
+        """
+        Generate a completion, reusing an identical or near-identical past prompt.
+        
+        Args:
+            prompt: The prompt to send to the model
+            system_prompt: The system prompt sent with the prompt
+            kind: Type of request (analysis, cost_estimate)
+            **scope: Values a reused completion must match, e.g. iac_type and cloud_provider
+            
+        Returns:
+            The model's completion text
+        """
+        return await self.completion_cache.complete(self.llm_service, prompt, system_prompt, kind, **scope)
+    
+    async def _stream_completion_items(
+        self,
+        prompt: str,
+        system_prompt: str,
+        kind: str,
+        **scope: str
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a JSON object completion through the completion cache; see CompletionCache.stream_items.
+        
+        Args:
+            prompt: The prompt to send to the model
+            system_prompt: The system prompt sent with the prompt
+            kind: Type of request (analysis, cost_estimate)
+            **scope: Values a reused completion must match, e.g. iac_type and cloud_provider
+            
+        Yields:
+            (field, value) pairs in the order the model produced them
+        """
+        async for item in self.completion_cache.stream_items(self.llm_service, prompt, system_prompt, kind, **scope):
+            yield item
         
     # Pattern Repository Methods
     
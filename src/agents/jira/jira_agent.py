@@ -5,6 +5,7 @@ This module defines the JiraAgent class that specializes in interacting with
 Jira for project management, issue tracking, and workflow automation.
 """
 
+import hashlib
 import logging
 from typing import Dict, List, Any, Optional, Tuple
 
@@ -172,7 +173,9 @@ class JiraAgent(BaseAgent):
             issue_data.update(additional_fields)
             
         # Simulate API call
-        issue_key = f"{project_key}-{100 + hash(summary) % 900}"
+        # Deterministic across restarts, unlike the per-process randomized hash()
+        summary_hash = int.from_bytes(hashlib.blake2b(summary.encode("utf-8"), digest_size=8).digest(), "big")
+        issue_key = f"{project_key}-{100 + summary_hash % 900}"
         
         return {
             "issue_key": issue_key,
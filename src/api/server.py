@@ -330,6 +330,9 @@ async def startup_event():
     llm_model = os.environ.get("LLM_MODEL", "llama3")
     llm_api_base = os.environ.get("LLM_API_BASE", "http://localhost:11434/api")
     llm_api_key = os.environ.get("LLM_API_KEY")
+    # Seconds to collect concurrent LLM requests into one batch (0 disables batching);
+    # batched agents use single-turn completions instead of sessions and streams
+    llm_batch_window = float(os.environ.get("LLM_BATCH_WINDOW", "0"))
 
 
     
@@ -363,7 +366,7 @@ async def startup_event():
     architecture_agent = ArchitectureAgent(
         llm_service=llm_service,
         vector_db_service=vector_db_service,
-        config={"templates_dir": "templates"}
+        config={"templates_dir": "templates", "llm_batch_window": llm_batch_window}
     )
     
     security_agent = SecurityAgent(
@@ -375,7 +378,7 @@ async def startup_event():
     cost_agent = CostAgent(
         llm_service=llm_service,
         vector_db_service=vector_db_service,
-        config={"templates_dir": "templates"}
+        config={"templates_dir": "templates", "llm_batch_window": llm_batch_window}
     )
     
     terraform_module_agent = TerraformModuleAgent(
@@ -488,6 +491,14 @@ async def startup_event():
     # Load tasks from file
     load_tasks()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release shared resources on shutdown."""
+    for agent in agents.values():
+        await agent.aclose()
+    if llm_service is not None:
+        await llm_service.aclose()
+
 # ----- API Routes -----
 
 @app.get("/", response_model=Dict[str, str])
@@ -1353,6 +1364,25 @@ async def process_github_request(request: GitHubRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/github/review/stream")
+async def stream_github_code_review(request: GitHubRequest):
+    """Stream a code review as server-sent events while the model generates it."""
+    parameters = request.parameters
+    
+    async def events():
+        try:
+            async for chunk in github_agent.review_code_stream(
+                code=parameters.get("code", ""),
+                language=parameters.get("language", ""),
+                review_focus=parameters.get("review_focus", [])
+            ):
+                yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 @app.post("/api/nexus", response_model=Dict[str, Any])
 async def process_nexus_request(request: NexusRequest):
     """Process a Nexus-related request."""
@@ -57,6 +57,12 @@ app.state.llm_service = llm_service
 app.state.vector_db = vector_db
 app.state.architecture_agent = architecture_agent
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush agent memories and close the LLM service's shared HTTP session."""
+    await app.state.architecture_agent.aclose()
+    await app.state.llm_service.aclose()
+
 class InfrastructureRequest(BaseModel):
     """Request model for infrastructure generation."""
     task: str
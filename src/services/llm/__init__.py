@@ -1 +1,3 @@
-from .llm_service import LLMService
+from .llm_service import LLMService, LLMSession
+from .cache import LLMCache, CompletionCache, is_error_response
+from .batching import BatchingLLM
@@ -0,0 +1,131 @@
+"""
+LLM Request Batching Module for Multi-Agent Infrastructure Automation System
+
+This module defines the BatchingLLM class that coalesces completion requests
+arriving within a short window, so concurrent agents share one dispatch and
+identical in-flight prompts are sent to the model only once.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (prompt, system_prompt, temperature, max_tokens)
+_RequestKey = Tuple[str, Optional[str], float, int]
+
+# LLMService methods that bypass the batch window. Sessions carry per-conversation
+# context and streams deliver chunks as they arrive, so neither can be coalesced.
+_UNBATCHED_METHODS = frozenset({"new_session", "generate_stream"})
+
+class BatchingLLM:
+    """
+    Drop-in wrapper around LLMService that coalesces completion requests.
+
+    Requests made within `window` seconds of each other are collected and
+    dispatched together over the service's shared HTTP session; identical
+    requests in the same window are served by a single model call.
+
+    Sessions and streaming can't be batched, so new_session and
+    generate_stream are hidden rather than delegated: agents that check for
+    them fall back to batched single-turn completions. Any other attribute
+    is delegated to the wrapped service.
+    """
+
+    def __init__(self, llm_service: Any, window: float = 0.02, max_batch_size: int = 32):
+        """
+        Initialize a new BatchingLLM.
+
+        Args:
+            llm_service: The LLMService to send requests through
+            window: Seconds to wait for more requests before dispatching
+            max_batch_size: Number of distinct requests that triggers an immediate dispatch
+        """
+        self.llm_service = llm_service
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[_RequestKey, List[asyncio.Future]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._dispatch_tasks: Set[asyncio.Task] = set()
+
+    def __getattr__(self, name: str) -> Any:
+        if name in _UNBATCHED_METHODS:
+            raise AttributeError(f"{type(self).__name__} does not batch {name}; use generate instead")
+        return getattr(self.llm_service, name)
+
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2048
+    ) -> str:
+        """
+        Queue a completion request and wait for its batch to be dispatched.
+
+        Args:
+            prompt: The prompt to send to the model
+            system_prompt: Optional system prompt (for models that support it)
+            temperature: Sampling temperature (0.0 to 1.0)
+            max_tokens: Maximum number of tokens to generate
+
+        Returns:
+            Generated text completion
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault((prompt, system_prompt, temperature, max_tokens), []).append(future)
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    async def generate_completion(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2048
+    ) -> str:
+        """Alias for generate, matching LLMService."""
+        return await self.generate(prompt, system_prompt, temperature, max_tokens)
+
+    def _flush(self) -> None:
+        """Dispatch all queued requests as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        task = asyncio.ensure_future(self._dispatch(pending))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._dispatch_tasks.add(task)
+        task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch(self, pending: Dict[_RequestKey, List[asyncio.Future]]) -> None:
+        """Send one model call per distinct request and resolve every waiter."""
+        waiters = sum(len(futures) for futures in pending.values())
+        logger.debug("Dispatching %d LLM requests for %d waiters", len(pending), waiters)
+
+        keys = list(pending)
+        results = await asyncio.gather(
+            *(self.llm_service.generate(*key) for key in keys),
+            return_exceptions=True
+        )
+
+        for key, result in zip(keys, results):
+            for future in pending[key]:
+                # The caller may have been cancelled while the batch was in flight
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
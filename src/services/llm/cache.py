@@ -0,0 +1,393 @@
+"""
+LLM Response Cache Module for Multi-Agent Infrastructure Automation System
+
+This module defines the LLMCache class that stores language model completions
+keyed on a SHA-256 hash of the model and prompt, so identical requests can be
+served without another round trip to the model, and the CompletionCache class
+that agents use on top of it to also reuse near-identical prompts and replay
+streamed JSON completions.
+"""
+
+import re
+import time
+import json
+import inspect
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, FrozenSet, Optional, Tuple
+
+from src.utils import json_utils
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the strings (and stream chunks) LLMService returns instead of raising
+ERROR_PREFIX = "Error:"
+
+def is_error_response(response: Any) -> bool:
+    """
+    Tell whether a completion or stream chunk is an LLMService failure report.
+    
+    LLMService reports failures as "Error: ..." strings, and streams report
+    them as an "Error: ..." chunk, possibly after model output. Such
+    responses, and anything that isn't a string, must never be cached.
+    
+    Args:
+        response: A completion or stream chunk
+        
+    Returns:
+        True if the response is not usable model output
+    """
+    return not isinstance(response, str) or response.startswith(ERROR_PREFIX)
+
+class LLMCache:
+    """
+    Exact-match cache for LLM completions.
+
+    Entries live in an in-process LRU dictionary with a TTL. When a Redis
+    client (redis.asyncio) is supplied, it is used as a shared backend
+    instead so that several service instances can reuse each other's results.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 3600,
+        redis_client: Optional[Any] = None,
+        namespace: str = "llm_cache"
+    ):
+        """
+        Initialize a new LLMCache.
+
+        Args:
+            maxsize: Maximum number of entries kept in memory (LRU eviction)
+            ttl: Time-to-live of an entry in seconds
+            redis_client: Optional redis.asyncio client used as the backend
+            namespace: Key prefix used for Redis entries
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.redis_client = redis_client
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    @staticmethod
+    def cache_key(model: str, prompt: str) -> str:
+        """
+        Build a deterministic cache key for a model/prompt pair.
+
+        Args:
+            model: Name of the model that serves the prompt
+            prompt: The full prompt string
+
+        Returns:
+            Hex-encoded SHA-256 digest
+        """
+        payload = json.dumps({"model": model, "prompt": prompt}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def sample_key(key: str, namespace: str = "default", index: int = 0) -> str:
+        """
+        Build the key of one of several independent samples for a prompt.
+
+        Callers that want more than one answer to the same prompt store each
+        under its own (namespace, index), so reruns replay the same samples
+        instead of collapsing them into one. The first sample of the default
+        namespace is the plain key, shared with ordinary lookups.
+
+        Args:
+            key: Cache key from cache_key()
+            namespace: Sample namespace, e.g. a task ID
+            index: Position of the sample within the namespace
+
+        Returns:
+            The cache key of the sample
+        """
+        if namespace == "default" and index == 0:
+            return key
+        return f"{key}:{namespace}:{index}"
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached completion.
+
+        Args:
+            key: Cache key from cache_key()
+
+        Returns:
+            The cached completion, or None on a miss
+        """
+        value = None
+        if self.redis_client is not None:
+            try:
+                value = await self.redis_client.get(f"{self.namespace}:{key}")
+                if isinstance(value, bytes):
+                    value = value.decode("utf-8")
+            except Exception as e:
+                logger.warning(f"LLM cache lookup failed: {e}")
+                value = None
+        else:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, cached = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    value = cached
+                else:
+                    del self._entries[key]
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        """
+        Store a completion in the cache.
+
+        Args:
+            key: Cache key from cache_key()
+            value: The completion text to store
+        """
+        if self.redis_client is not None:
+            try:
+                await self.redis_client.set(f"{self.namespace}:{key}", value, ex=int(self.ttl))
+            except Exception as e:
+                logger.warning(f"LLM cache store failed: {e}")
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def clear_namespace(self, namespace: str) -> None:
+        """
+        Remove every sample stored under a namespace by sample_key().
+
+        Args:
+            namespace: Sample namespace to remove
+        """
+        if self.redis_client is not None:
+            pattern = re.sub(r'([*?\[\]\\])', r'\\\1', f":{namespace}:")
+            try:
+                async for redis_key in self.redis_client.scan_iter(match=f"{self.namespace}:*{pattern}*"):
+                    await self.redis_client.delete(redis_key)
+            except Exception as e:
+                logger.warning(f"LLM cache namespace removal failed: {e}")
+            return
+
+        for key in [key for key in self._entries if key.partition(":")[2].rpartition(":")[0] == namespace]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        """Remove all in-memory entries and reset the hit/miss counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CompletionCache:
+    """
+    An agent's cache of completions: exact repeats and, optionally, near-identical prompts.
+
+    Exact repeats are served from an LLMCache. When a vector DB service is
+    given, completions of the allowed kinds are also stored in a vector DB
+    collection and reused for prompts above the similarity threshold that
+    match every value of their scope. Failed completions are never cached.
+    """
+
+    def __init__(
+        self,
+        llm_cache: LLMCache,
+        vector_db_service: Optional[Any] = None,
+        collection_name: str = "llm_completions",
+        semantic_kinds: FrozenSet[str] = frozenset(),
+        threshold: float = 0.95
+    ):
+        """
+        Initialize a new CompletionCache.
+
+        Args:
+            llm_cache: Exact-match cache of completions
+            vector_db_service: Vector DB service for the semantic cache, or None to disable it
+            collection_name: Vector DB collection holding past completions
+            semantic_kinds: Kinds of completion that may be reused for a near-identical prompt
+            threshold: Minimum similarity of a reused prompt
+        """
+        self.llm_cache = llm_cache
+        self.vector_db_service = vector_db_service
+        self.collection_name = collection_name
+        self.semantic_kinds = semantic_kinds
+        self.threshold = threshold
+
+    @staticmethod
+    def completion_key(llm_service: Any, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """Build the LLM cache key for a prompt and its system prompt."""
+        return LLMCache.cache_key(
+            getattr(llm_service, "model", ""),
+            f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+        )
+
+    def _use_semantic_cache(self, kind: str) -> bool:
+        return self.vector_db_service is not None and kind in self.semantic_kinds
+
+    async def lookup(self, key: str, prompt: str, where: Dict[str, Any]) -> Optional[str]:
+        """
+        Find a cached completion for a prompt.
+
+        Args:
+            key: Cache key from completion_key
+            prompt: The prompt to send to the model
+            where: Values a reused completion must match, including its "kind"
+
+        Returns:
+            The cached completion, or None on a miss
+        """
+        kind = where["kind"]
+        cached = await self.llm_cache.get(key)
+        if cached is not None:
+            logger.info(f"LLM cache hit for {self.collection_name} {kind}")
+            return cached
+
+        if self._use_semantic_cache(kind):
+            try:
+                results = await self.vector_db_service.query_similar(
+                    collection_name=self.collection_name,
+                    query_text=prompt,
+                    n_results=1,
+                    where=where
+                )
+                if results and results[0]["similarity"] >= self.threshold:
+                    logger.info(f"Semantic cache hit for {self.collection_name} {kind}")
+                    response = results[0]["metadata"]["response"]
+                    await self.llm_cache.set(key, response)
+                    return response
+            except Exception as e:
+                logger.warning(f"Semantic cache lookup in {self.collection_name} failed: {e}")
+
+        logger.info(f"LLM cache miss for {self.collection_name} {kind}")
+        return None
+
+    async def store(self, key: str, prompt: str, where: Dict[str, Any], response: str) -> None:
+        """
+        Store a completion, unless it is a failure report.
+
+        Args:
+            key: Cache key from completion_key
+            prompt: The prompt the completion answers
+            where: Values a reused completion must match, including its "kind"
+            response: The completion text
+        """
+        if is_error_response(response):
+            return
+        await self.llm_cache.set(key, response)
+        if self._use_semantic_cache(where["kind"]):
+            try:
+                await self.vector_db_service.store_document(
+                    collection_name=self.collection_name,
+                    document_id=key,
+                    text=prompt,
+                    metadata={**where, "response": response}
+                )
+            except Exception as e:
+                logger.warning(f"Failed to store completion in semantic cache {self.collection_name}: {e}")
+
+    async def complete(
+        self,
+        llm_service: Any,
+        prompt: str,
+        system_prompt: Optional[str],
+        kind: str,
+        **scope: Any
+    ) -> str:
+        """
+        Generate a completion, reusing an identical or near-identical past prompt.
+
+        Args:
+            llm_service: The LLM service that generates on a miss
+            prompt: The prompt to send to the model
+            system_prompt: Optional system prompt sent with the prompt
+            kind: Type of request, e.g. analysis
+            **scope: Values a reused completion must match, e.g. iac_type and cloud_provider
+
+        Returns:
+            The model's completion text
+        """
+        where = {"kind": kind, **scope}
+        key = self.completion_key(llm_service, prompt, system_prompt)
+        cached = await self.lookup(key, prompt, where)
+        if cached is not None:
+            return cached
+
+        response = await llm_service.generate_completion(prompt, system_prompt)
+        await self.store(key, prompt, where, response)
+        return response
+
+    async def stream_items(
+        self,
+        llm_service: Any,
+        prompt: str,
+        system_prompt: Optional[str],
+        kind: str,
+        **scope: Any
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a JSON object completion and yield its top-level fields as they complete.
+
+        Cached completions are replayed without calling the model. If the LLM
+        service can't stream, this waits for the whole completion instead.
+        Unparseable output is reported as "error" and "raw_output" fields, and
+        a stream with an error chunk anywhere is not cached.
+
+        Args:
+            llm_service: The LLM service that generates on a miss
+            prompt: The prompt to send to the model
+            system_prompt: Optional system prompt sent with the prompt
+            kind: Type of request, e.g. analysis
+            **scope: Values a reused completion must match, e.g. iac_type and cloud_provider
+
+        Yields:
+            (field, value) pairs in the order the model produced them
+        """
+        where = {"kind": kind, **scope}
+        key = self.completion_key(llm_service, prompt, system_prompt)
+
+        response = await self.lookup(key, prompt, where)
+        if response is None and not inspect.isasyncgenfunction(getattr(llm_service, "generate_stream", None)):
+            response = await llm_service.generate_completion(prompt, system_prompt)
+            await self.store(key, prompt, where, response)
+
+        parser = json_utils.ObjectStreamParser()
+        if response is None:
+            chunks = []
+            failed = False
+            stream = llm_service.generate_stream(prompt, system_prompt)
+            try:
+                async for chunk in stream:
+                    failed = failed or is_error_response(chunk)
+                    chunks.append(chunk)
+                    for item in parser.feed(chunk):
+                        yield item
+            finally:
+                await stream.aclose()
+            response = "".join(chunks)
+            if parser.done and not failed:
+                await self.store(key, prompt, where, response)
+        else:
+            for item in parser.feed(response):
+                yield item
+
+        for item in parser.close():
+            yield item
+        if not parser.done:
+            logger.error(f"Failed to parse streamed {self.collection_name} {kind} result as JSON")
+            yield "error", f"Failed to parse {kind} result"
+            yield "raw_output", response
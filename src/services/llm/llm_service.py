@@ -10,9 +10,12 @@ import json
 import aiohttp
 import logging
 import asyncio
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, AsyncIterator, Optional, Tuple, Union
 from datetime import datetime
 
+from src.services.llm.cache import is_error_response
+from src.utils.http_utils import retry_request
+
 class LLMService:
     """
     Service for interacting with language models, including local Ollama
@@ -45,6 +48,10 @@ class LLMService:
         self.last_request_time = None
         self.total_tokens_used = 0
         
+        # Shared HTTP session so connections are reused across requests
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        
         # Configure logging
         self.logger = logging.getLogger(f"service.llm.{self.provider}")
         self.logger.info(f"Initialized LLM service with provider: {self.provider}, model: {self.model}")
@@ -64,6 +71,72 @@ class LLMService:
         
         self.logger.info(f"Using API base URL: {self.api_base}")
     
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Get the shared HTTP session, creating it on first use.
+        
+        The session keeps a pool of keep-alive connections, so repeated
+        requests to the same provider skip the TCP/TLS handshake, and caches
+        DNS lookups for http_dns_cache_ttl seconds. It is bound
+        to the event loop that created it and is recreated if used from another.
+        
+        Returns:
+            The shared aiohttp ClientSession
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.config.get("http_pool_size", 64),
+                keepalive_timeout=self.config.get("http_keepalive_timeout", 60),
+                ttl_dns_cache=self.config.get("http_dns_cache_ttl", 300)
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._session_loop = loop
+        return self._session
+    
+    def _post(self, url: str, **kwargs: Any):
+        """
+        POST through the shared session, retrying when the provider is rate limited or unavailable.
+        
+        Args:
+            url: Request URL
+            **kwargs: Arguments passed to aiohttp's post(), e.g. json and headers
+            
+        Returns:
+            Async context manager yielding the response
+        """
+        session = self._get_session()
+        return retry_request(
+            lambda: session.post(url, **kwargs),
+            max_retries=self.config.get("http_max_retries", 3),
+            backoff=self.config.get("http_retry_backoff", 0.5)
+        )
+    
+    def _get(self, url: str, **kwargs: Any):
+        """
+        GET through the shared session, retrying when the provider is rate limited or unavailable.
+        
+        Args:
+            url: Request URL
+            **kwargs: Arguments passed to aiohttp's get(), e.g. headers
+            
+        Returns:
+            Async context manager yielding the response
+        """
+        session = self._get_session()
+        return retry_request(
+            lambda: session.get(url, **kwargs),
+            max_retries=self.config.get("http_max_retries", 3),
+            backoff=self.config.get("http_retry_backoff", 0.5)
+        )
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP session and its pooled connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+    
     async def _track_request(self, tokens_used: Optional[int] = None):
         """Track request metrics."""
         self.request_count += 1
@@ -129,6 +202,23 @@ class LLMService:
         max_tokens: int
     ) -> str:
         """Generate text using local Ollama model."""
+        response, _ = await self._generate_ollama_with_context(prompt, system_prompt, temperature, max_tokens)
+        return response
+    
+    async def _generate_ollama_with_context(
+        self, 
+        prompt: str,
+        system_prompt: Optional[str],
+        temperature: float,
+        max_tokens: int,
+        context: Optional[List[int]] = None
+    ) -> Tuple[str, Optional[List[int]]]:
+        """
+        Generate text using local Ollama model, optionally continuing a previous exchange.
+        
+        Returns:
+            Tuple of the generated text and the conversation context returned by Ollama
+        """
         self.logger.info(f"Generating with Ollama model: {self.model}")
         
         request_url = f"{self.api_base}/api/generate"
@@ -147,30 +237,34 @@ class LLMService:
         if system_prompt:
             payload["system"] = system_prompt
         
+        # Continue from a previous exchange without re-sending its prompt
+        if context:
+            payload["context"] = context
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(request_url, json=payload) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        self.logger.error(f"Ollama API error: {error_text}")
-                        return f"Error: Ollama API returned status {response.status}"
+            async with self._post(request_url, json=payload) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    self.logger.error(f"Ollama API error: {error_text}")
+                    return f"Error: Ollama API returned status {response.status}", context
                     
-                    response_data = await response.json()
-                    # Track the request
-                    await self._track_request(response_data.get('total_duration'))
-                    return response_data.get("response", "")
+                response_data = await response.json()
+                # Track the request
+                await self._track_request(response_data.get('total_duration'))
+                return response_data.get("response", ""), response_data.get("context")
         except Exception as e:
             self.logger.error(f"Error calling Ollama API: {str(e)}")
-            return f"Error: Could not connect to Ollama API. Please ensure the Ollama service is running."
+            return f"Error: Could not connect to Ollama API. Please ensure the Ollama service is running.", context
     
     async def _generate_openai(
         self, 
         prompt: str,
         system_prompt: Optional[str],
         temperature: float,
-        max_tokens: int
+        max_tokens: int,
+        history: Optional[List[Dict[str, str]]] = None
     ) -> str:
-        """Generate text using OpenAI API."""
+        """Generate text using OpenAI API, optionally after earlier conversation turns."""
         self.logger.info(f"Generating with OpenAI model: {self.model}")
         
         if not self.api_key:
@@ -182,6 +276,7 @@ class LLMService:
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
+        messages.extend(history or [])
         messages.append({"role": "user", "content": prompt})
         
         payload = {
@@ -197,27 +292,38 @@ class LLMService:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(request_url, json=payload, headers=headers) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        self.logger.error(f"OpenAI API error: {error_text}")
-                        return f"Error: OpenAI API returned status {response.status}"
+            async with self._post(request_url, json=payload, headers=headers) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    self.logger.error(f"OpenAI API error: {error_text}")
+                    return f"Error: OpenAI API returned status {response.status}"
                     
-                    response_data = await response.json()
-                    return response_data["choices"][0]["message"]["content"]
+                response_data = await response.json()
+                return response_data["choices"][0]["message"]["content"]
         except Exception as e:
             self.logger.error(f"Error calling OpenAI API: {str(e)}")
             return f"Error: {str(e)}"
     
+    @staticmethod
+    def _anthropic_system(system_prompt: str) -> List[Dict[str, Any]]:
+        """
+        Build the Anthropic system block, marked as a prompt-cache breakpoint.
+        
+        Agents keep their static instructions in the system prompt, so
+        requests sharing it are served from Anthropic's prompt cache.
+        Prompts below the model's minimum cacheable length are sent uncached.
+        """
+        return [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+    
     async def _generate_anthropic(
         self, 
         prompt: str,
         system_prompt: Optional[str],
         temperature: float,
-        max_tokens: int
+        max_tokens: int,
+        history: Optional[List[Dict[str, str]]] = None
     ) -> str:
-        """Generate text using Anthropic API."""
+        """Generate text using Anthropic API, optionally after earlier conversation turns."""
         self.logger.info(f"Generating with Anthropic model: {self.model}")
         
         if not self.api_key:
@@ -230,11 +336,11 @@ class LLMService:
             "model": self.model,
             "max_tokens": max_tokens,
             "temperature": temperature,
-            "messages": [{"role": "user", "content": prompt}]
+            "messages": [*(history or []), {"role": "user", "content": prompt}]
         }
         
         if system_prompt:
-            payload["system"] = system_prompt
+            payload["system"] = self._anthropic_system(system_prompt)
         
         headers = {
             "Content-Type": "application/json",
@@ -243,19 +349,145 @@ class LLMService:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(request_url, json=payload, headers=headers) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        self.logger.error(f"Anthropic API error: {error_text}")
-                        return f"Error: Anthropic API returned status {response.status}"
+            async with self._post(request_url, json=payload, headers=headers) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    self.logger.error(f"Anthropic API error: {error_text}")
+                    return f"Error: Anthropic API returned status {response.status}"
                     
-                    response_data = await response.json()
-                    return response_data["content"][0]["text"]
+                response_data = await response.json()
+                return response_data["content"][0]["text"]
         except Exception as e:
             self.logger.error(f"Error calling Anthropic API: {str(e)}")
             return f"Error: {str(e)}"
     
+    def new_session(self, system_prompt: Optional[str] = None) -> "LLMSession":
+        """
+        Start a multi-turn session with the model.
+        
+        Args:
+            system_prompt: Optional system prompt used for every turn
+            
+        Returns:
+            A new LLMSession bound to this service
+        """
+        return LLMSession(self, system_prompt)
+    
+    async def generate_stream(
+        self, 
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2048
+    ) -> AsyncIterator[str]:
+        """
+        Stream a text completion from the language model chunk by chunk.
+        
+        Callers may stop iterating early (e.g. once the part of the response
+        they need has arrived); closing the generator closes the connection.
+        
+        Args:
+            prompt: The prompt to send to the model
+            system_prompt: Optional system prompt (for models that support it)
+            temperature: Sampling temperature (0.0 to 1.0)
+            max_tokens: Maximum number of tokens to generate
+            
+        Yields:
+            Successive pieces of the generated text
+        """
+        if self.provider == "ollama":
+            request_url = f"{self.api_base}/api/generate"
+            payload = {
+                "model": self.model,
+                "prompt": prompt,
+                "temperature": temperature,
+                "num_predict": max_tokens,
+                "stream": True
+            }
+            if system_prompt:
+                payload["system"] = system_prompt
+            headers = {}
+        elif self.provider == "openai":
+            if not self.api_key:
+                yield "Error: OpenAI API key not provided"
+                return
+            request_url = f"{self.api_base}/chat/completions"
+            messages = []
+            if system_prompt:
+                messages.append({"role": "system", "content": system_prompt})
+            messages.append({"role": "user", "content": prompt})
+            payload = {
+                "model": self.model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": True
+            }
+            headers = {"Authorization": f"Bearer {self.api_key}"}
+        elif self.provider == "anthropic":
+            if not self.api_key:
+                yield "Error: Anthropic API key not provided"
+                return
+            request_url = f"{self.api_base}/v1/messages"
+            payload = {
+                "model": self.model,
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+                "messages": [{"role": "user", "content": prompt}],
+                "stream": True
+            }
+            if system_prompt:
+                payload["system"] = self._anthropic_system(system_prompt)
+            headers = {"x-api-key": self.api_key, "anthropic-version": "2023-06-01"}
+        else:
+            raise ValueError(f"Unsupported provider for generation: {self.provider}")
+        
+        self.logger.info(f"Streaming with {self.provider} model: {self.model}")
+        
+        try:
+            async with self._post(request_url, json=payload, headers=headers) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    self.logger.error(f"{self.provider} API error: {error_text}")
+                    yield f"Error: {self.provider} API returned status {response.status}"
+                    return
+                    
+                await self._track_request()
+                async for raw_line in response.content:
+                    chunk = self._parse_stream_line(raw_line.decode("utf-8").strip())
+                    if chunk:
+                        yield chunk
+        except Exception as e:
+            self.logger.error(f"Error streaming from {self.provider} API: {str(e)}")
+            yield f"Error: {str(e)}"
+    
+    def _parse_stream_line(self, line: str) -> str:
+        """Extract the text delta from one line of a streaming response."""
+        if not line:
+            return ""
+        
+        # Ollama streams newline-delimited JSON; OpenAI and Anthropic use server-sent events
+        if self.provider != "ollama":
+            if not line.startswith("data:"):
+                return ""
+            line = line[len("data:"):].strip()
+            if line == "[DONE]":
+                return ""
+        
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            return ""
+        
+        if self.provider == "ollama":
+            return data.get("response", "")
+        if self.provider == "openai":
+            choices = data.get("choices") or [{}]
+            return choices[0].get("delta", {}).get("content") or ""
+        if data.get("type") == "content_block_delta":
+            return data.get("delta", {}).get("text", "")
+        return ""
+    
     async def embed(self, text: str) -> List[float]:
         """
         Generate an embedding vector for the given text.
@@ -293,15 +525,14 @@ class LLMService:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(request_url, json=payload, headers=headers) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        self.logger.error(f"OpenAI API error: {error_text}")
-                        raise ValueError(f"OpenAI API returned status {response.status}")
+            async with self._post(request_url, json=payload, headers=headers) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    self.logger.error(f"OpenAI API error: {error_text}")
+                    raise ValueError(f"OpenAI API returned status {response.status}")
                     
-                    response_data = await response.json()
-                    return response_data["data"][0]["embedding"]
+                response_data = await response.json()
+                return response_data["data"][0]["embedding"]
         except Exception as e:
             self.logger.error(f"Error calling OpenAI API for embeddings: {str(e)}")
             raise
@@ -318,15 +549,210 @@ class LLMService:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(request_url, json=payload) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        self.logger.error(f"Ollama API error: {error_text}")
-                        raise ValueError(f"Ollama API returned status {response.status}")
+            async with self._post(request_url, json=payload) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    self.logger.error(f"Ollama API error: {error_text}")
+                    raise ValueError(f"Ollama API returned status {response.status}")
                     
-                    response_data = await response.json()
-                    return response_data.get("embedding", [])
+                response_data = await response.json()
+                return response_data.get("embedding", [])
         except Exception as e:
             self.logger.error(f"Error calling Ollama API for embeddings: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+
+    async def submit_batch(
+        self,
+        prompts: List[str],
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2048
+    ) -> str:
+        """
+        Submit prompts to the OpenAI Batch API.
+        
+        Batches are processed asynchronously within 24 hours at a lower price
+        than interactive requests, which suits bulk jobs that don't need an
+        immediate answer. Collect the results with get_batch_results().
+        
+        Args:
+            prompts: The prompts to complete
+            system_prompt: Optional system prompt used for every prompt
+            temperature: Sampling temperature (0.0 to 1.0)
+            max_tokens: Maximum number of tokens to generate per prompt
+            
+        Returns:
+            The batch ID
+        """
+        if self.provider != "openai":
+            raise ValueError(f"Batch completions not supported for provider: {self.provider}")
+        if not self.api_key:
+            raise ValueError("OpenAI API key not provided")
+        
+        lines = []
+        for index, prompt in enumerate(prompts):
+            messages = []
+            if system_prompt:
+                messages.append({"role": "system", "content": system_prompt})
+            messages.append({"role": "user", "content": prompt})
+            lines.append(json.dumps({
+                "custom_id": f"request-{index}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "messages": messages,
+                    "temperature": temperature,
+                    "max_tokens": max_tokens
+                }
+            }))
+        batch_input = "\n".join(lines).encode("utf-8")
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        
+        def upload_form() -> aiohttp.FormData:
+            # A FormData can only be sent once, so every retry gets a fresh one
+            form = aiohttp.FormData()
+            form.add_field("purpose", "batch")
+            form.add_field("file", batch_input, filename="batch.jsonl", content_type="application/jsonl")
+            return form
+        
+        session = self._get_session()
+        async with retry_request(
+            lambda: session.post(f"{self.api_base}/files", data=upload_form(), headers=headers),
+            max_retries=self.config.get("http_max_retries", 3),
+            backoff=self.config.get("http_retry_backoff", 0.5)
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                self.logger.error(f"OpenAI API error: {error_text}")
+                raise ValueError(f"OpenAI API returned status {response.status}")
+            input_file_id = (await response.json())["id"]
+        
+        payload = {
+            "input_file_id": input_file_id,
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h"
+        }
+        async with self._post(f"{self.api_base}/batches", json=payload, headers=headers) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                self.logger.error(f"OpenAI API error: {error_text}")
+                raise ValueError(f"OpenAI API returned status {response.status}")
+            batch_id = (await response.json())["id"]
+        
+        self.logger.info(f"Submitted batch {batch_id} with {len(prompts)} prompts")
+        return batch_id
+    
+    async def get_batch_results(self, batch_id: str) -> Optional[List[str]]:
+        """
+        Fetch the completions of a batch submitted with submit_batch().
+        
+        Args:
+            batch_id: The batch ID
+            
+        Returns:
+            Completions in prompt order, or None while the batch is still running.
+            Failed prompts are reported as "Error: ..." strings.
+        """
+        if self.provider != "openai":
+            raise ValueError(f"Batch completions not supported for provider: {self.provider}")
+        if not self.api_key:
+            raise ValueError("OpenAI API key not provided")
+        
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        async with self._get(f"{self.api_base}/batches/{batch_id}", headers=headers) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                self.logger.error(f"OpenAI API error: {error_text}")
+                raise ValueError(f"OpenAI API returned status {response.status}")
+            batch = await response.json()
+        
+        status = batch.get("status")
+        if status in ("failed", "expired", "cancelled"):
+            raise ValueError(f"Batch {batch_id} {status}")
+        if status != "completed":
+            return None
+        
+        request_counts = batch.get("request_counts", {})
+        results = ["Error: No response in batch output"] * request_counts.get("total", 0)
+        for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+            if not file_id:
+                continue
+            async with self._get(f"{self.api_base}/files/{file_id}/content", headers=headers) as response:
+                if response.status != 200:
+                    raise ValueError(f"OpenAI API returned status {response.status}")
+                content = await response.text()
+            
+            for line in content.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                index = int(item["custom_id"].rsplit("-", 1)[1])
+                if index >= len(results):
+                    results.extend(["Error: No response in batch output"] * (index + 1 - len(results)))
+                body = (item.get("response") or {}).get("body") or {}
+                if item.get("error") or "choices" not in body:
+                    error = item.get("error") or body.get("error") or {}
+                    results[index] = f"Error: {error.get('message', 'Batch request failed')}"
+                else:
+                    results[index] = body["choices"][0]["message"]["content"]
+        return results
+
+
+class LLMSession:
+    """
+    Multi-turn conversation with a language model.
+    
+    Follow-up prompts can refer to earlier turns (e.g. "the code you just
+    reviewed") instead of repeating large inputs. Ollama continues from the
+    context tokens returned by the previous turn, so the earlier prompt is
+    not re-processed; OpenAI and Anthropic receive the conversation history.
+    """
+    
+    def __init__(self, service: LLMService, system_prompt: Optional[str] = None):
+        """
+        Initialize a new LLMSession.
+        
+        Args:
+            service: The LLMService used to talk to the model
+            system_prompt: Optional system prompt used for every turn
+        """
+        self.service = service
+        self.system_prompt = system_prompt
+        self.history: List[Dict[str, str]] = []
+        self._context: Optional[List[int]] = None
+    
+    async def ask(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048) -> str:
+        """
+        Send the next prompt in the conversation.
+        
+        Args:
+            prompt: The prompt to send to the model
+            temperature: Sampling temperature (0.0 to 1.0)
+            max_tokens: Maximum number of tokens to generate
+            
+        Returns:
+            Generated text completion
+        """
+        provider = self.service.provider
+        if provider == "ollama":
+            response, self._context = await self.service._generate_ollama_with_context(
+                prompt, self.system_prompt, temperature, max_tokens, self._context
+            )
+        elif provider == "openai":
+            response = await self.service._generate_openai(
+                prompt, self.system_prompt, temperature, max_tokens, history=self.history
+            )
+        elif provider == "anthropic":
+            response = await self.service._generate_anthropic(
+                prompt, self.system_prompt, temperature, max_tokens, history=self.history
+            )
+        else:
+            raise ValueError(f"Unsupported provider for generation: {provider}")
+        
+        # Failed turns are left out of the conversation
+        if not is_error_response(response):
+            self.history.append({"role": "user", "content": prompt})
+            self.history.append({"role": "assistant", "content": response})
+        return response
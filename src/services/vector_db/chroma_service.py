@@ -17,6 +17,36 @@ from chromadb.utils import embedding_functions
 
 logger = logging.getLogger(__name__)
 
+# Distance space for new collections; cosine distance is 1 - cos(a, b)
+DISTANCE_SPACE = "cosine"
+
+def _collection_space(collection: Any) -> str:
+    """Distance space of a collection; collections created without one use l2."""
+    metadata = collection.metadata or {}
+    if "hnsw:space" in metadata:
+        return metadata["hnsw:space"]
+    configuration = getattr(collection, "configuration", None) or {}
+    return (configuration.get("hnsw") or {}).get("space") or "l2"
+
+def distance_to_similarity(distance: float, space: str) -> float:
+    """
+    Convert a Chroma distance to a cosine similarity.
+    
+    Chroma's l2 space returns squared distances, which for unit-normalized
+    embeddings (as produced by the default embedding function) equal
+    2 - 2 * cos(a, b). Cosine and inner-product spaces return 1 - cos(a, b).
+    
+    Args:
+        distance: Distance returned by a Chroma query
+        space: Distance space of the collection (l2, cosine, ip)
+        
+    Returns:
+        Cosine similarity between -1.0 and 1.0
+    """
+    if space == "l2":
+        return 1.0 - distance / 2.0
+    return 1.0 - distance
+
 class ChromaService:
     """ChromaDB service for vector storage and retrieval."""
     
@@ -67,7 +97,8 @@ class ChromaService:
             # Create new collection
             collection = self.client.create_collection(
                 name=collection_name,
-                embedding_function=self.embedding_function
+                embedding_function=self.embedding_function,
+                metadata={"hnsw:space": DISTANCE_SPACE}
             )
             self._collections[collection_name] = collection
             return collection
@@ -111,12 +142,65 @@ class ChromaService:
             logger.error(f"Error storing document in ChromaDB: {e}")
             raise e
     
+    async def store_documents_bulk(
+        self, 
+        collection_name: str,
+        ids: List[str],
+        texts: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Store several documents in the vector database with a single call.
+        
+        Args:
+            collection_name: Name of the collection to store in
+            ids: Unique IDs for the documents
+            texts: Text content to embed and store, one per ID
+            metadatas: Additional metadata for each document
+            
+        Returns:
+            Dictionary with the document IDs
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            
+            # Ensure metadata is not empty (ChromaDB requirement)
+            metadatas = [
+                metadata or {"_default": "true"}
+                for metadata in (metadatas or [None] * len(ids))
+            ]
+            
+            collection.add(
+                ids=ids,
+                documents=texts,
+                metadatas=metadatas
+            )
+            
+            logger.info(f"Stored {len(ids)} documents in collection {collection_name}")
+            return {"ids": ids}
+        except Exception as e:
+            logger.error(f"Error storing documents in ChromaDB: {e}")
+            raise e
+    
+    async def embed(self, text: str) -> List[float]:
+        """
+        Embed text with the service's embedding function.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            The embedding vector
+        """
+        return [float(value) for value in self.embedding_function([text])[0]]
+    
     async def query_similar(
         self,
         collection_name: str,
         query_text: str,
         n_results: int = 5,
-        where: Dict[str, Any] = None
+        where: Dict[str, Any] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """
         Query for similar documents.
@@ -126,6 +210,7 @@ class ChromaService:
             query_text: Text to find similar documents for
             n_results: Maximum number of results to return
             where: Optional filter conditions
+            query_embedding: Optional precomputed embedding of query_text (see embed())
             
         Returns:
             List of similar documents with metadata
@@ -148,12 +233,19 @@ class ChromaService:
                     else:
                         where_clause = {"$and": where_conditions}
             
-            # Query collection
-            results = collection.query(
-                query_texts=[query_text],
-                n_results=n_results,
-                where=where_clause
-            )
+            # Query collection, skipping the embedding step if the caller already has the vector
+            if query_embedding is not None:
+                results = collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=n_results,
+                    where=where_clause
+                )
+            else:
+                results = collection.query(
+                    query_texts=[query_text],
+                    n_results=n_results,
+                    where=where_clause
+                )
             
             # Format results
             formatted_results = []
@@ -162,13 +254,14 @@ class ChromaService:
                 metadatas = results['metadatas'][0]
                 ids = results['ids'][0]
                 distances = results.get('distances', [[0] * len(documents)])[0]
+                space = _collection_space(collection)
                 
                 for i in range(len(documents)):
                     formatted_results.append({
                         "id": ids[i],
                         "content": documents[i],
                         "metadata": metadatas[i],
-                        "similarity": 1.0 - (distances[i] if distances[i] <= 1.0 else 0.0)
+                        "similarity": distance_to_similarity(distances[i], space)
                     })
             
             return formatted_results
@@ -33,7 +33,12 @@ def run_tests(include_integration=False):
     test_files = [
         os.path.join(tests_dir, "test_api_endpoints.py"),
         os.path.join(tests_dir, "test_architecture_agent.py"),
+        os.path.join(tests_dir, "test_base_agent.py"),
+        os.path.join(tests_dir, "test_cost_agent.py"),
+        os.path.join(tests_dir, "test_github_agent.py"),
+        os.path.join(tests_dir, "test_infrastructure_agent.py"),
         os.path.join(tests_dir, "test_llm_service.py"),
+        os.path.join(tests_dir, "test_workflow_orchestrator.py"),
         os.path.join(tests_dir, "test_chroma_service.py")
     ]
     
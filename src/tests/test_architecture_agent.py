@@ -5,6 +5,7 @@ These tests verify that the ArchitectureAgent correctly reviews and improves
 infrastructure code, and can generate new infrastructure based on requirements.
 """
 
+import json
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 
@@ -286,6 +287,241 @@ async def test_parse_findings(architecture_agent):
     assert "critical_issues" in findings
     assert "recommendations" in findings
 
+@pytest.mark.asyncio
+async def test_review_architecture_uses_llm_cache(architecture_agent, mock_llm_service):
+    """Test that repeated reviews of the same code are served from the LLM cache."""
+    findings_json = """
+    {
+        "reliability": [],
+        "security": ["No security groups specified"],
+        "critical_issues": [],
+        "recommendations": ["Add security groups"]
+    }
+    """
+    mock_llm_service.generate_completion.return_value = findings_json
+
+    first_code, first_findings = await architecture_agent.review_architecture(
+        SAMPLE_EKS_CODE, "aws", "terraform"
+    )
+    second_code, second_findings = await architecture_agent.review_architecture(
+        SAMPLE_EKS_CODE, "aws", "terraform"
+    )
+
+    # Only the first review should reach the LLM
+    assert mock_llm_service.generate_completion.call_count == 1
+    assert first_findings == second_findings
+    assert first_code == second_code
+
+    # Error responses from the LLM service must not be cached
+    mock_llm_service.generate_completion.return_value = "Error: Ollama API returned status 500"
+    await architecture_agent.review_architecture("different code", "aws", "terraform")
+    await architecture_agent.review_architecture("different code", "aws", "terraform")
+    assert mock_llm_service.generate_completion.call_count == 3
+
+@pytest.mark.asyncio
+async def test_review_architecture_semantic_cache(mock_llm_service):
+    """Test that a matching review in the vector DB is reused without calling the LLM."""
+    import json
+    from src.agents.architect.architecture_agent import _normalize_code
+
+    mock_vector_db = MagicMock()
+    mock_vector_db.store_document = AsyncMock()
+    mock_vector_db.query_similar = AsyncMock(return_value=[{
+        "id": "cached",
+        "content": _normalize_code(SAMPLE_EKS_CODE),
+        "metadata": {"review": json.dumps({
+            "improved_code": IMPROVED_EKS_CODE,
+            "findings": SAMPLE_FINDINGS
+        })},
+        "similarity": 0.99
+    }])
+    agent = ArchitectureAgent(llm_service=mock_llm_service, vector_db_service=mock_vector_db)
+
+    # The same code with an extra comment normalizes to the cached document
+    improved_code, findings = await agent.review_architecture(
+        "# EKS cluster\n" + SAMPLE_EKS_CODE, "aws", "terraform"
+    )
+
+    mock_llm_service.generate_completion.assert_not_called()
+    mock_vector_db.store_document.assert_not_called()
+    assert improved_code == IMPROVED_EKS_CODE
+    assert findings == SAMPLE_FINDINGS
+
+    # A dissimilar result falls through to the LLM and stores the new review
+    mock_vector_db.query_similar.return_value = []
+    mock_llm_service.generate_completion.return_value = json.dumps({"critical_issues": []})
+    await agent.review_architecture("resource \"aws_s3_bucket\" \"b\" {}", "aws", "terraform")
+    assert mock_llm_service.generate_completion.call_count == 1
+    mock_vector_db.store_document.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_process_batch(architecture_agent, mock_llm_service):
+    """Test that process_batch reviews several messages and preserves their order."""
+    mock_llm_service.generate_completion.return_value = '{"critical_issues": []}'
+
+    results = await architecture_agent.process_batch([
+        {"task_id": f"review_{i}", "code": f"resource \"aws_s3_bucket\" \"b{i}\" {{}}"}
+        for i in range(3)
+    ])
+
+    assert [result["task_id"] for result in results] == ["review_0", "review_1", "review_2"]
+    assert mock_llm_service.generate_completion.call_count == 3
+
+@pytest.mark.asyncio
+async def test_extract_code_from_text_stream_stops_at_closing_fence():
+    """Test that streamed generation returns once the code block is complete."""
+    chunks = ["Here is the code:\n```terraform\n", SAMPLE_EKS_CODE, "```\n", "Some trailing ", "explanation."]
+    consumed = []
+
+    class StreamingLLMService:
+        model = "test-model"
+
+        async def generate_stream(self, prompt):
+            for chunk in chunks:
+                consumed.append(chunk)
+                yield chunk
+
+    agent = ArchitectureAgent(llm_service=StreamingLLMService())
+    code = await agent._extract_code_from_text_stream("generate an EKS cluster")
+
+    assert code == SAMPLE_EKS_CODE.strip()
+    # The trailing prose is never read from the stream
+    assert consumed == chunks[:3]
+
+    # A repeated prompt is served from the cache without streaming again
+    consumed.clear()
+    assert await agent._extract_code_from_text_stream("generate an EKS cluster") == code
+    assert consumed == []
+
+@pytest.mark.asyncio
+async def test_extract_code_from_text_stream_does_not_cache_failed_streams():
+    """Test that a stream failing partway is reported, not cached as truncated code."""
+    chunks = ["```terraform\n", SAMPLE_EKS_CODE[:40], "Error: Cannot connect to host localhost:11434"]
+
+    class StreamingLLMService:
+        model = "test-model"
+        calls = 0
+
+        async def generate_stream(self, prompt):
+            self.calls += 1
+            for chunk in chunks:
+                yield chunk
+
+    llm_service = StreamingLLMService()
+    agent = ArchitectureAgent(llm_service=llm_service)
+
+    with pytest.raises(RuntimeError, match="Cannot connect"):
+        await agent._extract_code_from_text_stream("generate an EKS cluster")
+
+    # Nothing was cached, so the next attempt streams again
+    chunks[-1] = "```"
+    assert await agent._extract_code_from_text_stream("generate an EKS cluster") == SAMPLE_EKS_CODE[:40].strip()
+    assert llm_service.calls == 2
+
+@pytest.mark.asyncio
+async def test_review_architecture_sends_code_once_per_session():
+    """Test that the improvement step follows up in the review session instead of re-sending the code."""
+    llm_service = LLMService(provider="ollama", model="test-model")
+    llm_service._generate_ollama_with_context = AsyncMock(side_effect=[
+        (f"```json\n{json.dumps(SAMPLE_FINDINGS)}\n```", [1, 2, 3]),
+        (f"```terraform\n{IMPROVED_EKS_CODE}\n```", [1, 2, 3, 4]),
+    ])
+    agent = ArchitectureAgent(llm_service=llm_service)
+
+    improved_code, findings = await agent.review_architecture(SAMPLE_EKS_CODE, "aws", "terraform")
+
+    assert findings == SAMPLE_FINDINGS
+    assert improved_code == IMPROVED_EKS_CODE.strip()
+    (analysis_call, improvement_call) = llm_service._generate_ollama_with_context.call_args_list
+    assert SAMPLE_EKS_CODE.strip() in analysis_call.args[0]
+    # The follow-up continues from the analysis context and leaves the code out
+    assert SAMPLE_EKS_CODE.strip() not in improvement_call.args[0]
+    assert improvement_call.args[4] == [1, 2, 3]
+
+@pytest.mark.asyncio
+async def test_review_architecture_batches_instead_of_using_sessions():
+    """Test that with a batch window, concurrent reviews go through the batcher, not sessions."""
+    import asyncio
+
+    llm_service = LLMService(provider="ollama", model="test-model")
+    llm_service.generate = AsyncMock(return_value=json.dumps({"critical_issues": []}))
+    llm_service._generate_ollama_with_context = AsyncMock()
+    agent = ArchitectureAgent(llm_service=llm_service, config={"llm_batch_window": 0.01})
+
+    await asyncio.gather(*(
+        agent.review_architecture(SAMPLE_EKS_CODE, provider, "terraform") for provider in ("aws", "aws", "gcp")
+    ))
+
+    llm_service._generate_ollama_with_context.assert_not_called()
+    # The two identical aws prompts were coalesced into one model call
+    assert llm_service.generate.await_count == 2
+
+@pytest.mark.asyncio
+async def test_review_architecture_skips_lookup_of_missing_templates(architecture_agent, mock_llm_service):
+    """Test that IaC types without templates use the inline prompt without touching the loader."""
+    mock_llm_service.generate_completion.return_value = json.dumps({"critical_issues": []})
+
+    with patch("src.agents.architect.architecture_agent.load_template") as mock_load_template:
+        await architecture_agent.review_architecture("- hosts: all", "aws", "ansible")
+
+    mock_load_template.assert_not_called()
+    assert "Review the following ansible code" in mock_llm_service.generate_completion.call_args.args[0]
+
+def test_has_critical_issues_ignores_low_severity(architecture_agent):
+    """Test that only issues tagged with a low severity skip the improvement step."""
+    assert not architecture_agent._has_critical_issues({"critical_issues": []})
+    assert not architecture_agent._has_critical_issues({"critical_issues": [
+        "[Low] Missing description on variable",
+        "Info: consider pinning the provider version",
+        {"severity": "minor", "issue": "Unused local value"},
+    ]})
+    assert architecture_agent._has_critical_issues({"critical_issues": ["No security groups specified"]})
+    assert architecture_agent._has_critical_issues({"critical_issues": ["Lower the open ingress CIDR range"]})
+    assert architecture_agent._has_critical_issues({"critical_issues": [{"severity": "high", "issue": "Public S3 bucket"}]})
+
+@pytest.mark.asyncio
+async def test_review_architecture_semantic_cache_skips_unrelated_code(mock_llm_service, tmp_path, monkeypatch):
+    """Test semantic review reuse against similarities computed by a real Chroma collection."""
+    import chromadb
+    from chromadb import Documents, EmbeddingFunction, Embeddings
+    from src.agents.architect.architecture_agent import REVIEW_CACHE_COLLECTION
+    from src.services.vector_db.chroma_service import ChromaService
+
+    class ResourceEmbedding(EmbeddingFunction):
+        """Unit vectors by resource: EKS clusters and S3 buckets are orthogonal."""
+
+        def __init__(self):
+            pass
+
+        @staticmethod
+        def name() -> str:
+            return "resource"
+
+        def __call__(self, input: Documents) -> Embeddings:
+            return [[1.0, 0.0] if "aws_eks_cluster" in text else [0.0, 1.0] for text in input]
+
+    monkeypatch.setenv("CHROMA_DB_PATH", str(tmp_path))
+    vector_db_service = ChromaService()
+    vector_db_service.client = chromadb.EphemeralClient()
+    vector_db_service.embedding_function = ResourceEmbedding()
+    vector_db_service._collections = {}
+    # Ephemeral clients share one in-memory store per process
+    if REVIEW_CACHE_COLLECTION in [collection.name for collection in vector_db_service.client.list_collections()]:
+        vector_db_service.client.delete_collection(REVIEW_CACHE_COLLECTION)
+    agent = ArchitectureAgent(llm_service=mock_llm_service, vector_db_service=vector_db_service)
+
+    eks_findings = {"critical_issues": [], "recommendations": ["Tag the cluster"]}
+    s3_findings = {"critical_issues": [], "recommendations": ["Enable bucket versioning"]}
+    mock_llm_service.generate_completion.side_effect = [json.dumps(eks_findings), json.dumps(s3_findings)]
+
+    _, first = await agent.review_architecture(SAMPLE_EKS_CODE, "aws", "terraform")
+    _, unrelated = await agent.review_architecture('resource "aws_s3_bucket" "b" {}', "aws", "terraform")
+    _, repeated = await agent.review_architecture("# EKS cluster\n" + SAMPLE_EKS_CODE, "aws", "terraform")
+
+    assert first == repeated == eks_findings
+    assert unrelated == s3_findings
+    assert mock_llm_service.generate_completion.call_count == 2
+
 # Run the tests if this file is executed directly
 if __name__ == "__main__":
     pytest.main(["-xvs", __file__]) 
\ No newline at end of file
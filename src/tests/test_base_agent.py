@@ -0,0 +1,244 @@
+"""
+Tests for the BaseAgent class.
+
+These tests verify the shared agent behaviour that every specialized agent
+inherits, such as thinking, memory handling and collaboration.
+"""
+
+import time
+import asyncio
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+
+from src.agents.base.base_agent import BaseAgent
+from src.services.llm.llm_service import LLMService
+
+class EchoAgent(BaseAgent):
+    """Minimal concrete agent used to exercise BaseAgent."""
+
+    async def process(self, input_data):
+        return {"task_id": input_data.get("task_id"), "echo": input_data.get("task")}
+
+@pytest.fixture
+def mock_llm_service():
+    """Create a mock LLM service for testing."""
+    mock_service = MagicMock(spec=LLMService)
+    mock_service.generate = AsyncMock(return_value="Fresh thoughts")
+    return mock_service
+
+@pytest.fixture
+def mock_vector_db_service():
+    """Create a mock vector database service for testing."""
+    mock_service = MagicMock()
+    mock_service.store_document = AsyncMock()
+    mock_service.query_similar = AsyncMock(return_value=[])
+    return mock_service
+
+def make_agent(llm_service, vector_db_service=None, config=None):
+    return EchoAgent(
+        name="echo_agent",
+        description="echoing tasks",
+        capabilities=["echo"],
+        llm_service=llm_service,
+        vector_db_service=vector_db_service,
+        config=config
+    )
+
+def thinking_memory(thoughts, similarity, timestamp):
+    return {
+        "id": "memory-1",
+        "content": '{"type": "thinking", "input": {"task": "Create a VPC"}, '
+                   f'"thoughts": "{thoughts}", "timestamp": {timestamp}}}',
+        "metadata": {"entry_type": "thinking"},
+        "similarity": similarity
+    }
+
+@pytest.mark.asyncio
+async def test_think_reuses_similar_thoughts(mock_llm_service, mock_vector_db_service):
+    """Test that a near-identical recent thought is returned without calling the LLM."""
+    mock_vector_db_service.query_similar.return_value = [
+        thinking_memory("Cached thoughts", 0.98, time.time())
+    ]
+    agent = make_agent(mock_llm_service, mock_vector_db_service)
+
+    result = await agent.think({"task_id": "t1", "task": "Create a VPC"})
+
+    assert result == {"thoughts": "Cached thoughts", "agent": "echo_agent", "cache_hit": True}
+    mock_llm_service.generate.assert_not_called()
+    assert agent.serialize()["think_cache_hits"] == 1
+
+@pytest.mark.asyncio
+async def test_think_ignores_dissimilar_or_stale_thoughts(mock_llm_service, mock_vector_db_service):
+    """Test that weak or expired matches still go to the LLM."""
+    agent = make_agent(mock_llm_service, mock_vector_db_service, config={"think_cache_ttl": 60})
+
+    mock_vector_db_service.query_similar.return_value = [
+        thinking_memory("Cached thoughts", 0.80, time.time())
+    ]
+    assert (await agent.think({"task": "Create a VPC"}))["thoughts"] == "Fresh thoughts"
+
+    mock_vector_db_service.query_similar.return_value = [
+        thinking_memory("Cached thoughts", 0.99, time.time() - 120)
+    ]
+    assert (await agent.think({"task": "Create a VPC"}))["thoughts"] == "Fresh thoughts"
+
+    assert mock_llm_service.generate.call_count == 2
+    assert agent.serialize()["think_cache_hits"] == 0
+
+@pytest.mark.asyncio
+async def test_update_memory_batches_vector_writes(mock_llm_service, mock_vector_db_service):
+    """Test that memories are queued and written to the vector DB in one bulk call."""
+    mock_vector_db_service.store_documents_bulk = AsyncMock()
+    agent = make_agent(mock_llm_service, mock_vector_db_service, config={"memory_flush_interval": 60})
+
+    for i in range(3):
+        await agent.update_memory({"type": "note", "content": f"memory {i}", "timestamp": i})
+
+    # Nothing is written until the flush interval passes or a flush is requested
+    assert len(agent.memory) == 3
+    mock_vector_db_service.store_documents_bulk.assert_not_called()
+
+    # Retrieval flushes first so the new memories are searchable
+    await agent.retrieve_similar_memories("memory")
+    mock_vector_db_service.store_documents_bulk.assert_awaited_once()
+    kwargs = mock_vector_db_service.store_documents_bulk.call_args.kwargs
+    assert kwargs["collection_name"] == "agent_memories"
+    assert len(kwargs["ids"]) == 3
+    assert [metadata["entry_type"] for metadata in kwargs["metadatas"]] == ["note"] * 3
+    mock_vector_db_service.store_document.assert_not_called()
+
+    await agent.aclose()
+
+@pytest.mark.asyncio
+async def test_memory_keeps_only_recent_entries(mock_llm_service):
+    """Test that in-process memory is bounded by memory_max."""
+    agent = make_agent(mock_llm_service, config={"memory_max": 2})
+
+    for i in range(3):
+        await agent.update_memory({"type": "note", "content": f"memory {i}"})
+
+    assert [entry["content"] for entry in agent.memory] == ["memory 1", "memory 2"]
+    assert agent.serialize()["memory_size"] == 2
+
+def test_last_active_time_tracks_state_changes(mock_llm_service):
+    """Test that activity is tracked monotonically and reported as wall-clock time."""
+    agent = make_agent(mock_llm_service)
+    before = agent.last_active_ns
+
+    agent.update_state("processing")
+
+    assert agent.last_active_ns >= before
+    assert agent.creation_time <= agent.last_active_time <= time.time() + 1
+    assert agent.serialize()["idle_seconds"] >= 0
+
+@pytest.mark.asyncio
+async def test_retrieve_similar_memories_caches_query_embeddings(mock_llm_service, mock_vector_db_service):
+    """Test that a repeated memory query is embedded only once."""
+    mock_vector_db_service.embed = AsyncMock(return_value=[0.1, 0.2, 0.3])
+    agent = make_agent(mock_llm_service, mock_vector_db_service)
+
+    for memory_type in ("thinking", None):
+        await agent.retrieve_similar_memories("Deploy a cached web tier", memory_type=memory_type)
+
+    mock_vector_db_service.embed.assert_awaited_once_with("Deploy a cached web tier")
+    assert mock_vector_db_service.query_similar.await_count == 2
+    assert mock_vector_db_service.query_similar.call_args.kwargs["query_embedding"] == [0.1, 0.2, 0.3]
+
+@pytest.mark.asyncio
+async def test_retrieve_similar_memories_reuses_results_for_repeated_queries(mock_llm_service, mock_vector_db_service):
+    """Test that normalized repeat queries skip the vector DB until a relevant memory is added."""
+    mock_vector_db_service.query_similar.return_value = [
+        thinking_memory("Cached thoughts", 0.5, time.time())
+    ]
+    agent = make_agent(mock_llm_service, mock_vector_db_service)
+
+    first = await agent.retrieve_similar_memories("Create a VPC", memory_type="thinking")
+    second = await agent.retrieve_similar_memories("  create   a vpc ", memory_type="thinking")
+    assert second == first
+    assert mock_vector_db_service.query_similar.await_count == 1
+
+    # A memory of another type leaves the cache alone; a thinking memory invalidates it
+    await agent.update_memory({"type": "note", "timestamp": 1})
+    await agent.retrieve_similar_memories("Create a VPC", memory_type="thinking")
+    assert mock_vector_db_service.query_similar.await_count == 1
+
+    await agent.update_memory({"type": "thinking", "thoughts": "New", "timestamp": 2})
+    await agent.retrieve_similar_memories("Create a VPC", memory_type="thinking")
+    assert mock_vector_db_service.query_similar.await_count == 2
+
+    await agent.aclose()
+
+@pytest.mark.asyncio
+async def test_collaborate_overlaps_think_and_target_processing(mock_llm_service):
+    """Test that the initiator thinks while the target agent processes the task."""
+    started = []
+    release = asyncio.Event()
+
+    async def slow_generate(prompt):
+        started.append("think")
+        await release.wait()
+        return "Initiator thoughts"
+
+    class WaitingAgent(EchoAgent):
+        async def process(self, input_data):
+            started.append("process")
+            # Only completes once think() has started, i.e. the two run concurrently
+            while "think" not in started:
+                await asyncio.sleep(0)
+            release.set()
+            return await super().process(input_data)
+
+    mock_llm_service.generate = AsyncMock(side_effect=slow_generate)
+    initiator = make_agent(mock_llm_service)
+    target = WaitingAgent(name="target", description="waiting", capabilities=["wait"], llm_service=mock_llm_service)
+
+    result = await asyncio.wait_for(
+        initiator.collaborate(target, {"task_id": "c1", "task": "Review the VPC"}), timeout=5
+    )
+
+    assert result["initiator_thoughts"] == "Initiator thoughts"
+    assert result["target_response"] == {"task_id": "c1", "echo": "Review the VPC"}
+
+@pytest.mark.asyncio
+async def test_think_does_not_reuse_thoughts_for_unrelated_tasks(mock_llm_service, tmp_path, monkeypatch):
+    """Test the think cache against similarities computed by a real Chroma collection."""
+    import chromadb
+    from chromadb import Documents, EmbeddingFunction, Embeddings
+    from src.services.vector_db.chroma_service import ChromaService
+
+    class TopicEmbedding(EmbeddingFunction):
+        """Unit vectors by topic: VPC tasks and Kubernetes tasks are orthogonal."""
+
+        def __init__(self):
+            pass
+
+        @staticmethod
+        def name() -> str:
+            return "topic"
+
+        def __call__(self, input: Documents) -> Embeddings:
+            return [[1.0, 0.0] if "VPC" in text else [0.0, 1.0] for text in input]
+
+    monkeypatch.setenv("CHROMA_DB_PATH", str(tmp_path))
+    vector_db_service = ChromaService()
+    vector_db_service.client = chromadb.EphemeralClient()
+    vector_db_service.embedding_function = TopicEmbedding()
+    vector_db_service._collections = {}
+    # Ephemeral clients share one in-memory store per process
+    if "agent_memories" in [collection.name for collection in vector_db_service.client.list_collections()]:
+        vector_db_service.client.delete_collection("agent_memories")
+    agent = make_agent(mock_llm_service, vector_db_service)
+
+    await agent.think({"task": "Create a VPC"})
+    unrelated = await agent.think({"task": "Create a Kubernetes cluster"})
+    repeated = await agent.think({"task": "Create a VPC"})
+
+    assert "cache_hit" not in unrelated
+    assert repeated.get("cache_hit") is True
+    assert mock_llm_service.generate.await_count == 2
+
+    await agent.aclose()
+
+# Run the tests if this file is executed directly
+if __name__ == "__main__":
+    pytest.main(["-xvs", __file__])
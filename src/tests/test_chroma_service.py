@@ -306,4 +306,36 @@ async def test_list_collections(chroma_service):
     
     # Verify both collections are in the list
     assert "test_collection_1" in collections
-    assert "test_collection_2" in collections
\ No newline at end of file
+    assert "test_collection_2" in collections
+
+
+@pytest.mark.asyncio
+async def test_query_similar_reports_cosine_similarity():
+    """Test that similarity follows the cosine of the embeddings in l2 and cosine collections."""
+    import chromadb
+
+    service = ChromaService()
+    service.client = chromadb.EphemeralClient()
+    service.embedding_function = None
+    service._collections = {}
+
+    # A collection created before the cosine default still uses Chroma's l2 space
+    service._collections["legacy_l2"] = service.client.create_collection(name="legacy_l2")
+    vectors = {"same": [1.0, 0.0, 0.0], "close": [0.6, 0.8, 0.0], "orthogonal": [0.0, 1.0, 0.0], "opposite": [-1.0, 0.0, 0.0]}
+    expected = {"same": 1.0, "close": 0.6, "orthogonal": 0.0, "opposite": -1.0}
+
+    for collection_name in ("legacy_l2", "cosine_space"):
+        collection = service.get_collection(collection_name)
+        collection.add(
+            ids=list(vectors),
+            embeddings=list(vectors.values()),
+            documents=list(vectors),
+            metadatas=[{"test": "value"}] * len(vectors)
+        )
+
+        results = await service.query_similar(
+            collection_name, "", n_results=len(vectors), query_embedding=[1.0, 0.0, 0.0]
+        )
+
+        similarities = {result["id"]: result["similarity"] for result in results}
+        assert similarities == pytest.approx(expected, abs=1e-5)
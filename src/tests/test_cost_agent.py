@@ -0,0 +1,423 @@
+"""
+Tests for the CostAgent class.
+
+These tests verify that the CostAgent analyzes, optimizes and forecasts
+infrastructure costs, and avoids repeat LLM calls where it can.
+"""
+
+import json
+import asyncio
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+
+from src.agents.cost.cost_agent import (
+    CostAgent, COST_CACHE_COLLECTION, FORECAST_SYSTEM_PROMPT, _code_excerpt, _extract_first_fence
+)
+from src.services.llm.llm_service import LLMService
+
+SAMPLE_CODE = """
+resource "aws_instance" "web" {
+  ami           = "ami-12345678"
+  instance_type = "m5.xlarge"
+}
+"""
+
+SAMPLE_ANALYSIS = {
+    "current_estimated_cost": 140,
+    "potential_savings": 70,
+    "optimization_opportunities": [],
+    "resource_recommendations": [],
+    "priority_optimizations": ["Right-size aws_instance.web"]
+}
+
+@pytest.fixture
+def mock_llm_service():
+    """Create a mock LLM service for testing."""
+    mock_service = MagicMock(spec=LLMService)
+    mock_service.model = "llama2"
+    mock_service.generate = AsyncMock(return_value="Thinking about costs")
+    mock_service.generate_completion = AsyncMock(return_value=json.dumps(SAMPLE_ANALYSIS))
+    return mock_service
+
+@pytest.fixture
+def mock_vector_db_service():
+    """Create a mock vector database service for testing."""
+    mock_service = MagicMock()
+    mock_service.store_document = AsyncMock()
+    mock_service.query_similar = AsyncMock(return_value=[])
+    return mock_service
+
+@pytest.mark.asyncio
+async def test_analyze_costs_caches_identical_prompts(mock_llm_service):
+    """Test that re-analyzing the same code is served from the LLM cache."""
+    agent = CostAgent(llm_service=mock_llm_service)
+
+    first = await agent.analyze_costs(SAMPLE_CODE, "aws", "terraform")
+    second = await agent.analyze_costs(SAMPLE_CODE, "aws", "terraform")
+
+    assert first == second == SAMPLE_ANALYSIS
+    assert mock_llm_service.generate_completion.call_count == 1
+    assert agent.llm_cache.hits == 1
+
+@pytest.mark.asyncio
+async def test_forecast_costs_reuses_semantically_similar_completion(mock_llm_service, mock_vector_db_service):
+    """Test that a near-identical stored forecast is reused without calling the LLM."""
+    forecast = {"total_forecasted_cost": 1680}
+    mock_vector_db_service.query_similar.return_value = [{
+        "id": "cached",
+        "content": "previous prompt",
+        "metadata": {"response": json.dumps(forecast)},
+        "similarity": 0.97
+    }]
+    agent = CostAgent(
+        llm_service=mock_llm_service,
+        vector_db_service=mock_vector_db_service,
+        config={"semantic_cache": True}
+    )
+
+    result = await agent.forecast_costs(SAMPLE_CODE, "aws", "terraform", forecast_months=6)
+
+    assert result == forecast
+    mock_llm_service.generate_completion.assert_not_called()
+    kwargs = mock_vector_db_service.query_similar.call_args.kwargs
+    assert kwargs["collection_name"] == COST_CACHE_COLLECTION
+    assert kwargs["where"] == {
+        "kind": "forecast", "cloud_provider": "aws", "iac_type": "terraform", "forecast_months": 6
+    }
+
+@pytest.mark.asyncio
+async def test_semantic_cache_is_opt_in_and_skips_code_rewrites(mock_llm_service, mock_vector_db_service):
+    """Test that near-identical prompts never share optimized code, and share nothing by default."""
+    mock_vector_db_service.query_similar.return_value = [{
+        "id": "cached",
+        "content": "previous prompt",
+        "metadata": {"response": "optimized code for another resource"},
+        "similarity": 0.99
+    }]
+
+    agent = CostAgent(llm_service=mock_llm_service, vector_db_service=mock_vector_db_service)
+    await agent.analyze_costs(SAMPLE_CODE, "aws", "terraform")
+    mock_vector_db_service.query_similar.assert_not_called()
+
+    agent = CostAgent(
+        llm_service=mock_llm_service,
+        vector_db_service=mock_vector_db_service,
+        config={"semantic_cache": True}
+    )
+    await agent._cached_completion("Optimize this code", "optimization", "aws", "terraform")
+    mock_vector_db_service.query_similar.assert_not_called()
+    assert all(
+        call.kwargs["metadata"]["kind"] != "optimization"
+        for call in mock_vector_db_service.store_document.call_args_list
+    )
+
+@pytest.mark.asyncio
+async def test_forecast_costs_sends_static_instructions_as_system_prompt(mock_llm_service):
+    """Test that only the per-request details are sent in the user prompt."""
+    agent = CostAgent(llm_service=mock_llm_service)
+
+    await agent.forecast_costs(SAMPLE_CODE, "gcp", "terraform", forecast_months=3)
+
+    prompt, system_prompt = mock_llm_service.generate_completion.call_args.args
+    assert system_prompt == FORECAST_SYSTEM_PROMPT
+    assert "Forecast period: 3 months" in prompt
+    assert "Cloud provider: gcp" in prompt
+    assert "Return your forecast" not in prompt
+
+@pytest.mark.asyncio
+async def test_stream_forecast_costs_yields_fields_before_stream_ends():
+    """Test that completed forecast fields are yielded while the model is still generating."""
+    consumed = []
+    chunks = ['```json\n{"cost_drivers": ["EC2"', ', "NAT"], "total_forecasted_cost": 16', '80, "monthly_', 'forecasts": []}\n```']
+
+    class StreamingLLMService:
+        model = "test-model"
+
+        async def generate_stream(self, prompt, system_prompt=None):
+            for chunk in chunks:
+                consumed.append(chunk)
+                yield chunk
+
+    agent = CostAgent(llm_service=StreamingLLMService())
+
+    items = []
+    async for key, value in agent.stream_forecast_costs(SAMPLE_CODE, "aws", "terraform"):
+        items.append((key, value, len(consumed)))
+
+    assert items == [
+        ("cost_drivers", ["EC2", "NAT"], 2),
+        ("total_forecasted_cost", 1680, 3),
+        ("monthly_forecasts", [], 4)
+    ]
+
+    # A repeated forecast is replayed from the cache without streaming again
+    consumed.clear()
+    replayed = [item async for item in agent.stream_forecast_costs(SAMPLE_CODE, "aws", "terraform")]
+    assert replayed == [(key, value) for key, value, _ in items]
+    assert consumed == []
+
+@pytest.mark.asyncio
+async def test_structural_cache_reuses_analysis_for_unpriced_changes(mock_llm_service):
+    """Test that code differing only in unpriced values reuses the cached analysis."""
+    agent = CostAgent(llm_service=mock_llm_service, config={"structural_cache": True})
+    await agent.analyze_costs(SAMPLE_CODE, "aws", "terraform")
+
+    other_ami = SAMPLE_CODE.replace("ami-12345678", "ami-87654321")
+    assert await agent.analyze_costs(other_ami, "aws", "terraform") == SAMPLE_ANALYSIS
+    assert mock_llm_service.generate_completion.call_count == 1
+
+    # A different instance type changes the price, so the model is asked again
+    other_size = SAMPLE_CODE.replace("m5.xlarge", "m5.large")
+    await agent.analyze_costs(other_size, "aws", "terraform")
+    assert mock_llm_service.generate_completion.call_count == 2
+
+def test_structural_cache_only_substitutes_unpriced_values():
+    """Test that any value outside names and tags invalidates a cached analysis."""
+    from src.agents.cost.gen_cache import StructuralCostCache
+
+    node_group = """
+resource "aws_eks_node_group" "workers" {
+  node_group_name = "workers"
+  instance_types  = ["m5.large"]
+  tags = {
+    Team = "platform"
+  }
+}
+"""
+    cache = StructuralCostCache()
+    cache.store(node_group, "aws", {"summary": "workers on m5.large for platform"})
+
+    retagged = node_group.replace('"platform"', '"payments"')
+    assert cache.lookup(retagged, "aws") == {"summary": "workers on m5.large for payments"}
+    assert cache.lookup(node_group.replace('"m5.large"', '"m5.4xlarge"'), "aws") is None
+
+    storage = 'resource "azurerm_storage_account" "sa" {\n  account_tier = "Standard"\n}\n'
+    disk = 'resource "google_compute_disk" "d" {\n  disk_type = "pd-standard"\n}\n'
+    cache.store(storage, "azure", {"summary": "Standard storage"})
+    cache.store(disk, "gcp", {"summary": "standard disk"})
+    assert cache.lookup(storage.replace("Standard", "Premium"), "azure") is None
+    assert cache.lookup(disk.replace("pd-standard", "pd-ssd"), "gcp") is None
+
+@pytest.mark.asyncio
+async def test_process_analyzes_and_optimizes_in_one_request(mock_llm_service):
+    """Test that process() gets the analysis and optimized code from a single completion."""
+    mock_llm_service.generate_completion.return_value = json.dumps({
+        "cost_analysis": SAMPLE_ANALYSIS,
+        "optimized_code": SAMPLE_CODE.replace("m5.xlarge", "m5.large")
+    })
+    agent = CostAgent(llm_service=mock_llm_service)
+
+    result = await agent.process({"task_id": "c1", "code": SAMPLE_CODE})
+
+    assert mock_llm_service.generate_completion.call_count == 1
+    assert result["cost_analysis"] == SAMPLE_ANALYSIS
+    assert 'instance_type = "m5.large"' in result["optimized_code"]
+    assert result["optimization_summary"]["optimized_cost"] == 70
+    assert result["thoughts"] == "Thinking about costs"
+
+@pytest.mark.asyncio
+async def test_process_keeps_fused_result_with_string_costs(mock_llm_service):
+    """Test that a parsed fused response with text costs is used instead of falling back."""
+    analysis = dict(SAMPLE_ANALYSIS, current_estimated_cost="$140/month", potential_savings="about a third")
+    mock_llm_service.generate_completion.return_value = json.dumps({
+        "cost_analysis": analysis,
+        "optimized_code": SAMPLE_CODE.replace("m5.xlarge", "m5.large")
+    })
+    agent = CostAgent(llm_service=mock_llm_service)
+
+    result = await agent.process({"task_id": "c5", "code": SAMPLE_CODE})
+
+    assert mock_llm_service.generate_completion.call_count == 1
+    assert result["cost_analysis"] == analysis
+    assert result["optimization_summary"]["optimized_cost"] is None
+
+@pytest.mark.asyncio
+async def test_process_falls_back_to_separate_requests(mock_llm_service):
+    """Test that an unparseable fused response falls back to analyze + optimize."""
+    optimized = SAMPLE_CODE.replace("m5.xlarge", "m5.large")
+    mock_llm_service.generate_completion.side_effect = [
+        "not json",
+        json.dumps(SAMPLE_ANALYSIS),
+        f"```hcl\n{optimized}\n```"
+    ]
+    agent = CostAgent(llm_service=mock_llm_service)
+
+    result = await agent.process({"task_id": "c2", "code": SAMPLE_CODE})
+
+    assert mock_llm_service.generate_completion.call_count == 3
+    assert result["cost_analysis"] == SAMPLE_ANALYSIS
+    assert result["optimized_code"] == optimized.strip()
+
+@pytest.mark.asyncio
+async def test_process_skips_optimization_without_savings(mock_llm_service):
+    """Test that no optimization request is made when the analysis finds no savings."""
+    mock_llm_service.generate_completion.return_value = json.dumps(dict(SAMPLE_ANALYSIS, potential_savings=0))
+    agent = CostAgent(llm_service=mock_llm_service, config={"fused_prompt": False})
+
+    result = await agent.process({"task_id": "c3", "code": SAMPLE_CODE})
+
+    assert mock_llm_service.generate_completion.call_count == 1
+    assert result["optimized_code"] == SAMPLE_CODE
+    assert result["optimization_summary"]["note"] == "No optimizations found"
+
+@pytest.mark.asyncio
+async def test_process_handles_string_costs_without_savings(mock_llm_service):
+    """Test that costs written as text don't break the no-savings summary."""
+    mock_llm_service.generate_completion.return_value = json.dumps(
+        dict(SAMPLE_ANALYSIS, current_estimated_cost="$120/month", potential_savings="0")
+    )
+    agent = CostAgent(llm_service=mock_llm_service, config={"fused_prompt": False})
+
+    result = await agent.process({"task_id": "c4", "code": SAMPLE_CODE})
+
+    assert mock_llm_service.generate_completion.call_count == 1
+    assert result["optimized_code"] == SAMPLE_CODE
+    assert result["optimization_summary"]["original_cost"] == "$120/month"
+    assert result["optimization_summary"]["optimized_cost"] == 120
+
+@pytest.mark.asyncio
+async def test_analyze_costs_multi_runs_providers_concurrently(mock_llm_service):
+    """Test that each provider is analyzed concurrently and keyed by provider."""
+    in_flight = []
+    peak = 0
+
+    async def generate_completion(prompt, system_prompt=None):
+        nonlocal peak
+        in_flight.append(prompt)
+        peak = max(peak, len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(prompt)
+        return json.dumps(SAMPLE_ANALYSIS)
+
+    mock_llm_service.generate_completion = AsyncMock(side_effect=generate_completion)
+    agent = CostAgent(llm_service=mock_llm_service)
+
+    results = await agent.analyze_costs_multi(SAMPLE_CODE, "terraform")
+
+    assert results == {"aws": SAMPLE_ANALYSIS, "azure": SAMPLE_ANALYSIS, "gcp": SAMPLE_ANALYSIS}
+    assert peak == 3
+
+@pytest.mark.asyncio
+async def test_analyze_repository_limits_concurrency(mock_llm_service, tmp_path):
+    """Test that repository files are analyzed concurrently up to the limit."""
+    in_flight = 0
+    peak = 0
+
+    async def generate_completion(prompt, system_prompt=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return json.dumps(SAMPLE_ANALYSIS)
+
+    mock_llm_service.generate_completion = AsyncMock(side_effect=generate_completion)
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"main{i}.tf"
+        path.write_text(SAMPLE_CODE.replace("web", f"web{i}"))
+        paths.append(str(path))
+    missing = str(tmp_path / "missing.tf")
+    agent = CostAgent(llm_service=mock_llm_service)
+
+    results = await agent.analyze_repository(paths + [missing], "aws", "terraform", concurrency=2)
+
+    assert all(results[path] == SAMPLE_ANALYSIS for path in paths)
+    assert "error" in results[missing]
+    assert peak == 2
+
+@pytest.mark.asyncio
+async def test_concurrent_analyses_are_batched(mock_llm_service):
+    """Test that concurrent identical analyses share one model call when batching is enabled."""
+    mock_llm_service.generate.return_value = json.dumps(SAMPLE_ANALYSIS)
+    agent = CostAgent(llm_service=mock_llm_service, config={"llm_batch_window": 0.01})
+
+    results = await asyncio.gather(*(agent.analyze_costs(SAMPLE_CODE, "aws", "terraform") for _ in range(3)))
+
+    assert results == [SAMPLE_ANALYSIS] * 3
+    assert mock_llm_service.generate.call_count == 1
+
+def test_summarize_optimizations():
+    """Test that summaries are built for a batch of analyses in order."""
+    summaries = CostAgent.summarize_optimizations([
+        SAMPLE_ANALYSIS,
+        {"current_estimated_cost": 50.5, "potential_savings": 0.5}
+    ])
+
+    assert [summary["optimized_cost"] for summary in summaries] == [70, 50.0]
+    assert summaries[0]["implemented_optimizations"] == ["Right-size aws_instance.web"]
+    assert summaries[1]["optimization_details"] == []
+
+def test_summarize_optimizations_reads_string_costs():
+    """Test that costs written as text are parsed, and unreadable ones don't fail the batch."""
+    summaries = CostAgent.summarize_optimizations([
+        {"current_estimated_cost": "$1,200/month", "potential_savings": "300 USD"},
+        {"current_estimated_cost": "about 100-200", "potential_savings": "0"},
+        SAMPLE_ANALYSIS
+    ])
+
+    assert [summary["optimized_cost"] for summary in summaries] == [900, None, 70]
+    assert summaries[1]["original_cost"] == "about 100-200"
+
+@pytest.mark.asyncio
+async def test_optimization_summary_flags_other_providers_instance_types(mock_llm_service):
+    """Test that right-sizing to another provider's instance type is reported as invalid."""
+    analysis = dict(SAMPLE_ANALYSIS, resource_recommendations=[
+        {"resource_type": "aws_instance", "current_config": "m5.xlarge", "recommended_config": "t3.small"},
+        {"resource_type": "aws_instance", "current_config": "m5.xlarge", "recommended_config": "e2-small"},
+        {"resource_type": "aws_s3_bucket", "current_config": "Standard", "recommended_config": "Glacier"}
+    ])
+    agent = CostAgent(llm_service=mock_llm_service)
+
+    _, summary = await agent.optimize_costs(SAMPLE_CODE, analysis, "aws", "terraform")
+
+    assert [r["recommended_config"] for r in summary["invalid_recommendations"]] == ["e2-small"]
+
+@pytest.mark.asyncio
+async def test_default_optimization_prompt_sends_compact_analysis(mock_llm_service):
+    """Test that the default prompt only carries what to change unless full context is requested."""
+    mock_llm_service.generate_completion.return_value = "```yaml\nResources: {}\n```"
+    analysis = dict(SAMPLE_ANALYSIS, optimization_opportunities=[{"description": "Use spot instances"}])
+    agent = CostAgent(llm_service=mock_llm_service)
+
+    await agent.optimize_costs(SAMPLE_CODE, analysis, "aws", "cloudformation")
+    prompt = mock_llm_service.generate_completion.call_args.args[0]
+    assert "Right-size aws_instance.web" in prompt
+    assert "Use spot instances" not in prompt
+
+    await agent.optimize_costs(SAMPLE_CODE, analysis, "aws", "cloudformation", full_context=True)
+    assert "Use spot instances" in mock_llm_service.generate_completion.call_args.args[0]
+
+def test_code_excerpt_keeps_head_and_tail():
+    """Test that long code is shortened to its start and end without indentation."""
+    code = "\n".join(f'    variable "v{i}" {{}}' for i in range(100))
+
+    excerpt = _code_excerpt(code, limit=200)
+
+    assert excerpt.startswith('variable "v0" {}\nvariable "v1" {}')
+    assert excerpt.endswith('variable "v99" {}')
+    assert "\n...\n" in excerpt
+    assert len(excerpt) <= 205
+    assert _code_excerpt(SAMPLE_CODE) == 'resource "aws_instance" "web" {\nami = "ami-12345678"\ninstance_type = "m5.xlarge"\n}'
+
+def test_extract_first_fence():
+    """Test that the first code block is extracted and unclosed fences fall back to the text."""
+    assert _extract_first_fence("Here:\n```hcl\nresource {}\n```\n```\nmore\n```") == "resource {}"
+    assert _extract_first_fence("  resource {}  ") == "resource {}"
+    assert _extract_first_fence("```hcl\nresource {" + " " * 10000) == "```hcl\nresource {"
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached(mock_llm_service, mock_vector_db_service):
+    """Test that LLM error responses are neither cached nor stored."""
+    mock_llm_service.generate_completion.return_value = "Error: Could not connect to Ollama API"
+    agent = CostAgent(llm_service=mock_llm_service, vector_db_service=mock_vector_db_service)
+
+    for _ in range(2):
+        await agent.analyze_costs(SAMPLE_CODE, "aws", "terraform")
+
+    assert mock_llm_service.generate_completion.call_count == 2
+    mock_vector_db_service.store_document.assert_not_called()
+
+# Run the tests if this file is executed directly
+if __name__ == "__main__":
+    pytest.main(["-xvs", __file__])
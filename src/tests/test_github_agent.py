@@ -0,0 +1,266 @@
+"""
+Tests for the GitHubAgent class.
+
+These tests verify that the GitHubAgent generates workflows and reviews code
+through the LLM service without repeating identical requests, and how it
+calls the GitHub API.
+"""
+
+import yaml
+import pytest
+from unittest.mock import MagicMock, AsyncMock, patch
+
+from src.agents.github.github_agent import GitHubAgent
+from src.services.llm.llm_service import LLMService
+
+@pytest.fixture
+def mock_llm_service():
+    """Create a mock LLM service for testing."""
+    mock_service = MagicMock(spec=LLMService)
+    mock_service.model = "llama2"
+    mock_service.generate = AsyncMock(return_value="Thinking about GitHub")
+    mock_service.generate_completion = AsyncMock(return_value="name: CI\non: [push]\n")
+    return mock_service
+
+@pytest.mark.asyncio
+async def test_process_dispatches_actions(mock_llm_service):
+    """Test that actions are routed to their handlers and unknown actions are reported."""
+    agent = GitHubAgent(llm_service=mock_llm_service, config={"github_org": "acme"})
+
+    created = await agent.process({"action": "create_repository", "parameters": {"name": "infra"}})
+    assert created["result"]["full_name"] == "acme/infra"
+    # Mechanical actions don't think unless asked to
+    mock_llm_service.generate.assert_not_called()
+    forced = await agent.process({"action": "create_repository", "parameters": {"name": "infra"}, "force_think": True})
+    assert forced["thoughts"] == "Thinking about GitHub"
+
+    unknown = await agent.process({"action": "delete_repository"})
+    assert unknown["result"]["error"] == "Unsupported action: delete_repository"
+    assert "manage_release" in unknown["result"]["supported_actions"]
+
+@pytest.mark.asyncio
+async def test_pull_request_number_is_stable(mock_llm_service):
+    """Test that the simulated PR number only depends on the repository and title."""
+    agent = GitHubAgent(llm_service=mock_llm_service)
+
+    pr = await agent.create_pull_request("acme/infra", "Add VPC", "", "feature/vpc")
+
+    # A fixed value, where hash() would differ between interpreter runs
+    assert pr["number"] == 334
+    assert pr["html_url"] == "https://github.com/acme/infra/pull/334"
+
+@pytest.mark.asyncio
+async def test_generate_workflow_caches_equivalent_requests(mock_llm_service):
+    """Test that the same requirements in another order are served from the cache."""
+    agent = GitHubAgent(llm_service=mock_llm_service)
+
+    first = await agent.generate_github_actions_workflow("api", "rust", ["test", "lint"])
+    second = await agent.generate_github_actions_workflow("api", "rust", ["lint", "test"])
+
+    assert first == second == "name: CI\non: [push]"
+    assert mock_llm_service.generate_completion.call_count == 1
+    assert agent.llm_cache.hits == 1
+
+@pytest.mark.asyncio
+async def test_generate_workflow_renders_common_cases_from_templates(mock_llm_service):
+    """Test that known languages and steps are rendered without calling the LLM."""
+    agent = GitHubAgent(llm_service=mock_llm_service)
+
+    workflow = await agent.generate_github_actions_workflow("web", "TypeScript", ["Linting", "test"])
+
+    assert "actions/setup-node" in workflow
+    assert "npm run lint" in workflow and "npm test" in workflow
+    assert "npm run build" not in workflow
+    assert yaml.safe_load(workflow)["jobs"]["ci"]["runs-on"] == "ubuntu-latest"
+    mock_llm_service.generate_completion.assert_not_called()
+
+    # Requirements the templates don't cover still go to the LLM
+    await agent.generate_github_actions_workflow("web", "typescript", ["deploy to S3"])
+    mock_llm_service.generate_completion.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_review_code_sends_largest_definitions_of_long_python_code(mock_llm_service):
+    """Test that long code is cut down to its largest top-level definitions."""
+    small = "\n\n".join(f"def helper_{i}():\n    return {i}" for i in range(50))
+    large = "def handler(event):\n" + "    event = normalize(event)\n" * 20 + "    return event"
+    agent = GitHubAgent(llm_service=mock_llm_service, config={"review_max_chars": 800})
+
+    await agent.review_code(f"{small}\n\n{large}", "python", ["bugs"])
+
+    prompt = mock_llm_service.generate_completion.call_args.args[0]
+    assert large in prompt
+    assert "helper_0" not in prompt
+    assert "... elided ..." in prompt
+
+@pytest.mark.asyncio
+async def test_review_code_does_not_cache_errors(mock_llm_service):
+    """Test that LLM error responses are retried rather than cached."""
+    mock_llm_service.generate_completion.return_value = "Error: Could not connect to Ollama API"
+    agent = GitHubAgent(llm_service=mock_llm_service)
+
+    for _ in range(2):
+        await agent.review_code("print('hi')", "python", ["security"])
+
+    assert mock_llm_service.generate_completion.call_count == 2
+
+@pytest.mark.asyncio
+async def test_batch_actions_are_submitted_together(mock_llm_service):
+    """Test that batched actions become one LLM batch whose results fill the cache."""
+    mock_llm_service.submit_batch = AsyncMock(return_value="batch_123")
+    mock_llm_service.get_batch_results = AsyncMock(side_effect=[None, ["name: CI\n", "Looks good"]])
+    agent = GitHubAgent(llm_service=mock_llm_service)
+
+    response = await agent.process({
+        "task_id": "g1",
+        "batch": True,
+        "actions": [
+            {"action": "generate_workflow", "parameters": {"repo_type": "api", "language": "rust", "ci_requirements": ["test"]}},
+            {"action": "review_code", "parameters": {"code": "package main", "language": "go", "review_focus": ["security"]}}
+        ]
+    })
+
+    assert response["result"] == {"batch_id": "batch_123", "status": "submitted", "count": 2}
+    assert len(mock_llm_service.submit_batch.call_args.args[0]) == 2
+    mock_llm_service.generate.assert_not_called()
+
+    assert (await agent.poll_batch("batch_123"))["status"] == "in_progress"
+    done = await agent.poll_batch("batch_123")
+    assert done["results"][0] == {"workflow": "name: CI"}
+    assert done["results"][1]["full_review"] == "Looks good"
+
+    # The batch results are reused by interactive requests
+    assert await agent.generate_github_actions_workflow("api", "rust", ["test"]) == "name: CI"
+    mock_llm_service.generate_completion.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_review_code_stream_yields_chunks_and_caches_review():
+    """Test that review chunks are yielded as they arrive and the full review is cached."""
+    class StreamingLLMService:
+        model = "test-model"
+        calls = 0
+
+        async def generate_stream(self, prompt, system_prompt=None):
+            StreamingLLMService.calls += 1
+            for chunk in ["Overall: ", "looks ", "good"]:
+                yield chunk
+
+    agent = GitHubAgent(llm_service=StreamingLLMService())
+
+    chunks = [chunk async for chunk in agent.review_code_stream("x = 1", "python", ["style"])]
+    assert chunks == ["Overall: ", "looks ", "good"]
+
+    replayed = [chunk async for chunk in agent.review_code_stream("x = 1", "python", ["style"])]
+    assert replayed == ["Overall: looks good"]
+    assert StreamingLLMService.calls == 1
+
+@pytest.mark.asyncio
+async def test_review_code_stream_does_not_cache_failed_streams():
+    """Test that a review whose stream fails partway is not cached."""
+    class StreamingLLMService:
+        model = "test-model"
+        calls = 0
+
+        async def generate_stream(self, prompt, system_prompt=None):
+            StreamingLLMService.calls += 1
+            for chunk in ["Overall: ", "Error: Connection reset by peer"]:
+                yield chunk
+
+    agent = GitHubAgent(llm_service=StreamingLLMService())
+
+    for _ in range(2):
+        chunks = [chunk async for chunk in agent.review_code_stream("x = 1", "python", ["style"])]
+        assert chunks == ["Overall: ", "Error: Connection reset by peer"]
+    assert StreamingLLMService.calls == 2
+
+@pytest.mark.asyncio
+async def test_review_code_replays_independent_samples_per_namespace(mock_llm_service):
+    """Test that several samples are cached separately and replayed within a namespace."""
+    mock_llm_service.generate_completion = AsyncMock(side_effect=[f"Review {i}" for i in range(5)])
+    agent = GitHubAgent(llm_service=mock_llm_service)
+
+    first = await agent.review_code("x = 1", "python", ["bugs"], n_samples=3, namespace="task-1")
+    again = await agent.review_code("x = 1", "python", ["bugs"], n_samples=3, namespace="task-1")
+
+    assert sorted(first["samples"]) == ["Review 0", "Review 1", "Review 2"]
+    assert again["samples"] == first["samples"]
+    assert mock_llm_service.generate_completion.call_count == 3
+
+    # Clearing the namespace draws fresh samples
+    await agent.llm_cache.clear_namespace("task-1")
+    await agent.review_code("x = 1", "python", ["bugs"], n_samples=2, namespace="task-1")
+    assert mock_llm_service.generate_completion.call_count == 5
+
+@pytest.mark.asyncio
+async def test_review_codes_splits_one_response_into_file_reviews(mock_llm_service):
+    """Test that several files are reviewed in one request and missing sections fall back."""
+    mock_llm_service.generate_completion = AsyncMock(side_effect=[
+        "### REVIEW 0\nLooks fine\n\n### REVIEW 2\nUnused import",
+        "Check the loop bounds"
+    ])
+    agent = GitHubAgent(llm_service=mock_llm_service)
+    files = [
+        {"name": "a.py", "language": "python", "code": "x = 1"},
+        {"name": "b.py", "language": "python", "code": "for i in range(n): pass"},
+        {"name": "c.py", "language": "python", "code": "import os"}
+    ]
+
+    reviews = await agent.review_codes(files, ["bugs"])
+
+    assert [review["full_review"] for review in reviews] == ["Looks fine", "Check the loop bounds", "Unused import"]
+    batch_prompt = mock_llm_service.generate_completion.call_args_list[0].args[0]
+    assert "### FILE 2: c.py" in batch_prompt
+    # Only the file missing from the batch response was reviewed on its own
+    assert "for i in range(n)" in mock_llm_service.generate_completion.call_args_list[1].args[0]
+
+def github_response(body, headers=None):
+    """Build a mock GitHub API response usable as an async context manager."""
+    response = MagicMock(status=200, headers=headers or {})
+    response.json = AsyncMock(return_value=body)
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=response)
+    context.__aexit__ = AsyncMock(return_value=None)
+    return context
+
+@pytest.mark.asyncio
+async def test_create_pull_request_calls_github_api_with_token(mock_llm_service):
+    """Test that a configured token makes pull requests real API calls."""
+    mock_session = MagicMock()
+    mock_session.request = MagicMock(return_value=github_response({
+        "number": 7, "title": "Add CI", "body": "", "state": "open",
+        "html_url": "https://github.com/acme/infra/pull/7",
+        "head": {"ref": "ci"}, "base": {"ref": "main"}
+    }))
+    agent = GitHubAgent(llm_service=mock_llm_service, config={"github_token": "token"})
+
+    with patch.object(agent, "_get_session", return_value=mock_session):
+        pr = await agent.create_pull_request("acme/infra", "Add CI", "", head="ci")
+
+    assert pr["number"] == 7
+    mock_session.request.assert_called_once_with(
+        "POST", "https://api.github.com/repos/acme/infra/pulls",
+        json={"title": "Add CI", "body": "", "head": "ci", "base": "main"}
+    )
+
+@pytest.mark.asyncio
+async def test_list_pull_requests_fetches_remaining_pages(mock_llm_service):
+    """Test that pages after the first are requested up to the rel="last" link."""
+    link = ('<https://api.github.com/repos/acme/infra/pulls?state=open&per_page=100&page=2>; rel="next", '
+            '<https://api.github.com/repos/acme/infra/pulls?state=open&per_page=100&page=3>; rel="last"')
+
+    def request(method, url, params):
+        page = params["page"]
+        return github_response([{"number": page}], {"Link": link} if page == 1 else {})
+
+    mock_session = MagicMock()
+    mock_session.request = MagicMock(side_effect=request)
+    agent = GitHubAgent(llm_service=mock_llm_service, config={"github_token": "token"})
+
+    with patch.object(agent, "_get_session", return_value=mock_session):
+        pulls = await agent.list_pull_requests("acme/infra")
+
+    assert [pull["number"] for pull in pulls] == [1, 2, 3]
+    assert mock_session.request.call_count == 3
+
+# Run the tests if this file is executed directly
+if __name__ == "__main__":
+    pytest.main(["-xvs", __file__])
@@ -0,0 +1,284 @@
+"""
+Tests for the InfrastructureAgent class.
+
+These tests verify that the InfrastructureAgent generates, analyzes and
+estimates infrastructure code, and how it builds its LLM prompts.
+"""
+
+import json
+import asyncio
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+
+from src.agents.infra.infrastructure_agent import (
+    InfrastructureAgent, COST_ESTIMATE_SYSTEM_PROMPT, IAC_PREAMBLE, INFRA_CACHE_COLLECTION
+)
+from src.services.llm.llm_service import LLMService
+
+SAMPLE_CODE = """
+resource "aws_instance" "web" {
+  ami           = "ami-12345678"
+  instance_type = "t3.micro"
+}
+"""
+
+SAMPLE_ESTIMATE = {
+    "estimated_monthly_cost": 8,
+    "estimated_yearly_cost": 96,
+    "breakdown": {},
+    "savings_opportunities": []
+}
+
+@pytest.fixture
+def mock_llm_service():
+    """Create a mock LLM service for testing."""
+    mock_service = MagicMock(spec=LLMService)
+    mock_service.model = "llama2"
+    mock_service.generate = AsyncMock(return_value="Thinking about infrastructure")
+    mock_service.generate_completion = AsyncMock(return_value=json.dumps(SAMPLE_ESTIMATE))
+    return mock_service
+
+@pytest.mark.asyncio
+async def test_estimate_costs_sends_instructions_as_system_prompt(mock_llm_service):
+    """Test that only the code and its context vary between cost estimation prompts."""
+    agent = InfrastructureAgent(llm_service=mock_llm_service)
+
+    result = await agent.estimate_costs(SAMPLE_CODE, "terraform", "aws")
+
+    assert result == SAMPLE_ESTIMATE
+    prompt, system_prompt = mock_llm_service.generate_completion.call_args.args
+    assert system_prompt == COST_ESTIMATE_SYSTEM_PROMPT
+    assert SAMPLE_CODE in prompt
+    assert "savings_opportunities" not in prompt
+
+@pytest.mark.asyncio
+async def test_estimate_costs_reuses_cached_estimates(mock_llm_service):
+    """Test that estimating unchanged code again is served from the LLM cache."""
+    agent = InfrastructureAgent(llm_service=mock_llm_service)
+
+    first = await agent.estimate_costs(SAMPLE_CODE, "terraform", "aws")
+    second = await agent.estimate_costs(SAMPLE_CODE, "terraform", "aws")
+    await agent.estimate_costs(SAMPLE_CODE, "terraform", "gcp")
+
+    assert first == second == SAMPLE_ESTIMATE
+    assert mock_llm_service.generate_completion.call_count == 2
+    assert agent.llm_cache.hits == 1
+
+@pytest.mark.asyncio
+async def test_analyze_infrastructure_reuses_near_identical_analyses(mock_llm_service):
+    """Test that a similar enough stored analysis of the same IaC type is reused."""
+    cached_analysis = {"overall_score": 7, "summary": "Fine"}
+    mock_vector_db_service = MagicMock()
+    mock_vector_db_service.store_document = AsyncMock()
+    mock_vector_db_service.query_similar = AsyncMock(return_value=[
+        {"similarity": 0.99, "metadata": {"response": json.dumps(cached_analysis)}}
+    ])
+    agent = InfrastructureAgent(
+        llm_service=mock_llm_service,
+        vector_db_service=mock_vector_db_service,
+        config={"semantic_cache": True}
+    )
+
+    assert await agent.analyze_infrastructure(SAMPLE_CODE, "terraform") == cached_analysis
+    mock_llm_service.generate_completion.assert_not_called()
+    kwargs = mock_vector_db_service.query_similar.call_args.kwargs
+    assert kwargs["collection_name"] == INFRA_CACHE_COLLECTION
+    assert kwargs["where"] == {"kind": "analysis", "iac_type": "terraform"}
+
+    # Below the threshold the model is asked and its answer stored for next time
+    mock_vector_db_service.query_similar.return_value[0]["similarity"] = 0.9
+    await agent.analyze_infrastructure(SAMPLE_CODE + "\n# changed", "terraform")
+    mock_llm_service.generate_completion.assert_awaited_once()
+    mock_vector_db_service.store_document.assert_awaited_once()
+
+    # Cost estimates are never reused for a merely similar prompt
+    mock_vector_db_service.query_similar.return_value[0]["similarity"] = 0.99
+    await agent.estimate_costs(SAMPLE_CODE.replace("t3.micro", "t3.large"), "terraform", "aws")
+    assert mock_vector_db_service.query_similar.await_count == 2
+    assert mock_llm_service.generate_completion.await_count == 2
+    mock_vector_db_service.store_document.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_semantic_cache_is_off_by_default(mock_llm_service):
+    """Test that a vector DB alone does not turn on semantic reuse."""
+    mock_vector_db_service = MagicMock()
+    mock_vector_db_service.query_similar = AsyncMock(return_value=[])
+    agent = InfrastructureAgent(llm_service=mock_llm_service, vector_db_service=mock_vector_db_service)
+
+    await agent.analyze_infrastructure(SAMPLE_CODE, "terraform")
+
+    mock_vector_db_service.query_similar.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_generators_share_system_prompt_preamble(mock_llm_service):
+    """Test that every generator's system prompt starts with the same preamble."""
+    agent = InfrastructureAgent(llm_service=mock_llm_service)
+    requirements = {"region": "eu-west-1"}
+
+    await agent._generate_terraform("Create a VPC", requirements, "aws")
+    await agent._generate_ansible("Create a VPC", requirements, "aws")
+    await agent._generate_jenkins("Create a VPC", requirements)
+
+    for call in mock_llm_service.generate_completion.call_args_list:
+        prompt, system_prompt = call.args
+        assert system_prompt.startswith(IAC_PREAMBLE)
+        assert "Create a VPC" in prompt and "eu-west-1" in prompt
+
+@pytest.mark.asyncio
+async def test_process_generates_several_iac_types_concurrently(mock_llm_service):
+    """Test that a list of IaC types is generated with overlapping LLM calls."""
+    started = []
+    all_started = asyncio.Event()
+
+    async def generate_completion(prompt, system_prompt=None):
+        started.append(system_prompt)
+        if len(started) == 3:
+            all_started.set()
+        # Only returns once every generator has called the model
+        await all_started.wait()
+        return "Ansible code" if "Ansible" in system_prompt else "Generated code"
+
+    mock_llm_service.generate_completion = AsyncMock(side_effect=generate_completion)
+    agent = InfrastructureAgent(llm_service=mock_llm_service)
+
+    result = await asyncio.wait_for(agent.process({
+        "task": "Create a VPC",
+        "iac_type": ["terraform", "Ansible", "jenkins"]
+    }), timeout=5)
+
+    assert result["status"] == "success"
+    assert result["iac_type"] == ["terraform", "ansible", "jenkins"]
+    assert set(result["outputs"]) == {"terraform", "ansible", "jenkins"}
+    assert result["outputs"]["ansible"]["code"] == "Ansible code"
+    generations = [entry for entry in agent.memory if entry["type"] == "infrastructure_generation"]
+    assert [entry["input"]["iac_type"] for entry in generations] == ["terraform", "ansible", "jenkins"]
+
+@pytest.mark.asyncio
+async def test_process_rejects_unsupported_iac_types(mock_llm_service):
+    """Test that an unknown IaC type fails the request before any generation."""
+    agent = InfrastructureAgent(llm_service=mock_llm_service)
+
+    result = await agent.process({"task": "Create a VPC", "iac_type": ["terraform", "pulumi"]})
+
+    assert result["status"] == "error"
+    assert "pulumi" in result["error"]
+    mock_llm_service.generate_completion.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_stream_estimate_costs_yields_total_before_breakdown():
+    """Test that the monthly total is yielded while the breakdown is still generating."""
+    consumed = []
+    chunks = ['{"estimated_monthly_cost": 8,', ' "estimated_yearly_cost": 96, "breakdown": {"compute"', ': {}}}']
+
+    class StreamingLLMService:
+        model = "test-model"
+
+        async def generate_stream(self, prompt, system_prompt=None):
+            for chunk in chunks:
+                consumed.append(chunk)
+                yield chunk
+
+    agent = InfrastructureAgent(llm_service=StreamingLLMService())
+
+    items = []
+    async for key, value in agent.stream_estimate_costs(SAMPLE_CODE, "terraform", "aws"):
+        items.append((key, value, len(consumed)))
+
+    assert items == [
+        ("estimated_monthly_cost", 8, 1),
+        ("estimated_yearly_cost", 96, 2),
+        ("breakdown", {"compute": {}}, 3)
+    ]
+
+    # The complete estimate is cached for the non-streaming method too
+    consumed.clear()
+    assert await agent.estimate_costs(SAMPLE_CODE, "terraform", "aws") == {
+        "estimated_monthly_cost": 8, "estimated_yearly_cost": 96, "breakdown": {"compute": {}}
+    }
+    assert consumed == []
+
+@pytest.mark.asyncio
+async def test_stream_estimate_costs_does_not_cache_failed_streams(mock_llm_service):
+    """Test that an error reported after the closing brace keeps the stream out of the cache."""
+    class StreamingLLMService:
+        model = "test-model"
+        calls = 0
+
+        async def generate_stream(self, prompt, system_prompt=None):
+            StreamingLLMService.calls += 1
+            for chunk in ['{"estimated_monthly_cost": 8}', "Error: connection reset"]:
+                yield chunk
+
+    agent = InfrastructureAgent(llm_service=StreamingLLMService())
+
+    for _ in range(2):
+        items = [item async for item in agent.stream_estimate_costs(SAMPLE_CODE, "terraform", "aws")]
+        assert items == [("estimated_monthly_cost", 8)]
+    assert StreamingLLMService.calls == 2
+
+@pytest.mark.asyncio
+async def test_structural_cache_reuses_code_for_renamed_resources(mock_llm_service):
+    """Test that a request differing only in substitutable names reuses generated code."""
+    mock_llm_service.generate_completion = AsyncMock(
+        return_value='resource "aws_s3_bucket" "assets" {\n  bucket = "web-assets"\n}'
+    )
+    agent = InfrastructureAgent(llm_service=mock_llm_service, config={"structural_cache": True})
+    await agent._generate_terraform("Create a bucket", {"bucket": "web-assets", "env": "prod"}, "aws")
+
+    code, _ = await agent._generate_terraform("Create a bucket", {"bucket": "api-logs", "env": "prod"}, "aws")
+    assert code == 'resource "aws_s3_bucket" "assets" {\n  bucket = "api-logs"\n}'
+    assert mock_llm_service.generate_completion.call_count == 1
+
+    # "env" does not appear in the code, so it may have shaped it and must match
+    await agent._generate_terraform("Create a bucket", {"bucket": "api-logs", "env": "dev"}, "aws")
+    assert mock_llm_service.generate_completion.call_count == 2
+
+@pytest.mark.asyncio
+async def test_structural_cache_does_not_substitute_environments(mock_llm_service):
+    """Test that an environment appearing in the code is never swapped into production-sized code."""
+    production_db = (
+        'resource "aws_db_instance" "main" {\n'
+        '  instance_class          = "db.r5.2xlarge"\n'
+        '  multi_az                = true\n'
+        '  backup_retention_period = 30\n'
+        '  tags = { Environment = "production", Team = "payments" }\n'
+        '}'
+    )
+    mock_llm_service.generate_completion = AsyncMock(return_value=production_db)
+    agent = InfrastructureAgent(llm_service=mock_llm_service, config={"structural_cache": True})
+    await agent._generate_terraform(
+        "Create a database", {"environment": "production", "tags": {"Team": "payments"}}, "aws"
+    )
+
+    # Tag values are names, so another team reuses the code
+    code, _ = await agent._generate_terraform(
+        "Create a database", {"environment": "production", "tags": {"Team": "platform"}}, "aws"
+    )
+    assert 'Team = "platform"' in code
+    assert mock_llm_service.generate_completion.call_count == 1
+
+    await agent._generate_terraform(
+        "Create a database", {"environment": "development", "tags": {"Team": "payments"}}, "aws"
+    )
+    assert mock_llm_service.generate_completion.call_count == 2
+
+@pytest.mark.asyncio
+async def test_analyze_infrastructure_slims_oversized_code(mock_llm_service):
+    """Test that code over analyze_max_chars loses comments and low-priority blocks first."""
+    agent = InfrastructureAgent(llm_service=mock_llm_service, config={"analyze_max_chars": 400})
+    outputs = "".join(
+        f'# Output {i}\noutput "out_{i}" {{\n  value = aws_instance.web.id\n}}\n\n' for i in range(20)
+    )
+
+    await agent.analyze_infrastructure(SAMPLE_CODE + outputs, "terraform")
+
+    prompt = mock_llm_service.generate_completion.call_args.args[0]
+    assert 'resource "aws_instance" "web"' in prompt
+    assert 'instance_type = "t3.micro"' in prompt
+    assert "# Output" not in prompt
+    assert "blocks elided" in prompt
+    assert len(prompt) < 600
+
+# Run the tests if this file is executed directly
+if __name__ == "__main__":
+    pytest.main(["-xvs", __file__])
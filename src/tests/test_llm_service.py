@@ -6,12 +6,15 @@ including error handling and fallback to mock responses when needed.
 """
 
 import pytest
+import asyncio
 import aiohttp
 from unittest.mock import patch, MagicMock, AsyncMock, ANY
 import json
 from aiohttp import RequestInfo
 
 from src.services.llm.llm_service import LLMService
+from src.services.llm.batching import BatchingLLM
+from src.services.llm.cache import CompletionCache, LLMCache
 
 @pytest.fixture
 def llm_service():
@@ -113,12 +116,11 @@ async def test_generate_ollama_connection_error(llm_service):
 @pytest.mark.asyncio
 async def test_generate_ollama_timeout_error(llm_service):
     """Test handling of timeout errors when calling Ollama API."""
-    # Mock ClientSession to raise a timeout error
+    # Mock the shared HTTP session to raise a timeout error
     mock_session = MagicMock()
-    mock_session.__aenter__ = AsyncMock(side_effect=aiohttp.ServerTimeoutError("Timeout error"))
-    mock_session.__aexit__ = AsyncMock(return_value=None)
+    mock_session.post = MagicMock(side_effect=aiohttp.ServerTimeoutError("Timeout error"))
     
-    with patch('aiohttp.ClientSession', return_value=mock_session):
+    with patch.object(llm_service, '_get_session', return_value=mock_session):
         result = await llm_service._generate_ollama(
             "Test prompt", 
             system_prompt=None, 
@@ -209,6 +211,147 @@ async def test_generate_ollama_eks_mock_response(llm_service):
         assert "provider \"aws\"" in result
         assert "module \"vpc\"" in result
 
+def test_parse_stream_line():
+    """Test that streaming response lines are decoded for each provider."""
+    ollama_service = LLMService()
+    assert ollama_service._parse_stream_line('{"response": "resource", "done": false}') == "resource"
+    assert ollama_service._parse_stream_line("") == ""
+
+    openai_service = LLMService(provider="openai", model="gpt-4")
+    assert openai_service._parse_stream_line(
+        'data: {"choices": [{"delta": {"content": "module"}}]}'
+    ) == "module"
+    assert openai_service._parse_stream_line("data: [DONE]") == ""
+
+    anthropic_service = LLMService(provider="anthropic", model="claude")
+    assert anthropic_service._parse_stream_line(
+        'data: {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "vpc"}}'
+    ) == "vpc"
+    assert anthropic_service._parse_stream_line("event: content_block_delta") == ""
+
+@pytest.mark.asyncio
+async def test_http_session_is_shared(llm_service):
+    """Test that requests reuse one HTTP session until the service is closed."""
+    session = llm_service._get_session()
+    assert llm_service._get_session() is session
+
+    await llm_service.aclose()
+    assert session.closed
+    assert llm_service._get_session() is not session
+    await llm_service.aclose()
+
+@pytest.mark.asyncio
+async def test_generate_retries_rate_limited_requests():
+    """Test that 429 responses are retried before the request succeeds."""
+    def make_response(status, body=None):
+        response = MagicMock(status=status, headers={})
+        response.json = AsyncMock(return_value=body)
+        context = MagicMock()
+        context.__aenter__ = AsyncMock(return_value=response)
+        context.__aexit__ = AsyncMock(return_value=None)
+        return context
+
+    mock_session = MagicMock()
+    mock_session.post = MagicMock(side_effect=[
+        make_response(429),
+        make_response(200, {"response": "resource \"aws_vpc\" \"main\" {}"})
+    ])
+    service = LLMService(config={"http_retry_backoff": 0})
+
+    with patch.object(service, '_get_session', return_value=mock_session):
+        result = await service.generate("Create a VPC")
+
+    assert result == "resource \"aws_vpc\" \"main\" {}"
+    assert mock_session.post.call_count == 2
+
+@pytest.mark.asyncio
+async def test_anthropic_system_prompt_is_cacheable():
+    """Test that the Anthropic system prompt is sent as a prompt-cache breakpoint."""
+    response = MagicMock(status=200, headers={})
+    response.json = AsyncMock(return_value={"content": [{"text": "resource"}]})
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=response)
+    context.__aexit__ = AsyncMock(return_value=None)
+    mock_session = MagicMock()
+    mock_session.post = MagicMock(return_value=context)
+    service = LLMService(provider="anthropic", model="claude", api_key="test")
+
+    with patch.object(service, '_get_session', return_value=mock_session):
+        result = await service.generate("Create a VPC", system_prompt="You are a Terraform expert.")
+
+    assert result == "resource"
+    assert mock_session.post.call_args.kwargs["json"]["system"] == [
+        {"type": "text", "text": "You are a Terraform expert.", "cache_control": {"type": "ephemeral"}}
+    ]
+
+@pytest.mark.asyncio
+async def test_get_batch_results_orders_completions():
+    """Test that batch output lines are returned in prompt order with failures as errors."""
+    def make_response(body=None, text=None):
+        response = MagicMock(status=200, headers={})
+        response.json = AsyncMock(return_value=body)
+        response.text = AsyncMock(return_value=text)
+        context = MagicMock()
+        context.__aenter__ = AsyncMock(return_value=response)
+        context.__aexit__ = AsyncMock(return_value=None)
+        return context
+
+    output = "\n".join(json.dumps(line) for line in [
+        {"custom_id": "request-1", "response": {"body": {"choices": [{"message": {"content": "second"}}]}}},
+        {"custom_id": "request-0", "response": {"body": {"choices": [{"message": {"content": "first"}}]}}},
+        {"custom_id": "request-2", "error": {"message": "Rate limited"}}
+    ])
+    mock_session = MagicMock()
+    mock_session.get = MagicMock(side_effect=[
+        make_response({"status": "in_progress"}),
+        make_response({"status": "completed", "output_file_id": "file-1", "request_counts": {"total": 3}}),
+        make_response(text=output)
+    ])
+    service = LLMService(provider="openai", model="gpt-4", api_key="test")
+
+    with patch.object(service, '_get_session', return_value=mock_session):
+        assert await service.get_batch_results("batch_1") is None
+        results = await service.get_batch_results("batch_1")
+
+    assert results == ["first", "second", "Error: Rate limited"]
+
+@pytest.mark.asyncio
+async def test_batching_llm_coalesces_requests():
+    """Test that concurrent requests are dispatched together and duplicates are sent once."""
+    mock_service = MagicMock(spec=LLMService)
+    mock_service.model = "llama2"
+    mock_service.generate = AsyncMock(side_effect=lambda prompt, *args: f"response to {prompt}")
+    batching_llm = BatchingLLM(mock_service, window=0.01)
+
+    results = await asyncio.gather(
+        batching_llm.generate_completion("a"),
+        batching_llm.generate_completion("b"),
+        batching_llm.generate_completion("a"),
+    )
+
+    assert results == ["response to a", "response to b", "response to a"]
+    assert mock_service.generate.call_count == 2
+    # Other attributes come from the wrapped service
+    assert batching_llm.model == "llama2"
+    # Sessions and streams would bypass the batch window, so they aren't offered
+    assert not hasattr(batching_llm, "new_session")
+    assert not hasattr(batching_llm, "generate_stream")
+
+@pytest.mark.asyncio
+async def test_completion_cache_skips_failed_completions():
+    """Test that the completion cache reuses completions but never caches failures."""
+    mock_service = MagicMock(spec=LLMService)
+    mock_service.model = "llama2"
+    mock_service.generate_completion = AsyncMock(side_effect=["Error: Rate limited", '{"ok": true}'])
+    completion_cache = CompletionCache(LLMCache(), collection_name="test_completions")
+
+    assert await completion_cache.complete(mock_service, "prompt", None, "analysis") == "Error: Rate limited"
+    assert await completion_cache.complete(mock_service, "prompt", None, "analysis") == '{"ok": true}'
+    items = [item async for item in completion_cache.stream_items(mock_service, "prompt", None, "analysis")]
+
+    assert items == [("ok", True)]
+    assert mock_service.generate_completion.call_count == 2
+
 # Run the tests if this file is executed directly
 if __name__ == "__main__":
     pytest.main(["-xvs", __file__]) 
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""
+Tests for the WorkflowOrchestrator class.
+
+These tests verify that workflows run their steps in dependency order and
+that workflow state is persisted as it changes.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from src.workflow.orchestrator import WorkflowOrchestrator, WorkflowStatus
+
+class RecordingAgent:
+    """Minimal agent that records the order in which its actions run."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def process(self, request):
+        self.calls.append(request["action"])
+        return {"action": request["action"]}
+
+@pytest.fixture
+def orchestrator(tmp_path, monkeypatch):
+    """Create an orchestrator that persists to a temporary directory."""
+    monkeypatch.setenv("WORKFLOWS_FILE", str(tmp_path / "workflows.json"))
+    monkeypatch.setenv("WORKFLOW_DEFINITIONS_FILE", str(tmp_path / "definitions.json"))
+    return WorkflowOrchestrator(agents={"recorder": RecordingAgent()})
+
+async def wait_until_finished(workflow):
+    for _ in range(200):
+        if workflow["status"] not in (WorkflowStatus.PENDING, WorkflowStatus.RUNNING):
+            return
+        await asyncio.sleep(0.01)
+
+@pytest.mark.asyncio
+async def test_running_a_workflow_only_persists_instances(orchestrator):
+    """Test that executing a workflow does not rewrite the workflow definitions file."""
+    definition = await orchestrator.create_workflow_definition(
+        "test", "Test workflow", [{"agent": "recorder", "action": "first"}]
+    )
+
+    with patch.object(orchestrator, "_save_workflow_definitions") as save_definitions:
+        workflow = await orchestrator.create_workflow_instance(definition["id"], {})
+        await wait_until_finished(workflow)
+
+    save_definitions.assert_not_called()
+    assert workflow["status"] == WorkflowStatus.SUCCEEDED
+    assert workflow["completed_at"] == workflow["updated_at"]
+
+def make_step(step_id, action, depends_on=()):
+    return {
+        "id": step_id, "name": step_id, "agent": "recorder", "action": action, "parameters": {},
+        "depends_on": list(depends_on), "condition": None, "status": WorkflowStatus.PENDING,
+        "result": None, "error": None, "start_time": None, "end_time": None,
+        "retries": 0, "max_retries": 0
+    }
+
+@pytest.mark.asyncio
+async def test_steps_start_as_soon_as_their_dependencies_succeed(orchestrator):
+    """Test that a step doesn't wait for unrelated steps started alongside its dependency."""
+    dependent_ran = asyncio.Event()
+
+    class BranchingAgent(RecordingAgent):
+        async def process(self, request):
+            if request["action"] == "slow":
+                # Only finishes once the other branch has completed
+                await asyncio.wait_for(dependent_ran.wait(), timeout=1)
+            elif request["action"] == "dependent":
+                dependent_ran.set()
+            return await super().process(request)
+
+    agent = BranchingAgent()
+    orchestrator.agents["recorder"] = agent
+    workflow = {
+        "id": "wf", "status": WorkflowStatus.PENDING, "input_data": {}, "output_data": {}, "error": None,
+        "steps": [make_step("slow", "slow"), make_step("fast", "fast"), make_step("dependent", "dependent", ["fast"])]
+    }
+    orchestrator.workflows["wf"] = workflow
+
+    await orchestrator._execute_workflow("wf")
+
+    assert workflow["status"] == WorkflowStatus.SUCCEEDED
+    assert agent.calls == ["fast", "dependent", "slow"]
+
+# Run the tests if this file is executed directly
+if __name__ == "__main__":
+    pytest.main(["-xvs", __file__])
@@ -0,0 +1,69 @@
+"""
+HTTP utilities for infrastructure automation.
+
+This module provides helpers shared by the services and agents that call
+remote HTTP APIs through pooled aiohttp sessions.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
+logger = logging.getLogger(__name__)
+
+# Statuses that mean "try again later": rate limited or temporarily unavailable
+RETRY_STATUSES = frozenset({429, 503})
+
+# Upper bound on a single wait, even if the server asks for longer
+MAX_RETRY_DELAY = 30.0
+
+@asynccontextmanager
+async def retry_request(
+    request: Callable[[], Any],
+    max_retries: int = 3,
+    backoff: float = 0.5
+) -> AsyncIterator[Any]:
+    """
+    Send an HTTP request, retrying with exponential backoff on 429 and 503.
+
+    Use it in place of the request's own context manager:
+
+        async with retry_request(lambda: session.post(url, json=payload)) as response:
+            ...
+
+    A Retry-After header (in seconds) takes precedence over the backoff.
+
+    Args:
+        request: Callable that starts the request and returns aiohttp's request context manager
+        max_retries: Number of retries after the first attempt
+        backoff: Delay before the first retry in seconds, doubled on each retry
+
+    Yields:
+        The final response, whatever its status
+    """
+    attempt = 0
+    while True:
+        context = request()
+        response = await context.__aenter__()
+        if response.status not in RETRY_STATUSES or attempt >= max_retries:
+            break
+
+        delay = backoff * 2 ** attempt
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            delay = float(retry_after)
+        delay = min(delay, MAX_RETRY_DELAY)
+        await context.__aexit__(None, None, None)
+
+        attempt += 1
+        logger.warning(
+            "%s returned status %d, retrying in %.1fs (%d/%d)",
+            response.url, response.status, delay, attempt, max_retries
+        )
+        await asyncio.sleep(delay)
+
+    try:
+        yield response
+    finally:
+        await context.__aexit__(None, None, None)
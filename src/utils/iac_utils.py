@@ -0,0 +1,109 @@
+"""
+Infrastructure as code utilities for infrastructure automation.
+
+This module provides helpers that shrink infrastructure code before it is
+embedded in LLM prompts, so large modules fit the model's context window.
+"""
+
+import re
+from typing import List, Tuple
+
+# Full-line comments only; a "#" or "//" later in a line may be inside a string
+_HASH_COMMENT_RE = re.compile(r'^[ \t]*#.*\n?', re.MULTILINE)
+_SLASH_COMMENT_RE = re.compile(r'^[ \t]*//.*\n?', re.MULTILINE)
+# Block comments that open a line; "/*" also appears in ARNs and globs inside strings
+_BLOCK_COMMENT_RE = re.compile(r'^[ \t]*/\*[\s\S]*?\*/[ \t]*\n?', re.MULTILINE)
+_TRAILING_SPACE_RE = re.compile(r'[ \t]+$', re.MULTILINE)
+_BLANK_LINES_RE = re.compile(r'\n{2,}')
+
+# Top-level Terraform blocks in the order they are kept when code must be cut;
+# resources and modules drive analysis and cost, outputs rarely matter
+_TERRAFORM_BLOCK_PRIORITY = ("resource", "module", "data", "variable", "provider", "locals", "terraform", "output")
+
+_ELIDED_MARKER = {"terraform": "# ... {count} blocks elided ...", "ansible": "# ... elided ...", "jenkins": "// ... elided ..."}
+
+def strip_comments(code: str, iac_type: str) -> str:
+    """
+    Remove full-line comments and blank lines from infrastructure code.
+
+    Indentation is kept, since it is significant in Ansible YAML.
+
+    Args:
+        code: The infrastructure code
+        iac_type: The type of IaC (terraform, ansible, jenkins)
+
+    Returns:
+        The code without comments, trailing whitespace or blank lines
+    """
+    if iac_type != "ansible":
+        code = _BLOCK_COMMENT_RE.sub("", code)
+        code = _SLASH_COMMENT_RE.sub("", code)
+    if iac_type != "jenkins":
+        code = _HASH_COMMENT_RE.sub("", code)
+    code = _TRAILING_SPACE_RE.sub("", code)
+    return _BLANK_LINES_RE.sub("\n", code).strip()
+
+def _terraform_blocks(code: str) -> List[Tuple[str, str]]:
+    """Split Terraform code into (block type, text) pairs of top-level blocks and assignments."""
+    blocks: List[Tuple[str, str]] = []
+    lines: List[str] = []
+    depth = 0
+    for line in code.split("\n"):
+        lines.append(line)
+        # Braces inside strings are rare enough at top level to ignore
+        depth += line.count("{") - line.count("}")
+        if depth <= 0:
+            text = "\n".join(lines)
+            blocks.append((text.split(None, 1)[0] if text.strip() else "", text))
+            lines = []
+            depth = 0
+    if lines:
+        text = "\n".join(lines)
+        blocks.append((text.split(None, 1)[0] if text.strip() else "", text))
+    return blocks
+
+def slim_iac_code(code: str, iac_type: str, max_chars: int) -> str:
+    """
+    Shrink infrastructure code to at most about max_chars characters.
+
+    Code that already fits is returned unchanged. Otherwise comments and
+    blank lines are removed first. If it is still too long, Terraform keeps
+    whole top-level blocks by priority (resources and modules first) in
+    their original order, and other IaC types keep the head and tail of the
+    file; a marker comment stands in for what was left out.
+
+    Args:
+        code: The infrastructure code
+        iac_type: The type of IaC (terraform, ansible, jenkins)
+        max_chars: Character budget for the code
+
+    Returns:
+        The code, or a slimmed version of it
+    """
+    if len(code) <= max_chars:
+        return code
+
+    code = strip_comments(code, iac_type)
+    if len(code) <= max_chars:
+        return code
+
+    if iac_type == "terraform":
+        blocks = _terraform_blocks(code)
+        priority = {block_type: rank for rank, block_type in enumerate(_TERRAFORM_BLOCK_PRIORITY)}
+        order = sorted(range(len(blocks)), key=lambda i: priority.get(blocks[i][0], len(priority)))
+        keep = set()
+        used = 0
+        for index in order:
+            size = len(blocks[index][1]) + 1
+            if used + size <= max_chars:
+                keep.add(index)
+                used += size
+        if keep:
+            kept = [blocks[i][1] for i in range(len(blocks)) if i in keep]
+            kept.append(_ELIDED_MARKER["terraform"].format(count=len(blocks) - len(keep)))
+            return "\n".join(kept)
+
+    marker = _ELIDED_MARKER.get(iac_type, "... elided ...")
+    head = code[:max_chars * 3 // 4].rsplit("\n", 1)[0]
+    tail = code[-(max_chars // 4):].split("\n", 1)[-1]
+    return f"{head}\n{marker}\n{tail}"
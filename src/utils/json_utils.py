@@ -0,0 +1,142 @@
+"""
+JSON utilities for infrastructure automation.
+
+This module provides JSON encoding and decoding helpers that use orjson when
+it is installed and fall back to the standard library json module otherwise,
+and an incremental parser for JSON objects streamed from an LLM.
+"""
+
+import json
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the installed extras
+    orjson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can keep
+# catching the standard library exception regardless of the backend in use.
+JSONDecodeError = json.JSONDecodeError
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Parse a JSON document.
+
+    Args:
+        data: JSON document as str or bytes
+
+    Returns:
+        The parsed Python object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj: Any, indent: bool = False, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """
+    Serialize an object to a JSON string.
+
+    Args:
+        obj: The object to serialize
+        indent: Whether to pretty-print with two-space indentation
+        default: Optional callable used for objects that are not natively serializable
+
+    Returns:
+        JSON document as a string
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=option).decode("utf-8")
+    return json.dumps(obj, indent=2 if indent else None, default=default)
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+_NUMBER_END = _WHITESPACE + ",}"
+
+class ObjectStreamParser:
+    """
+    Incrementally parse the top-level members of a JSON object as it streams in.
+
+    Text before the opening brace (such as a ```json fence) is ignored. Each
+    call to feed() returns the (key, value) members that were completed by the
+    new text, so callers can use early members before the object is finished.
+    """
+
+    def __init__(self):
+        self.done = False
+        self._buffer = ""
+        self._pos = -1  # Index after the opening brace, once it has been seen
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add streamed text.
+
+        Args:
+            chunk: The next piece of the document
+
+        Returns:
+            Members completed by this chunk, in document order
+        """
+        self._buffer += chunk
+        return self._parse(final=False)
+
+    def close(self) -> List[Tuple[str, Any]]:
+        """
+        Finish parsing once the stream has ended.
+
+        Returns:
+            Members that could only be completed at the end of the stream
+        """
+        return self._parse(final=True)
+
+    def _parse(self, final: bool) -> List[Tuple[str, Any]]:
+        """Return the members completed since the last call."""
+        items: List[Tuple[str, Any]] = []
+        buffer = self._buffer
+        if self._pos < 0:
+            start = buffer.find("{")
+            if start < 0:
+                return items
+            self._pos = start + 1
+
+        while not self.done:
+            pos = self._skip(buffer, self._pos, ",")
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == "}":
+                self.done = True
+                break
+            try:
+                key, pos = _decoder.raw_decode(buffer, pos)
+                pos = self._skip(buffer, pos)
+                if pos >= len(buffer):
+                    break
+                if not isinstance(key, str) or buffer[pos] != ":":
+                    # Not an object member; stop rather than guess
+                    self.done = True
+                    break
+                pos = self._skip(buffer, pos + 1)
+                value, end = _decoder.raw_decode(buffer, pos)
+            except JSONDecodeError:
+                # The member is incomplete; wait for more text
+                break
+            # A number is only complete once a delimiter follows it ("3" may become "3.5")
+            if (
+                not final
+                and isinstance(value, (int, float))
+                and not isinstance(value, bool)
+                and (end == len(buffer) or buffer[end] not in _NUMBER_END)
+            ):
+                break
+            items.append((key, value))
+            self._pos = end
+        return items
+
+    @staticmethod
+    def _skip(text: str, pos: int, extra: str = "") -> int:
+        """Return the index of the next character that isn't whitespace (or in extra)."""
+        while pos < len(text) and (text[pos] in _WHITESPACE or text[pos] in extra):
+            pos += 1
+        return pos
@@ -6,6 +6,7 @@ This module provides functions for loading and rendering templates.
 
 import os
 import re
+import functools
 from typing import Optional, Dict, Any
 from jinja2 import Environment, FileSystemLoader, Template
 
@@ -17,10 +18,14 @@ env = Environment(
     lstrip_blocks=True
 )
 
+@functools.lru_cache(maxsize=64)
 def load_template(template_name: str) -> Template:
     """
     Load a Jinja2 template from the templates directory.
     
+    Loaded templates are memoized, so repeated loads skip the loader's
+    filesystem up-to-date check and return the same compiled Template.
+    
     Args:
         template_name: Name of the template file
         
@@ -79,15 +79,20 @@ class WorkflowOrchestrator:
     
     def _save_persisted_data(self):
         """Save workflow data to persistent storage."""
-        # Save workflow definitions
+        self._save_workflow_definitions()
+        self._save_workflows()
+    
+    def _save_workflow_definitions(self):
+        """Save the workflow definitions to persistent storage."""
         try:
             with open(self.definitions_file, 'w') as f:
                 json.dump(self.workflow_definitions, f, indent=2, default=str)
             logger.info(f"Saved {len(self.workflow_definitions)} workflow definitions")
         except Exception as e:
             logger.error(f"Error saving workflow definitions: {str(e)}")
-        
-        # Save active workflows
+    
+    def _save_workflows(self):
+        """Save the workflow instances to persistent storage."""
         try:
             # Convert non-serializable objects to strings
             serializable_workflows = {}
@@ -164,7 +169,7 @@ class WorkflowOrchestrator:
         self.workflow_definitions[definition_id] = workflow_def
         
         # Save to persistent storage
-        self._save_persisted_data()
+        self._save_workflow_definitions()
         
         return workflow_def
     
@@ -242,7 +247,7 @@ class WorkflowOrchestrator:
         workflow_def["updated_at"] = datetime.now().isoformat()
         
         # Save to persistent storage
-        self._save_persisted_data()
+        self._save_workflow_definitions()
         
         return workflow_def
     
@@ -262,7 +267,7 @@ class WorkflowOrchestrator:
         del self.workflow_definitions[definition_id]
         
         # Save to persistent storage
-        self._save_persisted_data()
+        self._save_workflow_definitions()
         
         return True
     
@@ -334,7 +339,7 @@ class WorkflowOrchestrator:
         self.workflows[workflow_id] = workflow
         
         # Save to persistent storage
-        self._save_persisted_data()
+        self._save_workflows()
         
         # Start the workflow execution in the background
         asyncio.create_task(self._execute_workflow(workflow_id))
@@ -420,7 +425,7 @@ class WorkflowOrchestrator:
                 step["status"] = WorkflowStatus.CANCELLED
         
         # Save to persistent storage
-        self._save_persisted_data()
+        self._save_workflows()
         
         return True
     
@@ -436,42 +441,41 @@ class WorkflowOrchestrator:
             return
         
         workflow = self.workflows[workflow_id]
-        workflow["status"] = WorkflowStatus.RUNNING
-        workflow["started_at"] = datetime.now().isoformat()
-        workflow["updated_at"] = datetime.now().isoformat()
+        now = datetime.now().isoformat()
+        workflow.update(status=WorkflowStatus.RUNNING, started_at=now, updated_at=now)
         
         # Save the updated workflow state
-        self._save_persisted_data()
+        self._save_workflows()
         
         logger.info(f"Starting workflow execution: {workflow_id}")
         
         try:
-            # Continue until all steps are completed, failed, or cancelled
-            while await self._has_runnable_steps(workflow):
-                # Find all steps that can be run now
-                runnable_steps = await self._get_runnable_steps(workflow)
+            # Start each step as soon as its dependencies have succeeded, so
+            # independent branches don't wait for each other and the workflow
+            # takes as long as its critical path
+            running: Dict[str, asyncio.Task] = {}
+            while True:
+                if await self._has_runnable_steps(workflow):
+                    for step in await self._get_runnable_steps(workflow):
+                        if step["id"] not in running:
+                            running[step["id"]] = asyncio.create_task(self._execute_step(workflow, step))
                 
-                if not runnable_steps:
+                if not running:
                     # If no steps can run but workflow is not complete,
                     # there might be a dependency cycle
-                    if not await self._is_workflow_complete(workflow):
+                    if await self._has_runnable_steps(workflow) and not await self._is_workflow_complete(workflow):
                         logger.warning(f"Possible dependency cycle in workflow {workflow_id}")
                         workflow["error"] = "Dependency cycle detected"
                         workflow["status"] = WorkflowStatus.FAILED
-                        break
-                    else:
-                        # All steps completed
-                        break
+                    break
                 
-                # Execute runnable steps in parallel
-                await asyncio.gather(*[
-                    self._execute_step(workflow, step)
-                    for step in runnable_steps
-                ])
+                done, _ = await asyncio.wait(running.values(), return_when=asyncio.FIRST_COMPLETED)
+                for step_id in [step_id for step_id, task in running.items() if task in done]:
+                    running.pop(step_id).result()
                 
                 # Update workflow state
                 workflow["updated_at"] = datetime.now().isoformat()
-                self._save_persisted_data()
+                self._save_workflows()
             
             # Check if all steps completed successfully
             all_succeeded = all(
@@ -492,8 +496,8 @@ class WorkflowOrchestrator:
                     workflow["status"] = WorkflowStatus.FAILED
             
             # Set completion time
-            workflow["completed_at"] = datetime.now().isoformat()
-            workflow["updated_at"] = datetime.now().isoformat()
+            now = datetime.now().isoformat()
+            workflow.update(completed_at=now, updated_at=now)
             
             # Gather output data from all steps
             workflow["output_data"] = await self._gather_output_data(workflow)
@@ -502,13 +506,11 @@ class WorkflowOrchestrator:
             
         except Exception as e:
             logger.error(f"Error executing workflow {workflow_id}: {str(e)}")
-            workflow["status"] = WorkflowStatus.FAILED
-            workflow["error"] = str(e)
-            workflow["completed_at"] = datetime.now().isoformat()
-            workflow["updated_at"] = datetime.now().isoformat()
+            now = datetime.now().isoformat()
+            workflow.update(status=WorkflowStatus.FAILED, error=str(e), completed_at=now, updated_at=now)
         
         # Save the final workflow state
-        self._save_persisted_data()
+        self._save_workflows()
     
     async def _has_runnable_steps(self, workflow: Dict[str, Any]) -> bool:
         """
@@ -541,6 +543,7 @@ class WorkflowOrchestrator:
             List of runnable steps
         """
         runnable_steps = []
+        steps_by_id = {step["id"]: step for step in workflow["steps"]}
         
         for step in workflow["steps"]:
             # Skip steps that are not pending
@@ -551,14 +554,12 @@ class WorkflowOrchestrator:
             dependencies_met = True
             for dep_step_id in step["depends_on"]:
                 # Find the dependency step
-                dep_steps = [s for s in workflow["steps"] if s["id"] == dep_step_id]
-                if not dep_steps:
+                dep_step = steps_by_id.get(dep_step_id)
+                if dep_step is None:
                     logger.warning(f"Dependency step {dep_step_id} not found in workflow {workflow['id']}")
                     dependencies_met = False
                     break
                 
-                dep_step = dep_steps[0]
-                
                 # Check if the dependency completed successfully
                 if dep_step["status"] != WorkflowStatus.SUCCEEDED:
                     dependencies_met = False
@@ -594,8 +595,7 @@ class WorkflowOrchestrator:
         parameters = step["parameters"].copy()
         
         # Update step status
-        step["status"] = WorkflowStatus.RUNNING
-        step["start_time"] = datetime.now().isoformat()
+        step.update(status=WorkflowStatus.RUNNING, start_time=datetime.now().isoformat())
         
         logger.info(f"Executing step {step['id']} with agent {agent_name}, action {action}")
         
@@ -628,9 +628,7 @@ class WorkflowOrchestrator:
             result = await agent.process(agent_request)
             
             # Update step status
-            step["status"] = WorkflowStatus.SUCCEEDED
-            step["result"] = result
-            step["end_time"] = datetime.now().isoformat()
+            step.update(status=WorkflowStatus.SUCCEEDED, result=result, end_time=datetime.now().isoformat())
             
             logger.info(f"Step {step['id']} completed successfully")
             
@@ -645,9 +643,7 @@ class WorkflowOrchestrator:
                 logger.info(f"Retrying step {step['id']} ({step['retries']}/{step['max_retries']})")
             else:
                 # Mark as failed
-                step["status"] = WorkflowStatus.FAILED
-                step["error"] = str(e)
-                step["end_time"] = datetime.now().isoformat()
+                step.update(status=WorkflowStatus.FAILED, error=str(e), end_time=datetime.now().isoformat())
     
     async def _resolve_parameter_references(self, workflow: Dict[str, Any], parameters: Dict[str, Any]):
         """
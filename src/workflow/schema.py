@@ -194,14 +194,20 @@ class WorkflowRegistry:
         if not workflow.id:
             raise ValueError("Workflow definition ID is required")
         
-        # Validate against available agents
-        for step in workflow.steps:
-            if step.agent not in self.agent_capabilities:
-                raise ValueError(f"Unknown agent in step: {step.agent}")
-            
-            agent_caps = self.agent_capabilities[step.agent]
-            if step.action not in agent_caps.actions:
-                raise ValueError(f"Unknown action '{step.action}' for agent '{step.agent}'")
+        # Validate against available agents, checking each distinct agent/action pair once
+        used = {(step.agent, step.action) for step in workflow.steps}
+        unknown_agents = {agent for agent, _ in used} - self.agent_capabilities.keys()
+        if unknown_agents:
+            raise ValueError(f"Unknown agent in step: {', '.join(sorted(unknown_agents))}")
+        
+        unknown_actions = sorted(
+            (agent, action) for agent, action in used
+            if action not in self.agent_capabilities[agent].actions
+        )
+        if unknown_actions:
+            raise ValueError("; ".join(
+                f"Unknown action '{action}' for agent '{agent}'" for agent, action in unknown_actions
+            ))
         
         self.workflow_definitions[workflow.id] = workflow
     